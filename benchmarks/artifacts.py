@@ -0,0 +1,161 @@
+"""
+Module: artifacts
+==================
+
+Restart benchmark of the disk-backed artifact store (modules.artifacts).
+
+A synthetic network (see synthetic.py) is written into a scratch copy of the data
+layout, and a fresh interpreter, standing in for a restarted app process, loads the
+files, computes the summaries and builds the default figures three times: with the store
+disabled, with an empty store (cold: computes and writes) and with the filled store
+(warm: loads). All three must return identical results. Finally several processes run
+the same work at once against a fresh store with a small size bound, which exercises
+concurrent writes, reads and evictions.
+
+Usage:
+    python benchmarks/artifacts.py
+    python benchmarks/artifacts.py --loggers 10000 --workers 4
+
+Functions:
+- workload
+- run_child
+- main
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def workload() -> list:
+    """
+    Load, summarize and plot the Biel data of the working directory like a first session.
+
+    Returns:
+    list
+        Every result (figures as key-sorted JSON), for comparing runs.
+    """
+    from plotly.utils import PlotlyJSONEncoder
+
+    from modules import api, maps, plots
+    from modules.paths import PERIODS, get_files
+
+    results = []
+    for period in PERIODS:
+        hour_data = api.uhi_by_hour('biel', period, 0)
+        summary = api.sdtn_exceedances('biel', period, 'tropical_nights', 20.0)
+        results += [hour_data, api.daily_stats('biel', period), summary]
+        figures = [
+            maps.uhi_ci_map_figure(hour_data, 'uhi', 'color'),
+            plots.histogram_figure(hour_data[['uhi']], 'uhi', 20, 600, 500),
+            maps.sdtn_map_figure(summary, 'color'),
+        ]
+        # Unpickled figures may order their layout keys differently
+        results += [json.dumps(fig.to_dict(), sort_keys=True, cls=PlotlyJSONEncoder) for fig in figures]
+    landuse_path, fitnah_path, *_ = get_files('biel', 'summer')
+    results += [api.read_geodata(landuse_path), api.read_geodata(fitnah_path)]
+    return results
+
+
+def run_child(data_dir: Path, env: dict) -> subprocess.Popen:
+    """
+    Start the workload in a fresh interpreter.
+
+    Parameters:
+    data_dir : Path
+        Directory containing data/biel.
+    env : dict
+        Extra environment variables (HBS_DISK_CACHE, HBS_CACHE_DIR, HBS_CACHE_MAX_MB).
+
+    Returns:
+    subprocess.Popen
+        The child; it prints one JSON line with 'seconds', 'digest' and the store counters.
+    """
+    return subprocess.Popen(
+        [sys.executable, __file__, '--child'],
+        cwd=data_dir,
+        env={**os.environ, **env},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+
+
+def _result(child: subprocess.Popen) -> dict:
+    out, _ = child.communicate()
+    if child.returncode != 0:
+        raise RuntimeError(f"workload failed with exit code {child.returncode}")
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark warm restarts with the artifact store.')
+    parser.add_argument('--loggers', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent processes of the last run.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        from modules import artifacts
+
+        start = time.perf_counter()
+        results = workload()
+        seconds = time.perf_counter() - start
+        digest = hashlib.sha256(b''.join(artifacts.fingerprint(result) for result in results)).hexdigest()
+        stats = artifacts.store.stats()
+        print(json.dumps({'seconds': seconds, 'digest': digest,
+                          'hits': stats['hits'], 'writes': stats['writes'], 'bytes': stats['bytes']}))
+        return
+
+    from synthetic import generate_network, write_network
+
+    with tempfile.TemporaryDirectory(prefix='hbs_artifacts_') as tmp:
+        tmp = Path(tmp)
+        write_network(generate_network(args.loggers, args.days), tmp / 'data' / 'biel')
+        print(f"{args.loggers} loggers, {args.days} days")
+
+        store = {'HBS_DISK_CACHE': '1', 'HBS_CACHE_DIR': str(tmp / 'store')}
+        runs = [
+            ('store disabled', {'HBS_DISK_CACHE': '0'}),
+            ('cold restart', store),
+            ('warm restart', store),
+        ]
+        digests = set()
+        for label, env in runs:
+            result = _result(run_child(tmp, env))
+            digests.add(result['digest'])
+            print(f"{label:<15} {result['seconds']:7.3f} s  hits {result['hits']:3d}  writes {result['writes']:3d}  "
+                  f"store {result['bytes'] / 2 ** 20:6.1f} MB")
+        if len(digests) != 1:
+            raise AssertionError("results differ between runs")
+
+        # Roughly half of one run's artifacts fit, so the processes evict each other's entries
+        bound_mb = result['bytes'] / 2 ** 20 / 2
+        env = {'HBS_DISK_CACHE': '1', 'HBS_CACHE_DIR': str(tmp / 'shared'), 'HBS_CACHE_MAX_MB': str(bound_mb)}
+        start = time.perf_counter()
+        children = [run_child(tmp, env) for _ in range(args.workers)]
+        results = [_result(child) for child in children]
+        if {result['digest'] for result in results} != digests:
+            raise AssertionError("concurrent runs returned different results")
+        from modules.artifacts import ArtifactStore
+        size = ArtifactStore(tmp / 'shared').size()
+        print(f"{args.workers} concurrent  {time.perf_counter() - start:7.3f} s  store {size / 2 ** 20:.1f} MB "
+              f"(bound {bound_mb:.1f} MB), results match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Module: export
+==================
+
+Check and benchmark of the streaming export (modules.export) on a synthetic network.
+
+The daily values of every logger joined with the station metadata (the largest export of
+the app) are written once the straightforward way (the joined table of api.daily_stats
+rendered to one CSV string) and once through the export generator, with the parsed file
+already cached in both cases. Both files must be identical; the peak memory allocated
+during each export (tracemalloc) and the time are reported.
+
+Usage:
+    python benchmarks/export.py
+    python benchmarks/export.py --loggers 10000 --days 90
+
+Functions:
+- measure
+- main
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ['HBS_DISK_CACHE'] = '0'
+
+
+def measure(write) -> tuple:
+    """
+    Run an export and measure it.
+
+    Parameters:
+    write : callable
+        Performs the export.
+
+    Returns:
+    tuple
+        (seconds, peak MB allocated during the export)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    write()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the streaming export against an in-memory CSV.')
+    parser.add_argument('--loggers', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    from synthetic import generate_network, write_network
+
+    with tempfile.TemporaryDirectory(prefix='hbs_export_') as tmp:
+        tmp = Path(tmp)
+        write_network(generate_network(args.loggers, args.days), tmp / 'data' / 'biel')
+        # The data paths of the app are relative to the working directory
+        os.chdir(tmp)
+        from modules import api, export
+        from modules.paths import get_files
+
+        selection = export.Selection('daily', 'biel', 'summer')
+        for path in get_files('biel', 'summer'):
+            if path.suffix == '.csv' and path.exists():
+                api.read_table.shared(path)
+        rows = len(api.read_table.shared(get_files('biel', 'summer')[3]))
+        print(f"{args.loggers} loggers, {args.days} days: {rows} rows")
+
+        def in_memory():
+            data = api.daily_stats('biel', 'summer').drop(columns=['Unnamed: 0'], errors='ignore')
+            (tmp / 'in_memory.csv').write_bytes(data.to_csv(index=False).encode())
+
+        def streamed():
+            export.write_file(selection, 'csv', tmp / 'streamed.csv')
+
+        for label, write in (('in-memory CSV', in_memory), ('streamed', streamed)):
+            seconds, peak = measure(write)
+            print(f"{label:<14} {seconds:7.3f} s  peak {peak:7.1f} MB")
+        if (tmp / 'in_memory.csv').read_bytes() != (tmp / 'streamed.csv').read_bytes():
+            raise AssertionError("exports differ")
+        print(f"identical files of {(tmp / 'streamed.csv').stat().st_size / 2 ** 20:.1f} MB")
+        os.chdir(REPO_DIR)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,606 @@
+"""
+Module: load_test
+==================
+
+Concurrent multi-session load test for the "Hot Biel Summer" app.
+
+The harness starts the app on a local Streamlit server and connects N simulated visitors
+over the same websocket protocol the browser uses. Each visitor follows a realistic
+interaction script (switch city and period, scrub the hour slider, drag the SD/TN
+threshold, change buffers) with a think time between steps. Every interaction triggers
+a rerun on the server; the time from sending the widget change to the server's
+"script finished" message is the rerun latency.
+
+Reported: rerun latency percentiles, throughput (reruns/s), server CPU use and server
+memory growth per session. Two commits can be compared with --compare.
+
+Usage:
+    python benchmarks/load_test.py --sessions 20 --steps 30
+    python benchmarks/load_test.py --sessions 20 --json result.json
+    python benchmarks/load_test.py --compare HEAD~1 HEAD --sessions 10 --report compare.md
+
+Functions:
+- start_server
+- run_load_test
+- summarize
+- compare_commits
+- main
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+WIDGET_TYPES = ('radio', 'selectbox', 'slider', 'multiselect', 'number_input', 'checkbox')
+# Widgets using format_func only expose their localized labels; these are their values
+OPTION_VALUES = {
+    'period_selector': ['summer', 'heatwave'],
+    'basemap_selector': ['color', 'grey', 'relief', 'landcover'],
+    'sdtn_metric': ['summer_days', 'tropical_nights'],
+}
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+# -------------------------------------------------------------------
+# 1) Server and process sampling
+# -------------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app_dir: Path, port: int, timeout: float = 60.0) -> subprocess.Popen:
+    """
+    Start `streamlit run main.py` headless in app_dir and wait until it is healthy.
+
+    Parameters:
+    app_dir : Path
+        Directory containing main.py (the data paths are relative to it).
+    port : int
+        Port to serve on.
+    timeout : float
+        Seconds to wait for the health endpoint.
+
+    Returns:
+    subprocess.Popen
+        The server process.
+    """
+    cmd = [
+        sys.executable, '-m', 'streamlit', 'run', 'main.py',
+        '--server.headless', 'true',
+        '--server.port', str(port),
+        '--server.fileWatcherType', 'none',
+        '--browser.gatherUsageStats', 'false',
+    ]
+    proc = subprocess.Popen(cmd, cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as resp:
+                if resp.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f'Streamlit server in {app_dir} did not become healthy within {timeout} s')
+
+
+def _proc_stats(pid: int) -> tuple:
+    """Return (rss_bytes, cpu_seconds) of a process from /proc (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            rss = int(f.read().split()[1]) * PAGE_SIZE
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        return rss, cpu
+    except (OSError, IndexError, ValueError):
+        return float('nan'), float('nan')
+
+
+class ProcessSampler(threading.Thread):
+    """
+    Background thread sampling RSS and CPU time of the server process.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.25) -> None:
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            rss, cpu = _proc_stats(self.pid)
+            self.samples.append((time.perf_counter(), rss, cpu))
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+# -------------------------------------------------------------------
+# 2) Simulated browser session
+# -------------------------------------------------------------------
+
+
+class Session:
+    """
+    One simulated visitor talking to the server over the Streamlit websocket protocol.
+
+    Widgets are addressed by their user key (e.g. 'hour_selector'); the key is resolved
+    to the current widget ID after every rerun, since IDs change with labels (language).
+    """
+
+    def __init__(self, url: str, name: str) -> None:
+        self.url = url
+        self.name = name
+        self.connection = None
+        self.widgets = {}      # key -> (widget type, widget proto) of the last run
+        self.values = {}       # key -> value set by this session
+        self.latencies = []
+        self.errors = []
+        self._message_cache = {}
+
+    async def connect(self) -> None:
+        self.connection = await websocket_connect(self.url, subprotocols=['streamlit'])
+
+    async def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+
+    def _widget_state(self, key: str, value):
+        widget_type, proto = self.widgets[key]
+        options = OPTION_VALUES.get(key) or list(getattr(proto, 'options', []))
+        state = {'id': proto.id}
+        if widget_type in ('radio', 'selectbox'):
+            state['int_value'] = [str(o) for o in options].index(str(value))
+        elif widget_type == 'multiselect':
+            state['int_array_value'] = [[str(o) for o in options].index(str(v)) for v in value]
+        elif widget_type == 'slider':
+            state['double_array_value'] = [float(value)]
+        elif widget_type == 'number_input':
+            state['double_value'] = float(value)
+        elif widget_type == 'checkbox':
+            state['bool_value'] = bool(value)
+        return state
+
+    async def rerun(self, **changes) -> float:
+        """
+        Apply widget changes (key=value) and wait for the rerun to finish.
+
+        Returns:
+        float
+            Rerun latency in seconds.
+        """
+        self.values.update(changes)
+        msg = BackMsg()
+        client_state = msg.rerun_script
+        client_state.SetInParent()  # an empty first rerun must still select the oneof
+        for key, value in self.values.items():
+            if key not in self.widgets:
+                continue
+            state = self._widget_state(key, value)
+            widget = client_state.widget_states.widgets.add()
+            widget.id = state.pop('id')
+            for field, field_value in state.items():
+                if field.endswith('array_value'):
+                    getattr(widget, field).data.extend(field_value)
+                else:
+                    setattr(widget, field, field_value)
+
+        start = time.perf_counter()
+        await self.connection.write_message(msg.SerializeToString(), binary=True)
+        widgets = {}
+        while True:
+            payload = await self.connection.read_message()
+            if payload is None:
+                raise ConnectionError(f'{self.name}: server closed the connection')
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            if forward.WhichOneof('type') == 'ref_hash':
+                forward = self._message_cache.get(forward.ref_hash, forward)
+            elif forward.hash:
+                self._message_cache[forward.hash] = forward
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    self.errors.append(f'{element.exception.type}: {element.exception.message}'[:200])
+                elif element_type in WIDGET_TYPES:
+                    proto = getattr(element, element_type)
+                    # Keyed widget IDs end with '-<key>'
+                    key = proto.id.rsplit('-', 1)[-1]
+                    if key != 'None':
+                        widgets[key] = (element_type, proto)
+            elif kind == 'script_finished':
+                if forward.script_finished in (
+                    ForwardMsg.FINISHED_SUCCESSFULLY,
+                    ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+                ):
+                    break
+        latency = time.perf_counter() - start
+        self.widgets = widgets
+        self.latencies.append(latency)
+        return latency
+
+
+# -------------------------------------------------------------------
+# 3) Interaction scripts
+# -------------------------------------------------------------------
+
+
+def interaction_script(rng: random.Random, steps: int) -> list:
+    """
+    Build a realistic sequence of widget changes for one visitor.
+
+    Visitors mostly scrub the hour slider and drag the threshold, occasionally flip
+    city, period, basemap or language, and change buffers.
+
+    Parameters:
+    rng : random.Random
+        Random generator (seeded per session for reproducible runs).
+    steps : int
+        Number of interactions.
+
+    Returns:
+    list
+        List of dicts of widget key -> value.
+    """
+    hour = 0
+    threshold = 30.0
+    actions = [
+        ('scrub_hours', 6),
+        ('drag_threshold', 4),
+        ('switch_city', 1),
+        ('switch_period', 1),
+        ('change_buffer', 2),
+        ('change_dtype', 1),
+        ('switch_basemap', 1),
+        ('switch_language', 1),
+    ]
+    names = [name for name, _ in actions]
+    weights = [weight for _, weight in actions]
+    script = []
+    for _ in range(steps):
+        action = rng.choices(names, weights)[0]
+        if action == 'scrub_hours':
+            hour = (hour + rng.choice([1, 1, 2, -1])) % 24
+            script.append({'hour_selector': hour})
+        elif action == 'drag_threshold':
+            threshold = min(40.0, max(15.0, threshold + rng.choice([0.5, 1.0, -0.5, -1.0])))
+            script.append({'threshold_selector': threshold})
+        elif action == 'switch_city':
+            script.append({'city_selector': rng.choice(['biel', 'bern'])})
+        elif action == 'switch_period':
+            script.append({'period_selector': rng.choice(['summer', 'heatwave'])})
+        elif action == 'change_buffer':
+            script.append({rng.choice(['geodata_buffer', 'fitnah_buffer']): rng.choice([10, 50, 100, 500])})
+        elif action == 'change_dtype':
+            script.append({'data_type_selector': rng.choice(['uhi', 'city_index'])})
+        elif action == 'switch_basemap':
+            script.append({'basemap_selector': rng.choice(['color', 'grey', 'relief', 'landcover'])})
+        else:
+            script.append({'language_selector': rng.choice(['DE', 'EN', 'FR'])})
+    return script
+
+
+async def _run_session(url: str, index: int, steps: int, think_time: float, seed: int) -> Session:
+    rng = random.Random(seed + index)
+    session = Session(url, f'session-{index}')
+    await session.connect()
+    try:
+        await session.rerun()
+        for changes in interaction_script(rng, steps):
+            # Skip changes to widgets that are not on the page in the current state
+            changes = {k: v for k, v in changes.items() if k in session.widgets}
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+            await session.rerun(**changes)
+    finally:
+        await session.close()
+    return session
+
+
+async def _run_all(url: str, sessions: int, steps: int, think_time: float, ramp_up: float, seed: int) -> list:
+    async def delayed(index):
+        await asyncio.sleep(ramp_up * index / max(sessions, 1))
+        return await _run_session(url, index, steps, think_time, seed)
+
+    return await asyncio.gather(*(delayed(i) for i in range(sessions)), return_exceptions=True)
+
+
+# -------------------------------------------------------------------
+# 4) Load test and report
+# -------------------------------------------------------------------
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def run_load_test(
+    app_dir: Path = REPO_DIR,
+    sessions: int = 10,
+    steps: int = 20,
+    think_time: float = 0.5,
+    ramp_up: float = 2.0,
+    seed: int = 0,
+) -> dict:
+    """
+    Start a local server, drive it with concurrent sessions and summarize the run.
+
+    Parameters:
+    app_dir : Path
+        Directory containing main.py.
+    sessions : int
+        Number of concurrent simulated visitors.
+    steps : int
+        Interactions per visitor (after the initial page load).
+    think_time : float
+        Mean pause between interactions, in seconds.
+    ramp_up : float
+        Seconds over which the sessions are started.
+    seed : int
+        Seed of the interaction scripts.
+
+    Returns:
+    dict
+        Summary produced by summarize().
+    """
+    port = _free_port()
+    server = start_server(Path(app_dir), port)
+    sampler = ProcessSampler(server.pid)
+    try:
+        baseline_rss, baseline_cpu = _proc_stats(server.pid)
+        sampler.start()
+        start = time.perf_counter()
+        results = asyncio.run(_run_all(f'ws://127.0.0.1:{port}/_stcore/stream', sessions, steps, think_time, ramp_up, seed))
+        wall = time.perf_counter() - start
+        end_rss, end_cpu = _proc_stats(server.pid)
+    finally:
+        sampler.stop()
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    return summarize(
+        results,
+        wall=wall,
+        cpu_seconds=end_cpu - baseline_cpu,
+        baseline_rss=baseline_rss,
+        end_rss=end_rss,
+        peak_rss=max((rss for _, rss, _ in sampler.samples), default=end_rss),
+        config={'sessions': sessions, 'steps': steps, 'think_time': think_time, 'ramp_up': ramp_up, 'seed': seed},
+    )
+
+
+def summarize(
+    results: list,
+    wall: float,
+    cpu_seconds: float,
+    baseline_rss: float,
+    end_rss: float,
+    peak_rss: float,
+    config: dict,
+) -> dict:
+    """
+    Aggregate per-session results into the load-test summary.
+
+    Parameters:
+    results : list
+        Session objects (or exceptions for sessions that failed).
+    wall : float
+        Wall time of the run in seconds.
+    cpu_seconds : float
+        CPU seconds used by the server during the run.
+    baseline_rss : float
+        Server RSS (bytes) before the first session connected.
+    end_rss : float
+        Server RSS (bytes) at the end of the run.
+    peak_rss : float
+        Highest sampled server RSS (bytes).
+    config : dict
+        Parameters of the run.
+
+    Returns:
+    dict
+        Summary with latency percentiles (ms), throughput, CPU and memory figures.
+    """
+    finished = [r for r in results if isinstance(r, Session)]
+    failed = [repr(r) for r in results if not isinstance(r, Session)]
+    first_loads = [s.latencies[0] for s in finished if s.latencies]
+    latencies = [lat for s in finished for lat in s.latencies[1:]]
+    n_sessions = max(config['sessions'], 1)
+    mb = 1024 ** 2
+    return {
+        'config': config,
+        'sessions_finished': len(finished),
+        'sessions_failed': len(failed),
+        'failures': failed[:5],
+        'app_exceptions': sum(len(s.errors) for s in finished),
+        'app_exception_samples': sorted({e for s in finished for e in s.errors})[:5],
+        'reruns': len(latencies) + len(first_loads),
+        'first_load_ms': {
+            'p50': 1000 * _percentile(first_loads, 50),
+            'p99': 1000 * _percentile(first_loads, 99),
+        },
+        'rerun_ms': {
+            'p50': 1000 * _percentile(latencies, 50),
+            'p90': 1000 * _percentile(latencies, 90),
+            'p99': 1000 * _percentile(latencies, 99),
+            'mean': 1000 * sum(latencies) / len(latencies) if latencies else float('nan'),
+            'max': 1000 * max(latencies, default=float('nan')),
+        },
+        'throughput_rps': (len(latencies) + len(first_loads)) / wall if wall else float('nan'),
+        'wall_s': wall,
+        'server_cpu_s': cpu_seconds,
+        'server_cpu_util': cpu_seconds / wall if wall else float('nan'),
+        'rss_baseline_mb': baseline_rss / mb,
+        'rss_end_mb': end_rss / mb,
+        'rss_peak_mb': peak_rss / mb,
+        'rss_growth_per_session_mb': (end_rss - baseline_rss) / mb / n_sessions,
+    }
+
+
+def format_summary(summary: dict) -> str:
+    """Render a summary as a plain-text table."""
+    rows = [
+        ('sessions (finished / failed)', f"{summary['sessions_finished']} / {summary['sessions_failed']}"),
+        ('app exceptions', summary['app_exceptions']),
+        ('reruns', summary['reruns']),
+        ('first load p50 / p99 (ms)', f"{summary['first_load_ms']['p50']:.0f} / {summary['first_load_ms']['p99']:.0f}"),
+        ('rerun p50 (ms)', f"{summary['rerun_ms']['p50']:.0f}"),
+        ('rerun p90 (ms)', f"{summary['rerun_ms']['p90']:.0f}"),
+        ('rerun p99 (ms)', f"{summary['rerun_ms']['p99']:.0f}"),
+        ('rerun max (ms)', f"{summary['rerun_ms']['max']:.0f}"),
+        ('throughput (reruns/s)', f"{summary['throughput_rps']:.2f}"),
+        ('server CPU (s / utilisation)', f"{summary['server_cpu_s']:.1f} / {summary['server_cpu_util']:.0%}"),
+        ('server RSS baseline / peak / end (MB)',
+         f"{summary['rss_baseline_mb']:.0f} / {summary['rss_peak_mb']:.0f} / {summary['rss_end_mb']:.0f}"),
+        ('RSS growth per session (MB)', f"{summary['rss_growth_per_session_mb']:.2f}"),
+    ]
+    rows += [('app exception', sample) for sample in summary['app_exception_samples']]
+    width = max(len(name) for name, _ in rows)
+    return '\n'.join(f'{name:<{width}}  {value}' for name, value in rows)
+
+
+# -------------------------------------------------------------------
+# 5) Commit comparison
+# -------------------------------------------------------------------
+
+COMPARED_METRICS = [
+    ('rerun p50 (ms)', lambda s: s['rerun_ms']['p50'], 'lower'),
+    ('rerun p90 (ms)', lambda s: s['rerun_ms']['p90'], 'lower'),
+    ('rerun p99 (ms)', lambda s: s['rerun_ms']['p99'], 'lower'),
+    ('first load p50 (ms)', lambda s: s['first_load_ms']['p50'], 'lower'),
+    ('throughput (reruns/s)', lambda s: s['throughput_rps'], 'higher'),
+    ('server CPU (s)', lambda s: s['server_cpu_s'], 'lower'),
+    ('server RSS peak (MB)', lambda s: s['rss_peak_mb'], 'lower'),
+    ('RSS growth per session (MB)', lambda s: s['rss_growth_per_session_mb'], 'lower'),
+    ('app exceptions', lambda s: s['app_exceptions'], 'lower'),
+]
+
+
+def compare_commits(rev_a: str, rev_b: str, harness_args: list) -> str:
+    """
+    Run the load test against two commits and render a markdown comparison.
+
+    Each commit is checked out into a temporary git worktree and tested in its own
+    server process, with this (current) version of the harness. Interactions address
+    widgets by their keys, so commits whose widgets lack those keys only measure the
+    initial page loads.
+
+    Parameters:
+    rev_a : str
+        Baseline revision.
+    rev_b : str
+        Candidate revision.
+    harness_args : list
+        Extra command-line arguments passed to each run (sessions, steps, ...).
+
+    Returns:
+    str
+        Markdown report.
+    """
+    summaries = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rev in (rev_a, rev_b):
+            worktree = Path(tmp) / f'wt-{len(summaries)}'
+            out = Path(tmp) / f'result-{len(summaries)}.json'
+            subprocess.run(['git', 'worktree', 'add', '--detach', str(worktree), rev],
+                           cwd=REPO_DIR, check=True, capture_output=True)
+            try:
+                subprocess.run([sys.executable, __file__, '--app-dir', str(worktree), '--json', str(out),
+                                *harness_args], check=True)
+                summaries[rev] = json.loads(out.read_text())
+            finally:
+                subprocess.run(['git', 'worktree', 'remove', '--force', str(worktree)],
+                               cwd=REPO_DIR, capture_output=True)
+                shutil.rmtree(worktree, ignore_errors=True)
+
+    a, b = summaries[rev_a], summaries[rev_b]
+    lines = [
+        f'## Load test: `{rev_a}` vs `{rev_b}`',
+        '',
+        f"{a['config']['sessions']} sessions x {a['config']['steps']} steps, think time {a['config']['think_time']} s",
+        '',
+        f'| metric | {rev_a} | {rev_b} | change |',
+        '|---|---:|---:|---:|',
+    ]
+    for name, getter, better in COMPARED_METRICS:
+        va, vb = getter(a), getter(b)
+        if not va:
+            lines.append(f'| {name} | {va:.2f} | {vb:.2f} | n/a |')
+            continue
+        change = (vb - va) / va
+        improved = (change < 0) if better == 'lower' else (change > 0)
+        marker = '' if abs(change) < 0.05 or change != change else (' ✅' if improved else ' ⚠️')
+        lines.append(f'| {name} | {va:.2f} | {vb:.2f} | {change:+.1%}{marker} |')
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('Usage:')[0].strip().splitlines()[-1])
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent simulated visitors.')
+    parser.add_argument('--steps', type=int, default=20, help='Interactions per visitor.')
+    parser.add_argument('--think-time', type=float, default=0.5, help='Mean pause between interactions (s).')
+    parser.add_argument('--ramp-up', type=float, default=2.0, help='Seconds over which sessions connect.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--app-dir', type=Path, default=REPO_DIR, help='Directory containing main.py.')
+    parser.add_argument('--json', type=Path, help='Write the summary as JSON to this path.')
+    parser.add_argument('--compare', nargs=2, metavar=('REV_A', 'REV_B'), help='Compare two git revisions.')
+    parser.add_argument('--report', type=Path, help='Write the comparison report to this path.')
+    args = parser.parse_args()
+
+    if args.compare:
+        harness_args = ['--sessions', str(args.sessions), '--steps', str(args.steps),
+                        '--think-time', str(args.think_time), '--ramp-up', str(args.ramp_up),
+                        '--seed', str(args.seed)]
+        report = compare_commits(*args.compare, harness_args)
+        print(report)
+        if args.report:
+            args.report.write_text(report + '\n', encoding='utf-8')
+        return
+
+    summary = run_load_test(args.app_dir, args.sessions, args.steps, args.think_time, args.ramp_up, args.seed)
+    print(format_summary(summary))
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Module: qc
+==================
+
+Check and benchmark of the streaming quality control (modules.qc) on synthetic raw series.
+
+Spikes, flatlines (of more and less than FLATLINE_MINUTES), level steps and outages are
+injected into the readings of a synthetic network sampled every 1 and every 10 minutes.
+The flags of the whole series of every logger (qc.sample_flags) are compared with those
+streamed through flag_chunks in chunks of various sizes, which must be identical, and
+the streaming is timed.
+
+Usage:
+    python benchmarks/qc.py
+    python benchmarks/qc.py --loggers 50 --days 10 --chunks 50 100 5000
+
+Functions:
+- inject_faults
+- whole_flags
+- main
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from modules import qc  # noqa: E402
+
+
+def inject_faults(raw: pd.DataFrame, step_minutes: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Add spikes, flatlines and level steps to the readings of every logger.
+
+    Parameters:
+    raw : pd.DataFrame
+        'time', 'logger' and 'temperature', ordered by time.
+    step_minutes : int
+        Interval of the readings.
+    seed : int
+        Random seed.
+
+    Returns:
+    pd.DataFrame
+        The readings with faults.
+    """
+    rng = np.random.default_rng(seed)
+    raw = raw.copy()
+    temperature = raw['temperature'].to_numpy()
+    for rows in raw.groupby('logger').indices.values():
+        n = len(rows)
+        for minutes in (qc.FLATLINE_MINUTES + 60, qc.FLATLINE_MINUTES - 30):
+            start = rng.integers(n - minutes // step_minutes)
+            temperature[rows[start:start + minutes // step_minutes]] = temperature[rows[start]]
+        temperature[rows[rng.integers(n, size=3)]] += 8.0
+        temperature[rows[rng.integers(n):]] += 5.0
+    raw['temperature'] = temperature
+    return raw
+
+
+def whole_flags(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Flags of the whole series of every logger at once.
+
+    Parameters:
+    raw : pd.DataFrame
+        'time' (datetime), 'logger' and 'temperature'.
+
+    Returns:
+    pd.DataFrame
+        'time', 'logger' and 'qc', ordered by logger, then time.
+    """
+    raw = raw.sort_values(['logger', 'time'], kind='stable')
+    flags = [
+        qc.sample_flags(part['time'].to_numpy(dtype='datetime64[ns]').astype(np.int64), part['temperature'].to_numpy())
+        for _, part in raw.groupby('logger', sort=False)
+    ]
+    return raw[['time', 'logger']].assign(qc=np.concatenate(flags)).reset_index(drop=True)
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Check that the streaming QC flags do not depend on the chunk size.')
+    parser.add_argument('--loggers', type=int, default=10)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--chunks', type=int, nargs='+', default=[50, 1000, 100_000])
+    args = parser.parse_args()
+
+    from synthetic import generate_raw
+
+    for step_minutes in (1, 10):
+        raw = inject_faults(generate_raw(args.loggers, args.days, step_minutes=step_minutes), step_minutes)
+        raw['time'] = pd.to_datetime(raw['time'])
+        expected = whole_flags(raw)
+        counts = {name: int(((expected['qc'] & bit) != 0).sum()) for name, bit in qc.FLAGS.items() if bit != qc.NEIGHBOR}
+        print(f"{step_minutes}-minute readings: {len(raw)} samples, whole-series flags {counts}")
+        for size in args.chunks:
+            chunks = (raw.iloc[start:start + size] for start in range(0, len(raw), size))
+            start = time.perf_counter()
+            streamed = pd.concat(qc.flag_chunks(chunks), ignore_index=True)
+            seconds = time.perf_counter() - start
+            streamed = streamed.sort_values(['logger', 'time'], kind='stable').reset_index(drop=True)
+            if not (
+                len(streamed) == len(expected)
+                and np.array_equal(streamed['time'].to_numpy(), expected['time'].to_numpy())
+                and np.array_equal(streamed['logger'].to_numpy(), expected['logger'].to_numpy())
+                and np.array_equal(streamed['qc'].to_numpy(), expected['qc'].to_numpy())
+            ):
+                differ = int((streamed['qc'].to_numpy() != expected['qc'].to_numpy()).sum()) if len(streamed) == len(expected) else -1
+                raise AssertionError(f"{step_minutes}-minute readings, chunks of {size} rows: {differ} flags differ")
+            print(f"    chunks of {size:>7} rows: {seconds:7.3f} s, identical flags")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Module: rawstore
+==================
+
+Check and benchmark of the raw series store (modules.rawstore) against CSV on a synthetic
+network of 10-minute readings.
+
+The readings are written as CSV (plain and gzip-compressed) and as a store; the sizes and
+the time to read the whole campaign, the season of one logger and one day of all loggers
+are reported. CSV has no index, so the partial reads parse the whole file and filter it.
+The store must return every reading, at the right time, within half a quantization step.
+
+Usage:
+    python benchmarks/rawstore.py
+    python benchmarks/rawstore.py --loggers 500 --days 120
+
+Functions:
+- timed
+- main
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def timed(read, repeat: int = 3) -> tuple:
+    """
+    Best time of a read.
+
+    Parameters:
+    read : callable
+        Performs the read.
+    repeat : int
+        Number of runs.
+
+    Returns:
+    tuple
+        (seconds of the fastest run, its result)
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = read()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the raw series store against CSV.')
+    parser.add_argument('--loggers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=92)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from synthetic import generate_raw
+    from modules.rawstore import SCALE, write_store
+
+    raw = generate_raw(args.loggers, args.days)
+    print(f"{args.loggers} loggers, {args.days} days: {len(raw)} readings")
+
+    with tempfile.TemporaryDirectory(prefix='hbs_rawstore_') as tmp:
+        tmp = Path(tmp)
+        raw.to_csv(tmp / 'raw.csv', index=False)
+        raw.to_csv(tmp / 'raw.csv.gz', index=False)
+        start = time.perf_counter()
+        store = write_store(pd.read_csv(tmp / 'raw.csv'), tmp / 'store')
+        print(f"store written in {time.perf_counter() - start:.2f} s (from the CSV)")
+        # A logger and a day of the campaign, whatever its size
+        logger = int(store.loggers[min(7, len(store.loggers) - 1)])
+        day = str(store.days[len(store.days) // 2])
+
+        sizes = {
+            'CSV': (tmp / 'raw.csv').stat().st_size,
+            'CSV (gzip)': (tmp / 'raw.csv.gz').stat().st_size,
+            'store': sum(path.stat().st_size for path in (tmp / 'store').iterdir()),
+        }
+        print(f"{'':<12} {'size MB':>9} {'B/reading':>10}")
+        for label, size in sizes.items():
+            print(f"{label:<12} {size / 2 ** 20:9.2f} {size / len(raw):10.2f}")
+
+        def csv_read(path, keep=None):
+            def read():
+                data = pd.read_csv(path, parse_dates=['time'])
+                return data if keep is None else data[keep(data)]
+            return read
+
+        reads = {
+            'campaign': (csv_read(tmp / 'raw.csv'), store.read),
+            'one logger': (
+                csv_read(tmp / 'raw.csv', lambda data: data['logger'] == logger),
+                lambda: store.logger_series(logger),
+            ),
+            'one day': (
+                csv_read(tmp / 'raw.csv', lambda data: data['time'].dt.normalize() == pd.Timestamp(day)),
+                lambda: store.day(day),
+            ),
+        }
+        print(f"{'read':<12} {'CSV s':>9} {'store s':>9} {'speed-up':>9} {'readings':>10}")
+        for label, (csv, stored) in reads.items():
+            csv_seconds, expected = timed(csv, args.repeat)
+            store_seconds, result = timed(stored, args.repeat)
+            expected = expected.sort_values(['logger', 'time'], kind='stable')
+            if not (
+                len(result) == len(expected)
+                and np.array_equal(result['time'].to_numpy(), expected['time'].to_numpy().astype('datetime64[s]'))
+                and np.array_equal(result['logger'].to_numpy(), expected['logger'].to_numpy())
+                # Half a quantization step, plus the resolution of float32
+                and np.abs(result['temperature'].to_numpy() - expected['temperature'].to_numpy()).max() <= SCALE / 2 + 1e-5
+            ):
+                raise AssertionError(f"{label}: store and CSV differ")
+            print(f"{label:<12} {csv_seconds:9.3f} {store_seconds:9.4f} {csv_seconds / store_seconds:8.0f}x {len(result):10d}")
+        print("identical readings (within half a quantization step)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Module: scaling
+==================
+
+Scaling benchmark of every tab for synthetic networks of 10²-10⁵ loggers.
+
+For each network size, the synthetic data files (see synthetic.py) are written to a
+temporary directory and every tab's pipeline is run the way main.py runs it: load the
+files, filter, compute the summaries and build the localized figures. Reported per tab
+are the build time and the size of the figure JSON sent to the browser, with the
+hexagonal level-of-detail mode (modules.hexbin) enabled and, with --no-lod, disabled.
+Caches are cleared before every measurement and the disk-backed artifact store is disabled,
+so the numbers are cold-cache costs.
+
+Usage:
+    python benchmarks/scaling.py
+    python benchmarks/scaling.py --sizes 100 1000 10000 100000 --no-lod --report scaling.md
+
+Functions:
+- run_tab
+- run_scaling
+- format_table
+- main
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+# The synthetic networks are deterministic, so stored artifacts would serve repeated runs
+os.environ['HBS_DISK_CACHE'] = '0'
+
+from content.lang_dict import eng_dict  # noqa: E402
+from modules import api, hexbin, maps, plots, spatial  # noqa: E402
+from synthetic import FILE_NAMES, generate_network, write_network  # noqa: E402
+
+TABS = ['load', 'uhi', 'nearest', 'sdtn', 'landuse', 'evolution', 'fitnah']
+BASEMAP = 'color'
+
+
+def _files(data_dir: Path) -> dict:
+    return {key: data_dir / name for key, name in FILE_NAMES.items()}
+
+
+def run_tab(tab: str, files: dict, frames: dict) -> list:
+    """
+    Run the pipeline of one tab.
+
+    Parameters:
+    tab : str
+        One of TABS.
+    files : dict
+        Key of FILE_NAMES -> path of the written file.
+    frames : dict
+        Loaded files (filled by the 'load' step).
+
+    Returns:
+    list
+        Figures built by the tab.
+    """
+    if tab == 'load':
+        for key, path in files.items():
+            frames[key] = pd.read_csv(path)
+        return []
+
+    if tab == 'uhi':
+        hourly = frames['hourly']
+        hour_data = hourly[hourly['hour'] == 0]
+        return [
+            maps.uhi_ci_map_figure(hour_data, 'uhi', BASEMAP),
+            plots.build_uhi_ci_histogram(hour_data, 'uhi', '00', eng_dict),
+        ]
+
+    if tab == 'nearest':
+        index = spatial.build_logger_index(files['hourly'], files['temp_stats'], files['fitnah'], files['landuse'])
+        stations = frames['hourly'].drop_duplicates('logger')
+        for lon, lat in stations[['x', 'y']].head(100).to_numpy():
+            index.nearest(lon, lat, 5)
+        return []
+
+    if tab == 'sdtn':
+        stations = frames['sdtn'][['Name', 'logger', 'x', 'y']]
+        sdtn_geo = frames['temp_stats'].merge(stations, how='left', on='logger')
+        summary = api.sdtn_summary(sdtn_geo, 'daily_max', 'summer_days', 30.0)
+        return [
+            maps.sdtn_map_figure(summary, BASEMAP),
+            plots.build_tn_sd_histogram(summary, 30.0, eng_dict),
+        ]
+
+    if tab == 'landuse':
+        landuse = frames['landuse']
+        sel = landuse[landuse['buffer'] == 100]
+        return [
+            maps.build_geodata_map(sel, 20, BASEMAP, eng_dict),
+            plots.build_geodata_histogram(sel, 20, 100, eng_dict),
+        ]
+
+    if tab == 'evolution':
+        hourly = frames['hourly']
+        loggers = hourly['logger'].drop_duplicates().head(5)
+        subset = hourly.loc[hourly['logger'].isin(loggers), ['hour', 'logger', 'uhi']]
+        return [plots.build_uhi_ci_evolution(subset, 'uhi', eng_dict)]
+
+    if tab == 'fitnah':
+        fitnah = frames['fitnah']
+        sel = fitnah[(fitnah['buffer'] == 100) & (fitnah['dtype'] == 'fitnah_ss')]
+        return [
+            maps.fitnah_map_figure(sel[maps.FITNAH_MAP_COLUMNS], 'mean', BASEMAP),
+            plots.build_fitnah_histogram(sel, 'mean', 'fitnah_ss', 100, eng_dict),
+        ]
+
+    raise ValueError(f"Unknown tab {tab!r}")
+
+
+def run_scaling(sizes: list, lod_modes: list, days: int, seed: int, vertices: int = 4) -> list:
+    """
+    Measure every tab for every network size and LOD mode.
+
+    Parameters:
+    sizes : list
+        Numbers of loggers.
+    lod_modes : list
+        True (hexagonal bins above hexbin.LOD_THRESHOLD) and/or False (one marker per logger).
+    days : int
+        Campaign length of the synthetic networks.
+    seed : int
+        Random seed.
+    vertices : int
+        Vertices of the synthetic buffer polygons; the tabs do not draw them, so they are
+        kept small to bound the memory use of the largest networks.
+
+    Returns:
+    list
+        Rows with 'loggers', 'lod', 'tab', 'seconds' and 'payload_kb'.
+    """
+    threshold = hexbin.LOD_THRESHOLD
+    rows = []
+    with tempfile.TemporaryDirectory(prefix='hbs_scaling_') as tmp:
+        for n in sizes:
+            data_dir = Path(tmp) / str(n)
+            write_network(generate_network(n, days, seed, vertices), data_dir)
+            files = _files(data_dir)
+            for lod in lod_modes:
+                hexbin.LOD_THRESHOLD = threshold if lod else float('inf')
+                st.cache_data.clear()
+                st.cache_resource.clear()
+                api.clear_caches()
+                frames = {}
+                for tab in TABS:
+                    start = time.perf_counter()
+                    figures = run_tab(tab, files, frames)
+                    seconds = time.perf_counter() - start
+                    payload = sum(len(fig.to_json()) for fig in figures)
+                    rows.append({
+                        'loggers': n, 'lod': lod, 'tab': tab,
+                        'seconds': round(seconds, 4), 'payload_kb': round(payload / 1024, 1),
+                    })
+                    print(f"{n:>7} loggers  lod={str(lod):<5}  {tab:<10} {seconds:8.3f} s  {payload / 1024:10.1f} KB",
+                          flush=True)
+    hexbin.LOD_THRESHOLD = threshold
+    return rows
+
+
+def format_table(rows: list) -> str:
+    """
+    Format the measurements as a markdown table (one row per size, LOD mode and tab).
+
+    Parameters:
+    rows : list
+        Output of run_scaling.
+
+    Returns:
+    str
+        Markdown table.
+    """
+    lines = [
+        '| loggers | LOD | tab | build (s) | payload (KB) |',
+        '|---:|:---:|---|---:|---:|',
+    ]
+    for row in rows:
+        lod = 'on' if row['lod'] else 'off'
+        lines.append(f"| {row['loggers']} | {lod} | {row['tab']} | {row['seconds']:.3f} | {row['payload_kb']:.1f} |")
+    totals = pd.DataFrame(rows).groupby(['loggers', 'lod'])[['seconds', 'payload_kb']].sum()
+    lines += ['', '| loggers | LOD | total build (s) | total payload (KB) |', '|---:|:---:|---:|---:|']
+    for (loggers, lod), total in totals.iterrows():
+        lines.append(f"| {loggers} | {'on' if lod else 'off'} | {total['seconds']:.3f} | {total['payload_kb']:.1f} |")
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Scaling benchmark of every tab for synthetic networks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--days', type=int, default=14, help='Campaign length of the synthetic networks.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vertices', type=int, default=4, help='Vertices of the synthetic buffer polygons.')
+    parser.add_argument('--no-lod', action='store_true', help='Also measure without the level-of-detail mode.')
+    parser.add_argument('--json', type=Path, help='Write the measurements as JSON to this path.')
+    parser.add_argument('--report', type=Path, help='Write the markdown table to this path.')
+    args = parser.parse_args()
+
+    rows = run_scaling(args.sizes, [True, False] if args.no_lod else [True], args.days, args.seed, args.vertices)
+    table = format_table(rows)
+    print()
+    print(table)
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2), encoding='utf-8')
+    if args.report:
+        args.report.write_text(table + '\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Module: singleflight
+==================
+
+Check and benchmark of the request coalescing (modules.singleflight) on a synthetic network.
+
+N threads stand for N sessions opening the default view at the same moment: all of them
+are released together and query the data of the view (hourly UHI at hour 0, the daily
+values and the tropical nights) from empty caches. The run is done once with coalescing
+and once without (as with HBS_SINGLE_FLIGHT=0); the results must be equal, and the wall
+time and the computations of every memoized function are reported.
+
+Usage:
+    python benchmarks/singleflight.py
+    python benchmarks/singleflight.py --sessions 50 --loggers 2000
+
+Functions:
+- open_view
+- run
+- main
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ['HBS_DISK_CACHE'] = '0'
+
+
+def open_view() -> tuple:
+    """
+    Query the data of the default view (Biel, whole summer, hour 0).
+
+    Returns:
+    tuple
+        The queried DataFrames.
+    """
+    from modules import api
+
+    return (
+        api.uhi_by_hour('biel', 'summer', 0),
+        api.daily_stats('biel', 'summer'),
+        api.sdtn_exceedances('biel', 'summer', 'tropical_nights', 20.0),
+    )
+
+
+def run(sessions: int, enabled: bool) -> tuple:
+    """
+    Open the view from the given number of threads at once, from empty caches.
+
+    Parameters:
+    sessions : int
+        Number of concurrent threads.
+    enabled : bool
+        Coalesce concurrent computations.
+
+    Returns:
+    tuple
+        (seconds, results of every thread, single-flight report)
+    """
+    from modules import api, singleflight
+
+    api.clear_caches()
+    for row in singleflight.report():
+        singleflight.group(row['group']).reset()
+    singleflight.ENABLED = enabled
+    barrier = threading.Barrier(sessions)
+    results = [None] * sessions
+
+    def session(i):
+        barrier.wait()
+        results[i] = open_view()
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results, [row for row in singleflight.report() if row['computations']]
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the coalescing of concurrent identical queries.')
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--loggers', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    from synthetic import generate_network, write_network
+
+    with tempfile.TemporaryDirectory(prefix='hbs_singleflight_') as tmp:
+        tmp = Path(tmp)
+        write_network(generate_network(args.loggers, args.days), tmp / 'data' / 'biel')
+        # The data paths of the app are relative to the working directory
+        os.chdir(tmp)
+        print(f"{args.sessions} sessions, {args.loggers} loggers, {args.days} days")
+        outcomes = {}
+        for label, enabled in (('independent', False), ('coalesced', True)):
+            seconds, results, report = run(args.sessions, enabled)
+            outcomes[label] = results
+            computations = sum(row['computations'] for row in report)
+            coalesced = sum(row['coalesced'] for row in report)
+            print(f"{label:<12} {seconds:7.3f} s  {computations:4d} computations  {coalesced:4d} coalesced")
+            for row in report:
+                print(f"    {row['group']:<32} {row['computations']:4d} computed  {row['coalesced']:4d} coalesced"
+                      f"  {row['saved_seconds']:7.3f} s saved")
+        for results in outcomes.values():
+            for result in results:
+                for frame, expected in zip(result, outcomes['independent'][0]):
+                    if not frame.equals(expected):
+                        raise AssertionError("results differ")
+        print("identical results")
+        os.chdir(REPO_DIR)
+
+
+if __name__ == '__main__':
+    main()
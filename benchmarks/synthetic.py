@@ -0,0 +1,310 @@
+"""
+Module: synthetic
+==================
+
+Synthetic sensor networks in the schemas of the app's data files, for scaling tests at
+10²-10⁵ loggers.
+
+Loggers are scattered around the centre of Biel (a dense urban cluster plus a uniform
+rural background). Each logger gets an "urbanity" between 0 and 1 from its distance to
+the centre, which drives its UHI, its daily extremes, its land-use mix and its FITNAH
+values, so that maps and histograms look plausible. Logger 206 is the rural reference,
+as in the real Biel data.
+
+The files are written with the Biel file names, so a generated directory can replace
+data/biel of a copy of the repository (see scaling.py --app-dir).
+
+generate_raw produces the raw high-frequency series of such a network (the input of
+modules.cube, modules.qc and modules.rawstore) instead of the derived files.
+
+Usage:
+    python benchmarks/synthetic.py --loggers 10000 --out /tmp/hbs_synthetic/data/biel
+
+Functions:
+- generate_network
+- write_network
+- generate_raw
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CENTRE = (7.245, 47.137)
+BBOX = (7.17, 47.09, 7.33, 47.19)
+REFERENCE_LOGGER = 206
+FIRST_LOGGER = 201
+BUFFERS = [10, 50, 100, 500]
+# Raster cells within each buffer (land use) and DEM cells (FITNAH count of 'dem')
+LANDUSE_CELLS = {10: 8, 50: 99, 100: 354, 500: 8043}
+FITNAH_CELLS = {10: 121, 50: 2601, 100: 10201, 500: 251001}
+LANDUSE_CODES = [7, 9, 14, 15, 16, 20, 22, 24, 25, 27]
+FITNAH_TYPES = {
+    # dtype: (rural value, urban value, spread)
+    'fitnah_ss': (2.2, 1.2, 0.6),
+    'fitnah_sv': (2.6, 1.8, 0.5),
+    'fitnah_temp': (17.8, 20.0, 0.8),
+    'land_use': (14.0, 23.0, 3.0),
+    'dem': (450.0, 435.0, 15.0),
+}
+FILE_NAMES = {
+    'hourly': 'summer23_hourly_uhi_ci.csv',
+    'temp_stats': 'summer23_temp_stats.csv',
+    'sdtn': 'summer23_sdtn.csv',
+    'hourly_heatwave': 'heatwave_23_hourly_uhi_ci.csv',
+    'temp_stats_heatwave': 'heatwave_23_temp_stats.csv',
+    'sdtn_heatwave': 'heatwave_23_sdtn.csv',
+    'landuse': 'data_viz_land_use.csv',
+    'fitnah': 'data_viz_fitnah.csv',
+}
+METRES_PER_DEGREE = 111_320.0
+
+
+def _stations(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    n_urban = int(n * 0.7)
+    lon = np.concatenate([
+        rng.normal(CENTRE[0], 0.02, n_urban),
+        rng.uniform(BBOX[0], BBOX[2], n - n_urban),
+    ])
+    lat = np.concatenate([
+        rng.normal(CENTRE[1], 0.013, n_urban),
+        rng.uniform(BBOX[1], BBOX[3], n - n_urban),
+    ])
+    loggers = np.arange(FIRST_LOGGER, FIRST_LOGGER + n)
+    dx = (lon - CENTRE[0]) * METRES_PER_DEGREE * np.cos(np.radians(CENTRE[1]))
+    dy = (lat - CENTRE[1]) * METRES_PER_DEGREE
+    urbanity = np.exp(-(dx ** 2 + dy ** 2) / (2 * 1500.0 ** 2))
+    urbanity[loggers == REFERENCE_LOGGER] = 0.0
+    return pd.DataFrame({
+        'logger': loggers,
+        'Name': [f'Synthetic {logger}' for logger in loggers],
+        'x': lon,
+        'y': lat,
+        'urbanity': urbanity,
+    })
+
+
+def _hourly(stations: pd.DataFrame, rng: np.random.Generator, amplitude: float) -> pd.DataFrame:
+    hours = np.arange(24)
+    # Night-time UHI peaks around 22-03h, daytime UHI is small
+    night = 0.5 * (1 + np.cos((hours - 1) / 24 * 2 * np.pi))
+    reference_temp = 21 + 6 * np.cos((hours - 15) / 24 * 2 * np.pi)
+    urbanity = stations['urbanity'].to_numpy()
+    uhi = urbanity[None, :] * amplitude * (0.4 + 0.6 * night[:, None])
+    uhi += rng.normal(0, 0.25, uhi.shape) * (urbanity[None, :] > 0)
+    temperature = reference_temp[:, None] + uhi
+    city_index = temperature - temperature.mean(axis=1, keepdims=True)
+
+    n = len(stations)
+    return pd.DataFrame({
+        'hour': np.repeat(hours, n),
+        'logger': np.tile(stations['logger'].to_numpy(), 24),
+        'uhi': uhi.ravel(),
+        'Name': np.tile(stations['Name'].to_numpy(), 24),
+        'x': np.tile(stations['x'].to_numpy(), 24),
+        'y': np.tile(stations['y'].to_numpy(), 24),
+        'city_index': city_index.ravel(),
+    })
+
+
+def _temp_stats(stations: pd.DataFrame, days: pd.DatetimeIndex, rng: np.random.Generator) -> pd.DataFrame:
+    season = np.sin(np.linspace(0.2, np.pi - 0.2, len(days)))
+    base_max = 22 + 10 * season + rng.normal(0, 2.0, len(days))
+    base_min = 11 + 8 * season + rng.normal(0, 1.5, len(days))
+    urbanity = stations['urbanity'].to_numpy()
+    daily_max = base_max[:, None] + 1.0 * urbanity[None, :] + rng.normal(0, 0.6, (len(days), len(stations)))
+    daily_min = base_min[:, None] + 3.0 * urbanity[None, :] + rng.normal(0, 0.5, (len(days), len(stations)))
+
+    n = len(stations)
+    return pd.DataFrame({
+        'time': np.repeat(days.strftime('%Y-%m-%d').to_numpy(), n),
+        'logger': np.tile(stations['logger'].to_numpy(), len(days)),
+        'daily_max': daily_max.ravel(),
+        'daily_min': daily_min.ravel(),
+        'daily_mean': ((daily_max + daily_min) / 2).ravel(),
+    })
+
+
+def _sdtn(stations: pd.DataFrame, temp_stats: pd.DataFrame) -> pd.DataFrame:
+    counts = temp_stats.assign(
+        summer_days=temp_stats['daily_max'] > 30,
+        tropical_nights=temp_stats['daily_min'] > 20,
+    ).groupby('logger', as_index=False)[['summer_days', 'tropical_nights']].sum()
+    return counts.merge(stations[['logger', 'Name', 'x', 'y']], on='logger')
+
+
+def _circles(lon: np.ndarray, lat: np.ndarray, radius: float, vertices: int) -> list:
+    angles = np.linspace(0, 2 * np.pi, vertices + 1)
+    dlon = radius * np.cos(angles) / (METRES_PER_DEGREE * np.cos(np.radians(CENTRE[1])))
+    dlat = radius * np.sin(angles) / METRES_PER_DEGREE
+    xs = lon[:, None] + dlon[None, :]
+    ys = lat[:, None] + dlat[None, :]
+    return [str(list(zip(x.tolist(), y.tolist()))) for x, y in zip(xs, ys)]
+
+
+def _landuse(stations: pd.DataFrame, rng: np.random.Generator, vertices: int) -> pd.DataFrame:
+    urbanity = stations['urbanity'].to_numpy()
+    # Share of each land-use class: rural classes fade with urbanity, urban ones grow
+    rural = np.array([0.05, 0.45, 0.15, 0.01, 0.01, 0.05, 0.05, 0.05, 0.17, 0.01])
+    urban = np.array([0.01, 0.05, 0.02, 0.00, 0.01, 0.40, 0.35, 0.06, 0.10, 0.00])
+    frames = []
+    for buffer in BUFFERS:
+        shares = (1 - urbanity)[:, None] * rural[None, :] + urbanity[:, None] * urban[None, :]
+        counts = rng.multinomial(LANDUSE_CELLS[buffer], shares / shares.sum(axis=1, keepdims=True))
+        frame = pd.DataFrame(counts, columns=[str(code) for code in LANDUSE_CODES])
+        frame['buffer'] = buffer
+        frame['logger'] = stations['logger'].to_numpy()
+        frame['geometry_coords'] = _circles(stations['x'].to_numpy(), stations['y'].to_numpy(), buffer, vertices)
+        frame['lon'] = stations['x'].to_numpy()
+        frame['lat'] = stations['y'].to_numpy()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _fitnah(stations: pd.DataFrame, rng: np.random.Generator, vertices: int) -> pd.DataFrame:
+    urbanity = stations['urbanity'].to_numpy()
+    n = len(stations)
+    frames = []
+    for buffer in BUFFERS:
+        geometry = _circles(stations['x'].to_numpy(), stations['y'].to_numpy(), buffer, vertices)
+        for dtype, (rural, urban, spread) in FITNAH_TYPES.items():
+            mean = rural + (urban - rural) * urbanity + rng.normal(0, spread / 4, n)
+            half_range = spread * (1 + np.log10(buffer))
+            frames.append(pd.DataFrame({
+                'mean': mean,
+                'max': mean + half_range * rng.uniform(0.5, 1.0, n),
+                'min': mean - half_range * rng.uniform(0.5, 1.0, n),
+                'median': mean + rng.normal(0, spread / 8, n),
+                'count': np.full(n, FITNAH_CELLS[buffer]),
+                'buffer': buffer,
+                'logger': stations['logger'].to_numpy(),
+                'dtype': dtype,
+                'geometry_coords': geometry,
+                'lon': stations['x'].to_numpy(),
+                'lat': stations['y'].to_numpy(),
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate_network(n_loggers: int, days: int = 30, seed: int = 0, vertices: int = 16) -> dict:
+    """
+    Generate every data file of a city for a synthetic network.
+
+    Parameters:
+    n_loggers : int
+        Number of loggers (at least 6, so that the reference logger 206 exists).
+    days : int
+        Length of the summer campaign; the heatwave covers the warmest 10 days of it.
+    seed : int
+        Random seed.
+    vertices : int
+        Vertices of the buffer polygons in 'geometry_coords' (the real files use 64).
+
+    Returns:
+    dict
+        Key of FILE_NAMES -> DataFrame.
+    """
+    rng = np.random.default_rng(seed)
+    stations = _stations(max(n_loggers, REFERENCE_LOGGER - FIRST_LOGGER + 1), rng)
+    summer_days = pd.date_range('2023-06-01', periods=days, freq='D')
+    temp_stats = _temp_stats(stations, summer_days, rng)
+
+    warmest = temp_stats.groupby('time')['daily_max'].mean().nlargest(min(10, days)).index
+    temp_stats_heatwave = temp_stats[temp_stats['time'].isin(warmest)].reset_index(drop=True)
+
+    return {
+        'hourly': _hourly(stations, rng, amplitude=3.0),
+        'temp_stats': temp_stats,
+        'sdtn': _sdtn(stations, temp_stats),
+        'hourly_heatwave': _hourly(stations, rng, amplitude=4.0),
+        'temp_stats_heatwave': temp_stats_heatwave,
+        'sdtn_heatwave': _sdtn(stations, temp_stats_heatwave),
+        'landuse': _landuse(stations, rng, vertices),
+        'fitnah': _fitnah(stations, rng, vertices),
+    }
+
+
+def write_network(network: dict, out_dir: Path) -> None:
+    """
+    Write a generated network with the file names of the Biel data.
+
+    Parameters:
+    network : dict
+        Output of generate_network.
+    out_dir : Path
+        Target directory (e.g. <copy of the repository>/data/biel).
+
+    Returns:
+    None
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for key, frame in network.items():
+        # The real hourly / stats / SD-TN files carry a leading index column
+        index = key not in ('landuse', 'fitnah')
+        frame.to_csv(out_dir / FILE_NAMES[key], index=index)
+
+
+def generate_raw(n_loggers: int, days: int = 30, step_minutes: int = 10, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate the raw readings of a synthetic network.
+
+    Every logger reads every step_minutes with a resolution of 0.001 °C (as the loggers
+    of the campaigns do); about 0.5 % of the readings are missing and every tenth logger
+    has an outage of a few hours.
+
+    Parameters:
+    n_loggers : int
+        Number of loggers.
+    days : int
+        Length of the campaign.
+    step_minutes : int
+        Interval of the readings.
+    seed : int
+        Random seed.
+
+    Returns:
+    pd.DataFrame
+        'time' (ISO strings), 'logger' and 'temperature', ordered by time, then logger.
+    """
+    rng = np.random.default_rng(seed)
+    stations = _stations(max(n_loggers, REFERENCE_LOGGER - FIRST_LOGGER + 1), rng)
+    times = pd.date_range('2023-06-01', periods=days * 24 * 60 // step_minutes, freq=f'{step_minutes}min')
+    hours = (times.hour + times.minute / 60).to_numpy()
+    season = np.sin(np.linspace(0.2, np.pi - 0.2, len(times)))
+    weather = np.repeat(rng.normal(0, 2.0, days), len(times) // days + 1)[:len(times)]
+    reference = 14 + 8 * season + weather + 6 * np.cos((hours - 15) / 24 * 2 * np.pi)
+    night = 0.5 * (1 + np.cos((hours - 1) / 24 * 2 * np.pi))
+    urbanity = stations['urbanity'].to_numpy()
+
+    temperature = reference[:, None] + urbanity[None, :] * 3.0 * (0.4 + 0.6 * night[:, None])
+    # Slowly varying sensor noise: a random walk pulled back to zero
+    noise = rng.normal(0, 0.08, temperature.shape)
+    for i in range(1, len(times)):
+        noise[i] += 0.9 * noise[i - 1]
+    temperature = np.round(temperature + noise, 3)
+    temperature[rng.random(temperature.shape) < 0.005] = np.nan
+    for col in range(0, temperature.shape[1], 10):
+        start = rng.integers(len(times))
+        temperature[start:start + rng.integers(6, 36), col] = np.nan
+
+    n = temperature.shape[1]
+    raw = pd.DataFrame({
+        'time': np.repeat(times.strftime('%Y-%m-%d %H:%M:%S').to_numpy(), n),
+        'logger': np.tile(stations['logger'].to_numpy(), len(times)),
+        'temperature': temperature.ravel(),
+    })
+    return raw.dropna(subset=['temperature']).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic sensor network in the app schemas.')
+    parser.add_argument('--loggers', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=Path, required=True, help='Output directory, e.g. <repo copy>/data/biel')
+    args = parser.parse_args()
+    write_network(generate_network(args.loggers, args.days, args.seed), args.out)
+    print(f"{args.loggers} loggers -> {args.out}")
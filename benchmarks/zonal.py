@@ -0,0 +1,149 @@
+"""
+Module: zonal
+==================
+
+Check and benchmark of the zonal-statistics engine (modules.zonal) on synthetic rasters.
+
+A smooth synthetic DEM-like raster and a categorical land-use raster are written around
+Biel in LV95 with random nodata holes, and loggers are scattered over (and partly
+beyond) them. The batched statistics of every (logger, radius) pair are compared with a
+straightforward per-logger, per-radius computation, and both are timed.
+
+Usage:
+    python benchmarks/zonal.py
+    python benchmarks/zonal.py --loggers 1000 --cell-size 2 --radii 10 50 100 250 500
+
+Functions:
+- synthetic_raster
+- naive_stats
+- main
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from modules import zonal  # noqa: E402
+
+BBOX = (7.17, 47.09, 7.33, 47.19)
+LANDUSE_CODES = [7, 9, 14, 15, 16, 20, 22, 24, 25, 27]
+NODATA = -9999.0
+
+
+def synthetic_raster(cell_size: float, categorical: bool, seed: int = 0) -> tuple:
+    """
+    Synthetic raster covering BBOX in LV95.
+
+    Parameters:
+    cell_size : float
+        Cell size in metres.
+    categorical : bool
+        Land-use class codes instead of a continuous surface.
+    seed : int
+        Random seed.
+
+    Returns:
+    tuple
+        (values, origin) as accepted by zonal.write_raster.
+    """
+    rng = np.random.default_rng(seed)
+    east, north = zonal.wgs84_to_swiss(np.array(BBOX[::2]), np.array(BBOX[1::2]))
+    n_rows = int((north[1] - north[0]) / cell_size)
+    n_cols = int((east[1] - east[0]) / cell_size)
+    y = np.linspace(0, 6 * np.pi, n_rows)[:, None]
+    x = np.linspace(0, 8 * np.pi, n_cols)[None, :]
+    surface = (430 + 20 * np.sin(x) * np.cos(y)).astype(np.float32)
+    surface += rng.normal(0, 1, surface.shape).astype(np.float32)
+    if categorical:
+        bins = np.quantile(surface, np.linspace(0, 1, len(LANDUSE_CODES) + 1)[1:-1])
+        surface = np.asarray(LANDUSE_CODES, dtype=np.float32)[np.digitize(surface, bins)]
+    surface[rng.random(surface.shape) < 0.01] = NODATA
+    return surface, (east[0], north[1])
+
+
+def naive_stats(raster: zonal.Raster, lon: float, lat: float, radius: float) -> dict:
+    """
+    Statistics of one buffer from the cell-centre distances of a bounding box.
+    """
+    east, north = zonal.wgs84_to_swiss(lon, lat, raster.crs)
+    size = raster.cell_size
+    row = int(np.floor((raster.y_max - north) / size))
+    col = int(np.floor((east - raster.x_min) / size))
+    # Centre of the logger's cell; buffers contain the cells whose centre is within the radius
+    cx, cy = raster.x_min + (col + 0.5) * size, raster.y_max - (row + 0.5) * size
+    half = int(radius // size) + 1
+    values = []
+    for r in range(max(row - half, 0), min(row + half + 1, raster.values.shape[0])):
+        for c in range(max(col - half, 0), min(col + half + 1, raster.values.shape[1])):
+            x, y = raster.x_min + (c + 0.5) * size, raster.y_max - (r + 0.5) * size
+            value = raster.values[r, c]
+            if (x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2 + 1e-6 and value != NODATA:
+                values.append(value)
+    values = np.array(values, dtype=float)
+    if len(values) == 0:
+        return {'mean': np.nan, 'max': np.nan, 'min': np.nan, 'median': np.nan, 'count': 0}
+    return {'mean': values.mean(), 'max': values.max(), 'min': values.min(),
+            'median': np.median(values), 'count': len(values)}
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Check and benchmark the zonal-statistics engine.')
+    parser.add_argument('--loggers', type=int, default=200)
+    parser.add_argument('--cell-size', type=float, default=5.0)
+    parser.add_argument('--radii', type=float, nargs='+', default=[10, 25, 50, 100, 250])
+    parser.add_argument('--check', type=int, default=20, help='Number of loggers compared with the naive computation.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # A margin around the raster puts some buffers partly or fully outside of it
+    lon = rng.uniform(BBOX[0] - 0.005, BBOX[2] + 0.005, args.loggers)
+    lat = rng.uniform(BBOX[1] - 0.005, BBOX[3] + 0.005, args.loggers)
+    loggers = np.arange(args.loggers)
+
+    with tempfile.TemporaryDirectory(prefix='hbs_zonal_') as tmp:
+        values, origin = synthetic_raster(args.cell_size, categorical=False, seed=args.seed)
+        raster = zonal.write_raster(values, Path(tmp) / 'dem.npy', origin, args.cell_size, nodata=NODATA)
+        print(f"raster {values.shape[0]} x {values.shape[1]} cells of {args.cell_size} m")
+
+        start = time.perf_counter()
+        stats = zonal.zonal_stats(raster, loggers, lon, lat, args.radii)
+        batch_s = time.perf_counter() - start
+        print(f"batched: {args.loggers} loggers x {len(args.radii)} radii in {batch_s:.3f} s")
+
+        start = time.perf_counter()
+        checked = stats.set_index(['buffer', 'logger'])
+        for logger in loggers[:args.check]:
+            for radius in args.radii:
+                expected = naive_stats(raster, lon[logger], lat[logger], radius)
+                buffer = int(radius) if float(radius).is_integer() else radius
+                got = checked.loc[(buffer, logger)]
+                for key, value in expected.items():
+                    if not np.isclose(got[key], value, equal_nan=True, rtol=1e-5):
+                        raise AssertionError(f"logger {logger}, radius {radius}, {key}: {got[key]} != {value}")
+        naive_s = time.perf_counter() - start
+        print(f"naive:   {min(args.check, args.loggers)} loggers x {len(args.radii)} radii in {naive_s:.3f} s (results match)")
+
+        values, origin = synthetic_raster(args.cell_size, categorical=True, seed=args.seed)
+        raster = zonal.write_raster(values, Path(tmp) / 'land_use.npy', origin, args.cell_size, nodata=NODATA)
+        start = time.perf_counter()
+        counts = zonal.zonal_class_counts(raster, loggers, lon, lat, args.radii, LANDUSE_CODES)
+        print(f"classes: {args.loggers} loggers x {len(args.radii)} radii in {time.perf_counter() - start:.3f} s")
+        class_total = counts[[str(code) for code in LANDUSE_CODES]].sum(axis=1).to_numpy()
+        # Every valid cell of a buffer belongs to exactly one class (same nodata holes as the DEM)
+        if not np.array_equal(class_total, stats['count'].to_numpy()):
+            raise AssertionError("class counts do not add up to the valid cells of the buffers")
+
+
+if __name__ == '__main__':
+    main()
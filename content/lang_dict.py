@@ -59,6 +59,61 @@ eng_dict = {
             _Note: Full translations, such as on charts, are not yet complete._""",
     'frequency': 'Frequency',
     'hourly_evol_title': 'Hourly evolution of selected loggers for:',
+    'nearest_t': 'Query the nearest loggers to a location',
+    'nearest_info': 'Click a station on the map or type a coordinate to see the nearest loggers and their data.',
+    'nearest_lon': 'Longitude',
+    'nearest_lat': 'Latitude',
+    'nearest_k': 'Number of loggers',
+    'nearest_select': 'Show the history of logger',
+    'fitnah_missing': 'No FITNAH model data is available for this city.',
+    'reference': 'Reference logger of the UHI',
+    'condition_select': 'Only hours with these weather conditions',
+    'conditions': {'calm': 'Calm (wind < 2 m/s)', 'windy': 'Windy (wind ≥ 4 m/s)', 'clear': 'Clear (≤ 2/8 clouds)',
+                   'overcast': 'Overcast (≥ 6/8 clouds)', 'night': 'Night (no sun)', 'sunny': 'Sunny (≥ 400 W/m²)'},
+    'meteo_missing': 'Requires the day-by-day data and a local weather series for this city.',
+    'meteo_matches': 'Averaged over up to {n} matching hours per station.',
+    'evol_band': 'Spread across days',
+    'evol_band_choice': {'none': 'None', 'p25_75': '25th-75th percentile', 'p10_90': '10th-90th percentile'},
+    'evol_day': 'Overlay a single day',
+    'cube_missing': 'Day-by-day data has not been built for this city; spread and single days are unavailable.',
+    'zonal_custom': 'Any buffer radius',
+    'zonal_radius': 'Buffer radius (m)',
+    'raster_missing': 'Requires a local raster of this layer for this city.',
+    'qc_t': 'Data quality per logger',
+    'qc_info': 'Share of hours (%) with flagged readings: spikes, flatlines, level steps, gaps and disagreement with the nearest loggers. Flagged readings are left out of the spread and single-day profiles.',
+    'qc_missing': 'Requires day-by-day data built from quality-controlled series.',
+    'export_t': 'Export data',
+    'export_info': 'Downloads the data of the current selection. Files are written in chunks, so large selections do not slow down the app.',
+    'export_dataset': 'Data',
+    'export_choice': {
+        'uhi': 'Hourly UHI / City Index', 'daily': 'Daily temperatures', 'sdtn': 'Days above threshold per station',
+        'landuse': 'Land use', 'fitnah': 'FITNAH',
+    },
+    'export_loggers': 'Loggers (all if empty)',
+    'export_days': 'Date window',
+    'export_format': 'Format',
+    'export_prepare': 'Prepare file',
+    'export_download': 'Download {name}',
+    'export_too_large': 'The selection is larger than {mb:.0f} MB. Restrict it to fewer loggers or days, or export it with `python -m modules.export`.',
+    'cluster_t': 'Types of stations',
+    'cluster_info': 'Groups the loggers by the shape of their mean 24-hour profile over the period, e.g. urban sites that stay warm at night, lakeside or park sites and rural sites. Group 1 has the warmest mean profile.',
+    'cluster_method': 'Method',
+    'cluster_method_choice': {'ward': 'Hierarchical (Ward)', 'kmeans': 'k-means'},
+    'cluster_k': 'Number of groups',
+    'cluster_label': 'Group',
+    'cluster_share': 'Share of loggers',
+    'cluster_size': 'Loggers',
+    'cluster_profiles': 'Mean daily profile per group',
+    'hw_criteria': 'Heat episodes',
+    'hw_info': 'Episodes are runs of consecutive days on which the median of all loggers meets the criteria. They are offered as periods below.',
+    'hw_days': 'Minimum consecutive days',
+    'hw_tmax': 'Daily maximum at least (°C)',
+    'hw_tmin': 'Daily minimum at least (°C, optional)',
+    'hw_found': '{n} episodes detected',
+    'episode_label': 'Episode {n}: {first} – {last}',
+    'episode_cube_missing': 'Day-by-day data has not been built for this city; the hourly UHI / City Index of an episode is unavailable.',
+    'hw_cube_missing': 'Heat episodes need the day-by-day data of the campaign (`python -m modules.cube`), which has not been built for this city.',
+    'hourly_empty': 'No hourly values are available for this selection.',
 }
 
 de_dict = {
@@ -132,6 +187,62 @@ de_dict = {
             _Hinweis: Die vollständige Übersetzung, z. B. bei Diagrammen, ist noch nicht abgeschlossen._
             """,
     'frequency': 'Frequenz',
+    'hourly_evol_title': 'Stündliche Entwicklung der ausgewählten Logger für:',
+    'fitnah_missing': 'Für diese Stadt sind keine FITNAH-Modelldaten verfügbar.',
+    'nearest_t': 'Nächstgelegene Logger zu einem Ort abfragen',
+    'nearest_info': 'Klicken Sie auf eine Station in der Karte oder geben Sie eine Koordinate ein, um die nächstgelegenen Logger und ihre Daten anzuzeigen.',
+    'nearest_lon': 'Längengrad',
+    'nearest_lat': 'Breitengrad',
+    'nearest_k': 'Anzahl Logger',
+    'nearest_select': 'Verlauf des Loggers anzeigen',
+    'reference': 'Referenzlogger der UHI',
+    'condition_select': 'Nur Stunden mit diesen Wetterbedingungen',
+    'conditions': {'calm': 'Windstill (Wind < 2 m/s)', 'windy': 'Windig (Wind ≥ 4 m/s)', 'clear': 'Klar (≤ 2/8 Bewölkung)',
+                   'overcast': 'Bedeckt (≥ 6/8 Bewölkung)', 'night': 'Nacht (keine Sonne)', 'sunny': 'Sonnig (≥ 400 W/m²)'},
+    'meteo_missing': 'Benötigt die Tageswerte und eine lokale Wetterreihe für diese Stadt.',
+    'meteo_matches': 'Gemittelt über bis zu {n} passende Stunden pro Station.',
+    'evol_band': 'Streuung über die Tage',
+    'evol_band_choice': {'none': 'Keine', 'p25_75': '25.-75. Perzentil', 'p10_90': '10.-90. Perzentil'},
+    'evol_day': 'Einzelnen Tag einblenden',
+    'cube_missing': 'Für diese Stadt wurden keine Tageswerte aufbereitet; Streuung und Einzeltage sind nicht verfügbar.',
+    'zonal_custom': 'Beliebiger Buffer-Radius',
+    'zonal_radius': 'Buffer-Radius (m)',
+    'raster_missing': 'Benötigt ein lokales Raster dieser Ebene für diese Stadt.',
+    'qc_t': 'Datenqualität pro Logger',
+    'qc_info': 'Anteil Stunden (%) mit markierten Messwerten: Ausreisser, konstante Werte, Niveausprünge, Lücken und Abweichungen von den nächsten Loggern. Markierte Messwerte fliessen nicht in Streuung und Einzeltage ein.',
+    'qc_missing': 'Benötigt Tageswerte aus qualitätsgeprüften Messreihen.',
+    'export_t': 'Daten exportieren',
+    'export_info': 'Lädt die Daten der aktuellen Auswahl herunter. Die Dateien werden stückweise geschrieben, sodass grosse Auswahlen die App nicht verlangsamen.',
+    'export_dataset': 'Daten',
+    'export_choice': {
+        'uhi': 'Stündliche UHI / City Index', 'daily': 'Tagestemperaturen', 'sdtn': 'Tage über dem Schwellenwert pro Station',
+        'landuse': 'Landnutzung', 'fitnah': 'FITNAH',
+    },
+    'export_loggers': 'Logger (alle, falls leer)',
+    'export_days': 'Zeitfenster',
+    'export_format': 'Format',
+    'export_prepare': 'Datei vorbereiten',
+    'export_download': '{name} herunterladen',
+    'export_too_large': 'Die Auswahl ist grösser als {mb:.0f} MB. Schränken Sie sie auf weniger Logger oder Tage ein, oder exportieren Sie sie mit `python -m modules.export`.',
+    'cluster_t': 'Stationstypen',
+    'cluster_info': 'Gruppiert die Logger nach der Form ihres mittleren 24-Stunden-Verlaufs über die Periode, z. B. städtische Standorte, die nachts warm bleiben, Standorte am See oder in Parks und ländliche Standorte. Gruppe 1 hat den wärmsten mittleren Verlauf.',
+    'cluster_method': 'Methode',
+    'cluster_method_choice': {'ward': 'Hierarchisch (Ward)', 'kmeans': 'k-Means'},
+    'cluster_k': 'Anzahl Gruppen',
+    'cluster_label': 'Gruppe',
+    'cluster_share': 'Anteil Logger',
+    'cluster_size': 'Logger',
+    'cluster_profiles': 'Mittlerer Tagesverlauf pro Gruppe',
+    'hw_criteria': 'Hitzeepisoden',
+    'hw_info': 'Episoden sind Folgen aufeinanderfolgender Tage, an denen der Median aller Logger die Kriterien erfüllt. Sie stehen unten als Zeiträume zur Auswahl.',
+    'hw_days': 'Mindestanzahl aufeinanderfolgender Tage',
+    'hw_tmax': 'Tagesmaximum mindestens (°C)',
+    'hw_tmin': 'Tagesminimum mindestens (°C, optional)',
+    'hw_found': '{n} Episoden gefunden',
+    'episode_label': 'Episode {n}: {first} – {last}',
+    'episode_cube_missing': 'Für diese Stadt wurden keine Tageswerte aufbereitet; stündliche UHI / City Index einer Episode sind nicht verfügbar.',
+    'hw_cube_missing': 'Hitzeepisoden benötigen die Tageswerte der Kampagne (`python -m modules.cube`), die für diese Stadt nicht aufbereitet wurden.',
+    'hourly_empty': 'Für diese Auswahl sind keine Stundenwerte verfügbar.',
 
 }
 fr_dict = {
@@ -202,6 +313,62 @@ fr_dict = {
     'welcome_message': """**Sélectionnez une langue ci-dessous** et cliquez sur le texte de bienvenue pour en savoir plus sur le projet.
             Sinon, explorez librement chaque onglet !
             _Remarque : Les traductions complètes, notamment sur les graphiques, ne sont pas encore terminées._""",
-    'frequency': 'fréquence'
+    'frequency': 'fréquence',
+    'hourly_evol_title': 'Évolution horaire des enregistreurs sélectionnés pour :',
+    'fitnah_missing': 'Aucune donnée du modèle FITNAH n’est disponible pour cette ville.',
+    'nearest_t': 'Rechercher les enregistreurs les plus proches d’un lieu',
+    'nearest_info': 'Cliquez sur une station de la carte ou saisissez une coordonnée pour voir les enregistreurs les plus proches et leurs données.',
+    'nearest_lon': 'Longitude',
+    'nearest_lat': 'Latitude',
+    'nearest_k': 'Nombre d’enregistreurs',
+    'nearest_select': 'Afficher l’historique de l’enregistreur',
+    'reference': 'Enregistreur de référence de l’UHI',
+    'condition_select': 'Uniquement les heures avec ces conditions météo',
+    'conditions': {'calm': 'Calme (vent < 2 m/s)', 'windy': 'Venteux (vent ≥ 4 m/s)', 'clear': 'Dégagé (≤ 2/8 de nuages)',
+                   'overcast': 'Couvert (≥ 6/8 de nuages)', 'night': 'Nuit (pas de soleil)', 'sunny': 'Ensoleillé (≥ 400 W/m²)'},
+    'meteo_missing': 'Nécessite les données journalières et une série météo locale pour cette ville.',
+    'meteo_matches': 'Moyenne sur au plus {n} heures correspondantes par station.',
+    'evol_band': 'Dispersion entre les jours',
+    'evol_band_choice': {'none': 'Aucune', 'p25_75': '25e-75e centile', 'p10_90': '10e-90e centile'},
+    'evol_day': 'Superposer un seul jour',
+    'cube_missing': 'Les données journalières n’ont pas été préparées pour cette ville ; dispersion et jours individuels indisponibles.',
+    'zonal_custom': 'Rayon de buffer libre',
+    'zonal_radius': 'Rayon du buffer (m)',
+    'raster_missing': 'Nécessite un raster local de cette couche pour cette ville.',
+    'qc_t': 'Qualité des données par logger',
+    'qc_info': 'Part des heures (%) avec des mesures signalées : pics, valeurs constantes, sauts de niveau, lacunes et écarts avec les loggers voisins. Les mesures signalées sont exclues de la dispersion et des profils journaliers.',
+    'qc_missing': 'Nécessite des données journalières issues de séries contrôlées.',
+    'export_t': 'Exporter les données',
+    'export_info': 'Télécharge les données de la sélection actuelle. Les fichiers sont écrits par morceaux, les grandes sélections ne ralentissent donc pas l’application.',
+    'export_dataset': 'Données',
+    'export_choice': {
+        'uhi': 'UHI / City Index horaires', 'daily': 'Températures journalières', 'sdtn': 'Jours au-dessus du seuil par station',
+        'landuse': 'Utilisation du sol', 'fitnah': 'FITNAH',
+    },
+    'export_loggers': 'Loggers (tous si vide)',
+    'export_days': 'Période',
+    'export_format': 'Format',
+    'export_prepare': 'Préparer le fichier',
+    'export_download': 'Télécharger {name}',
+    'export_too_large': 'La sélection dépasse {mb:.0f} Mo. Limitez-la à moins de loggers ou de jours, ou exportez-la avec `python -m modules.export`.',
+    'cluster_t': 'Types de stations',
+    'cluster_info': 'Regroupe les loggers selon la forme de leur profil moyen sur 24 heures pendant la période, p. ex. sites urbains qui restent chauds la nuit, sites au bord du lac ou dans des parcs et sites ruraux. Le groupe 1 a le profil moyen le plus chaud.',
+    'cluster_method': 'Méthode',
+    'cluster_method_choice': {'ward': 'Hiérarchique (Ward)', 'kmeans': 'k-moyennes'},
+    'cluster_k': 'Nombre de groupes',
+    'cluster_label': 'Groupe',
+    'cluster_share': 'Part des loggers',
+    'cluster_size': 'Loggers',
+    'cluster_profiles': 'Profil journalier moyen par groupe',
+    'hw_criteria': 'Épisodes de chaleur',
+    'hw_info': 'Les épisodes sont des suites de jours consécutifs où la médiane de tous les capteurs remplit les critères. Ils sont proposés comme périodes ci-dessous.',
+    'hw_days': 'Nombre minimal de jours consécutifs',
+    'hw_tmax': 'Maximum journalier d’au moins (°C)',
+    'hw_tmin': 'Minimum journalier d’au moins (°C, facultatif)',
+    'hw_found': '{n} épisodes détectés',
+    'episode_label': 'Épisode {n} : {first} – {last}',
+    'episode_cube_missing': 'Les données journalières n’ont pas été préparées pour cette ville ; UHI / City Index horaires d’un épisode indisponibles.',
+    'hw_cube_missing': 'Les épisodes de chaleur nécessitent les données journalières de la campagne (`python -m modules.cube`), qui n’ont pas été préparées pour cette ville.',
+    'hourly_empty': 'Aucune valeur horaire n’est disponible pour cette sélection.',
 
 }
@@ -8,22 +8,43 @@ modules defined in this project.
 
 Functions:
 - main: Sets up the app interface and coordinates the tabs for data visualization.
+- render_page: Renders the selectors and the tabs below the page header.
+- memory_admin: Shows the memory accounting of the server process (admin view).
+- period_selector: Offers the whole summer, the main heatwave and every detected heat episode.
 - uhi_city_index: Visualizes Urban Heat Island and City Index data using maps and histograms.
 - tn_sd: Visualizes Summer Days and Tropical Nights data with adjustable thresholds.
 - hourly_evolution: Displays the hourly evolution of UHI or City Index values.
+- profile_clusters: Groups the loggers by their 24-hour profile on a map with the mean profile per group.
 - fitnah_tab: Renders visualizations of Fitnah data using maps and histograms.
 - tab_explore_geodata: Explores geospatial data for selected buffers and types.
-
+- nearest_loggers: Resolves a map click or typed coordinate to the nearest loggers and their data.
+- reference_selector: Lets the user choose the reference logger of the UHI.
+- condition_selector: Lets the user restrict the UHI to hours with given weather conditions.
+- custom_radius: Lets the user choose any buffer radius when a local raster is available.
+- export_panel: Offers the data of a tab's current selection for download as CSV or Parquet.
+- prefetch_adjacent: Warms the selections the user is likely to open next in the background.
+- view_key: Identifies a tab's selection, so that sessions showing the same view share its figures.
+
+The tabs are thin consumers of the headless query API (modules.api): they read the
+widgets, query the data by city and period, and draw. Heavy dependencies (pandas, Plotly
+and the plotting modules) are imported lazily by the tabs through
+modules.startup.lazy_import, so the page header is sent before they load.
 """
 
 
 import streamlit as st
-import pandas as pd
-from pathlib import Path
-import ast
-from modules.maps import plot_geodata, plot_fitnah_map, plot_uhi_ci_map, sdtn_map
-from modules.plots import geodata_histogram, plot_fitnah_histogram, plot_uhi_ci_histogram, tn_sd_histogram, plot_uhi_ci_evolution
-from modules.structure import get_files, get_lang_dict, load_markdown
+from modules.startup import PROFILE_STARTUP, lazy_import, render_report, start_warm_up, startup_report, timed_render
+from modules.structure import (
+    BASEMAPS, PERIODS, REFERENCE_LOGGERS, episode_days, get_cube_dir, get_files, get_lang_dict, get_meteo_path,
+    load_markdown,
+)
+
+WARM_UP_SELECTIONS = (
+    ('biel', 'summer'),
+    ('biel', 'heatwave'),
+    ('bern', 'summer'),
+    ('bern', 'heatwave'),
+)
 
 
 # -------------------------------------------------------------------
@@ -44,20 +65,42 @@ def main() -> None:
         page_icon="🌞",
         layout="wide"
     )
+    start_warm_up(WARM_UP_SELECTIONS)
     langdict = get_lang_dict()
     st.title(langdict['welcome_t'])
     st.markdown(langdict['welcome_message'])
+    memory = lazy_import('modules.memory')
+    memory.register_metrics()
+    with memory.track_rerun():
+        render_page(langdict)
+    if memory.ADMIN:
+        memory_admin(memory)
+
+
+def render_page(langdict: dict) -> None:
+    """
+    Renders the selectors and the tabs below the page header.
+
+    Parameters:
+    langdict : dict
+        Language dictionary for localization.
+
+    Returns:
+    None
+    """
+
     m1, m2, m3 = st.columns([1,1,2])
     with m1:
-        city = st.radio(langdict['city'], ['biel', 'bern'], horizontal=True)
+        city = st.radio(langdict['city'], ['biel', 'bern'], key='city_selector', horizontal=True)
     with m2:
-        period = st.radio(langdict['period'], langdict['period_choice'], horizontal=True)
+        period = period_selector(city, langdict)
     with m3:
-        basemap = st.radio(langdict['basemap'], langdict['map_choice'], horizontal=True)
+        basemap_labels = dict(zip(BASEMAPS, langdict['map_choice']))
+        basemap = st.radio(
+            langdict['basemap'], BASEMAPS, format_func=basemap_labels.get, key='basemap_selector', horizontal=True
+        )
     st.info(langdict['date_info'])
-    lu_path, f_path, u_path, tpath, spath = get_files(city, period)
-    year = '23' if city == 'biel' else '22'
-    sdtn_path = Path.cwd() / 'data' / city / f'summer{year}_sdtn.csv'
+    lu_path, f_path, u_path, tpath, _ = get_files(city, period)
 
     # Create tabs
 
@@ -68,72 +111,509 @@ def main() -> None:
     # -------------------------------------------------------------------
 
     with tab_station_map:
-        uhi_city_index(u_path, basemap, langdict)
+        with timed_render("render tab: UHI & City Index"):
+            clicked = uhi_city_index(city, period, basemap, langdict)
+            spatial = lazy_import('modules.spatial')
+            logger_index = spatial.build_logger_index(u_path, tpath, f_path, lu_path)
+            nearest_loggers(logger_index, clicked, langdict)
 
     with tab_tn_sd:
-        tn_sd(sdtn_path, tpath, basemap, langdict)
+        with timed_render("render tab: SD / TN"):
+            tn_sd(city, period, basemap, langdict)
     st.subheader(langdict['uhi_title'])
 
     with tab_geo_map:
-        tab_explore_geodata(lu_path, basemap, langdict)
+        with timed_render("render tab: land use"):
+            tab_explore_geodata(city, basemap, langdict)
 
     with tab_hourly_evolution:
-        hourly_evolution(u_path, langdict)
+        with timed_render("render tab: hourly evolution"):
+            hourly_evolution(city, period, basemap, langdict)
 
     with tab_fitnah_map:
-        fitnah_tab(f_path, basemap, langdict)
+        with timed_render("render tab: FITNAH"):
+            fitnah_tab(city, basemap, langdict)
 
     with tab_explanation:
         st.markdown(load_markdown(langdict['welcome_md']))
 
+    prefetch_adjacent(city, period, basemap)
+
+    if PROFILE_STARTUP:
+        with st.sidebar:
+            st.markdown("#### Startup profile")
+            st.dataframe(startup_report(), hide_index=True)
+            st.markdown("#### Render times")
+            st.dataframe(render_report()[-20:], hide_index=True)
+            st.markdown("#### Panels")
+            st.dataframe(lazy_import('modules.panels').panel_report(), hide_index=True)
+            st.markdown("#### Prefetch")
+            st.dataframe([lazy_import('modules.prefetch').get_prefetcher().stats()], hide_index=True)
+            st.markdown("#### Single flight")
+            st.dataframe(lazy_import('modules.singleflight').report(coalesced_only=True), hide_index=True)
+
+
+def period_selector(city: str, langdict: dict) -> str:
+    """
+    Offers the whole summer, the main heatwave and every heat episode detected with the
+    criteria of the popover (see modules.heatwaves). Episodes are only offered if the
+    campaign cube has been built, as their hourly values are taken from it.
+
+    Parameters:
+    city : str
+        Selected city.
+    langdict : dict
+        Language dictionary for localization.
+
+    Returns:
+    str
+        Selected period key.
+    """
+
+    with st.popover(langdict['hw_criteria']):
+        st.caption(langdict['hw_info'])
+        min_days = st.slider(langdict['hw_days'], min_value=1, max_value=10, value=3, key='hw_min_days')
+        tmax = st.slider(langdict['hw_tmax'], min_value=20.0, max_value=38.0, value=30.0, step=0.5, key='hw_tmax')
+        tmin = st.number_input(langdict['hw_tmin'], min_value=10.0, max_value=30.0, value=None, step=0.5, key='hw_tmin')
+        if lazy_import('modules.cube').open_cube(get_cube_dir(city)) is None:
+            st.caption(langdict['hw_cube_missing'])
+            episodes = None
+        else:
+            episodes = lazy_import('modules.api').heatwaves(city, min_days, tmax, tmin)
+            st.caption(langdict['hw_found'].format(n=len(episodes)))
+
+    # Widgets return language-independent keys; only the displayed labels are localized
+    labels = dict(zip(PERIODS, langdict['period_choice']))
+    for n, row in episodes.iterrows() if episodes is not None else ():
+        first, last = (f"{day[8:10]}.{day[5:7]}." for day in (row['first'], row['last']))
+        labels[row['period']] = langdict['episode_label'].format(n=n, first=first, last=last)
+    options = list(labels)
+    # The options change with the city and the criteria; keep the selection while it is offered
+    current = st.session_state.get('period_selector')
+    st.session_state['period_selector'] = current if current in options else PERIODS[0]
+    return st.radio(langdict['period'], options, format_func=labels.get, key='period_selector', horizontal=True)
+
+
+def memory_admin(memory) -> None:
+    """
+    Shows the memory accounting of the server process in the sidebar (HBS_ADMIN=1).
+
+    Parameters:
+    memory : module
+        modules.memory.
+
+    Returns:
+    None
+    """
+
+    session = memory.current_session()
+    with st.sidebar:
+        st.markdown("#### Memory")
+        st.metric("Process RSS (MB)", round(memory.process_rss() / 2 ** 20, 1))
+        if memory.over_budget(session):
+            st.warning(f"This session exceeds the budget of {memory.SESSION_BUDGET_MB:g} MB.")
+        for title, table in [
+            ("Datasets", memory.dataset_sizes()),
+            ("Caches", memory.cache_sizes()),
+            ("Sessions", memory.session_sizes()),
+            ("Allocation sites of this rerun", memory.rerun_sites(session)),
+        ]:
+            st.markdown(f"##### {title}")
+            st.dataframe(table, hide_index=True)
+
+
+def prefetch_adjacent(
+    city: str,
+    period: str,
+    basemap: str,
+) -> None:
+    """
+    Queue the other period, the other city and the neighbouring hours for background warming.
+
+    Parameters:
+    city : str
+        Selected city.
+    period : str
+        Selected period key.
+    basemap : str
+        Selected basemap.
+
+    Returns:
+    None
+    """
+
+    api = lazy_import('modules.api')
+    prefetch = lazy_import('modules.prefetch')
+    state = st.session_state
+    metric = state.get('sdtn_metric', 'summer_days')
+    prefetch.get_prefetcher().prefetch({
+        'city': city,
+        'period': period,
+        'hour': state.get('hour_selector', 0),
+        'data_type': state.get('data_type_selector', 'city_index'),
+        'basemap': basemap,
+        'metric': metric,
+        'threshold': state.get('threshold_selector', api.REFERENCE_THRESHOLDS[metric]),
+        'references': {c: state.get(f'uhi_reference_{c}', REFERENCE_LOGGERS[c]) for c in REFERENCE_LOGGERS},
+        'conditions': {c: tuple(sorted(state.get(f'uhi_conditions_{c}', []))) for c in REFERENCE_LOGGERS},
+    })
+
+
+def view_key(*values) -> tuple:
+    """
+    Identifies a tab's selection for panels.render_panels: sessions rendering the same
+    key at the same time wait for one build of its figures (see modules.singleflight).
+
+    Parameters:
+    values :
+        The city, period and widget values the tab's figures are built from.
+
+    Returns:
+    tuple
+        The language of the session followed by the values.
+    """
+
+    return (st.session_state.get('language_selector'),) + values
+
 
 def uhi_city_index(
-    uhi_path: Path,
+    city: str,
+    period: str,
     basemap: str,
     langdict: dict,
-) -> None:
+) -> tuple | None:
     """
     Visualizes Urban Heat Island (UHI) and City Index data using maps and histograms.
 
     Parameters:
-    uhi_path : Path
-        Path to the CSV file containing UHI data.
+    city : str
+        Selected city (for its data, default reference logger and weather data).
+    period : str
+        Selected period key (see period_selector).
     basemap : str
         The basemap to use for visualization.
     langdict : dict
         Language dictionary for localization.
 
     Returns:
-    None
+    tuple | None
+        (lon, lat) of the station clicked on the map, or None if nothing is selected.
     """
 
     with st.expander(langdict['uhi_md_t']):
         st.markdown(load_markdown(langdict['uhi_md']))
-    u1, u2 = st.columns(2)
+    u1, u2, u3 = st.columns(3)
     # Select Data Type (UHI or City Index)
     with u1:
         data_type = st.radio(langdict['dtype_uhi'], ['city_index', 'uhi'], key="data_type_selector", horizontal=True)
     # Visualization mode selection
     with u2:
         hour = st.slider(langdict['Hour'], min_value=0, max_value=23, step=1, key="hour_selector")
-
-    uhi_ci_data = pd.read_csv(uhi_path)
-    selected_data = uhi_ci_data[uhi_ci_data['hour'] == hour]
+    with u3:
+        reference = reference_selector(city, period, langdict, 'uhi_reference', disabled=data_type != 'uhi')
+    conditions = condition_selector(city, langdict, 'uhi_conditions')
+
+    maps = lazy_import('modules.maps')
+    panels = lazy_import('modules.panels')
+    plots = lazy_import('modules.plots')
+    meteo = lazy_import('modules.meteo')
+    selected_data = meteo.uhi_by_hour(city, period, hour, reference, conditions)
+    if conditions:
+        st.caption(langdict['meteo_matches'].format(n=int(selected_data['n_hours'].max())))
+    elif episode_days(period) is not None and lazy_import('modules.cube').open_cube(get_cube_dir(city)) is None:
+        st.caption(langdict['episode_cube_missing'])
+
+    if selected_data[data_type].isna().all():
+        st.info(langdict['hourly_empty'])
+        return None
 
     ucol1, ucol2 = st.columns([2, 1])
+    hour_str = str(hour)
+    if len(hour_str) == 1:
+        hour_str = '0' + hour_str
     with ucol1:
-        hour_str = str(hour)
-        if len(hour_str) == 1:
-            hour_str = '0' + hour_str
         st.markdown(f"##### {data_type.capitalize()} - {hour_str}:00")
-        plot_uhi_ci_map(selected_data, data_type, hour, basemap)
-    with ucol2:
-        plot_uhi_ci_histogram(selected_data, data_type, hour_str, langdict)
+    event, _ = panels.render_panels('UHI & City Index', [
+        panels.Panel('map', ucol1, lambda: maps.build_uhi_ci_map(selected_data, data_type, hour, basemap),
+                     maps.show_uhi_ci_map),
+        panels.Panel('histogram', ucol2,
+                     lambda: plots.build_uhi_ci_histogram(selected_data, data_type, hour_str, langdict)),
+    ], key=view_key(city, period, hour, reference, conditions, data_type, basemap))
+    export = lazy_import('modules.export')
+    export_panel(
+        [export.Selection('uhi', city, period, hour=hour, reference=reference, conditions=conditions)],
+        langdict, 'uhi_export',
+    )
+
+    points = event.selection.points if event else []
+    if points and 'lon' in points[0] and 'lat' in points[0]:
+        return points[0]['lon'], points[0]['lat']
+    return None
+
+
+def reference_selector(
+    city: str,
+    period: str,
+    langdict: dict,
+    key: str,
+    disabled: bool = False,
+) -> int:
+    """
+    Select the reference logger the UHI is computed against.
+
+    Parameters:
+    city : str
+        Selected city; its rural reference is preselected.
+    period : str
+        Selected period key (for the logger list).
+    langdict : dict
+        Language dictionary for localization.
+    key : str
+        Widget key.
+    disabled : bool, optional
+        Disable the selector (e.g. while the City Index is shown).
+
+    Returns:
+    int
+        Logger ID of the reference.
+    """
+
+    stations = lazy_import('modules.api').stations(city, period)
+    labels = {
+        int(logger): f"{logger} - {name}" if isinstance(name, str) else str(logger)
+        for logger, name in zip(stations['logger'], stations['Name'])
+    }
+    options = list(labels)
+    default = REFERENCE_LOGGERS[city]
+    return st.selectbox(
+        langdict['reference'],
+        options,
+        index=options.index(default) if default in labels else 0,
+        format_func=labels.get,
+        key=f"{key}_{city}",
+        disabled=disabled,
+    )
+
+
+def condition_selector(
+    city: str,
+    langdict: dict,
+    key: str,
+) -> tuple:
+    """
+    Select weather conditions (e.g. calm and clear nights) the UHI is restricted to.
+
+    The selector is disabled unless the campaign cube and the local meteorological series
+    of the city are available (see modules.cube and modules.meteo).
+
+    Parameters:
+    city : str
+        Selected city.
+    langdict : dict
+        Language dictionary for localization.
+    key : str
+        Widget key.
+
+    Returns:
+    tuple
+        Sorted condition keys (empty: no restriction).
+    """
+
+    meteo = lazy_import('modules.meteo')
+    available = meteo.load_meteo(get_meteo_path(city), get_cube_dir(city)) is not None
+    labels = langdict['conditions']
+    conditions = st.multiselect(
+        langdict['condition_select'],
+        list(meteo.CONDITIONS),
+        format_func=labels.get,
+        key=f"{key}_{city}",
+        disabled=not available,
+        help=None if available else langdict['meteo_missing'],
+    )
+    return tuple(sorted(conditions)) if available else ()
+
+
+def custom_radius(
+    city: str,
+    raster: str,
+    default: int,
+    langdict: dict,
+    key: str,
+) -> int | None:
+    """
+    Optionally replace the precomputed buffers by any radius, computed from a local raster.
+
+    The option is disabled unless the raster is available (see modules.zonal).
+
+    Parameters:
+    city : str
+        Selected city.
+    raster : str
+        Raster name (see structure.get_raster_path).
+    default : int
+        Initial radius (the selected precomputed buffer).
+    langdict : dict
+        Language dictionary for localization.
+    key : str
+        Widget key.
+
+    Returns:
+    int | None
+        Radius in metres, or None to use the precomputed buffers.
+    """
+
+    api = lazy_import('modules.api')
+    available = api.raster_available(city, raster)
+    custom = st.toggle(
+        langdict['zonal_custom'],
+        key=f"{key}_toggle",
+        disabled=not available,
+        help=None if available else langdict['raster_missing'],
+    )
+    if not (custom and available):
+        return None
+    return st.slider(
+        langdict['zonal_radius'], min_value=5, max_value=1000, value=int(default), step=5, key=key
+    )
+
+
+def export_panel(
+    selections: list,
+    langdict: dict,
+    key: str,
+    loggers: list = (),
+) -> None:
+    """
+    Offers the data of a tab's current selection for download as CSV or Parquet.
+
+    The file is only written when requested, through the chunked export of
+    modules.export, to a temporary file on disk; the session only keeps its path, and
+    the file is deleted when the selection changes. Streamlit's download button reads the
+    file into memory, so files above export.MAX_DOWNLOAD_BYTES are not offered.
+
+    Parameters:
+    selections : list
+        export.Selection of every dataset the tab shows (city, period and the tab's widgets).
+    langdict : dict
+        Language dictionary for localization.
+    key : str
+        Widget key prefix.
+    loggers : list
+        Loggers preselected in the logger filter (e.g. those shown in the tab).
+
+    Returns:
+    None
+    """
+
+    export = lazy_import('modules.export')
+    api = lazy_import('modules.api')
+    with st.expander(langdict['export_t']):
+        st.caption(langdict['export_info'])
+        labels = langdict['export_choice']
+        e1, e2, e3 = st.columns([2, 2, 1])
+        with e1:
+            by_dataset = {s.dataset: s for s in selections}
+            dataset = st.radio(langdict['export_dataset'], list(by_dataset), format_func=labels.get, key=f"{key}_dataset")
+            selection = by_dataset[dataset]
+        with e2:
+            options = api.stations(selection.city, selection.period)['logger'].tolist()
+            chosen = st.multiselect(
+                langdict['export_loggers'], options, default=[x for x in loggers if x in options], key=f"{key}_loggers"
+            )
+            if selection.dataset in export.DATED:
+                from datetime import date
+                first, last = (date.fromisoformat(day) for day in export.date_range(selection.city, selection.period))
+                window = st.date_input(
+                    langdict['export_days'], value=(first, last), min_value=first, max_value=last, key=f"{key}_days"
+                )
+                # The range is incomplete while the user picks its end
+                if len(window) == 2:
+                    selection = selection._replace(days=tuple(day.isoformat() for day in window))
+        with e3:
+            fmt = st.radio(langdict['export_format'], export.formats(), format_func=str.upper, key=f"{key}_format")
+        selection = selection._replace(loggers=tuple(chosen))
+
+        file_key = f"{key}_file"
+        prepared = st.session_state.get(file_key)
+        if prepared is not None and (prepared[0] != (selection, fmt) or not (prepared[1] is None or prepared[1].exists())):
+            # Delete the file of a previous selection
+            if prepared[1] is not None:
+                prepared[1].unlink(missing_ok=True)
+            del st.session_state[file_key]
+            prepared = None
+        if prepared is None and st.button(langdict['export_prepare'], key=f"{key}_prepare"):
+            prepared = ((selection, fmt), export.write_file(selection, fmt, max_bytes=export.MAX_DOWNLOAD_BYTES))
+            st.session_state[file_key] = prepared
+        if prepared is not None and prepared[1] is None:
+            st.warning(langdict['export_too_large'].format(mb=export.MAX_DOWNLOAD_BYTES / 2 ** 20))
+        elif prepared is not None:
+            name = export.file_name(selection, fmt)
+            with open(prepared[1], 'rb') as data:
+                st.download_button(
+                    langdict['export_download'].format(name=name),
+                    data,
+                    file_name=name,
+                    mime=export.FORMATS[fmt][0],
+                    key=f"{key}_download",
+                )
+
+
+def nearest_loggers(
+    logger_index,
+    clicked: tuple | None,
+    langdict: dict,
+) -> None:
+    """
+    Resolves a clicked or typed coordinate to the nearest loggers and shows their data.
+
+    Parameters:
+    logger_index : LoggerIndex
+        Spatial index of the selected city and period.
+    clicked : tuple | None
+        (lon, lat) of the station clicked on the UHI map, if any.
+    langdict : dict
+        Language dictionary for localization.
+
+    Returns:
+    None
+    """
+
+    stations = logger_index.stations
+    with st.expander(langdict['nearest_t'], expanded=clicked is not None):
+        st.caption(langdict['nearest_info'])
+        lon_default, lat_default = clicked or (stations['lon'].mean(), stations['lat'].mean())
+        n1, n2, n3 = st.columns(3)
+        with n1:
+            lon = st.number_input(langdict['nearest_lon'], value=float(lon_default), format="%.5f", step=0.001)
+        with n2:
+            lat = st.number_input(langdict['nearest_lat'], value=float(lat_default), format="%.5f", step=0.001)
+        with n3:
+            k = st.slider(langdict['nearest_k'], min_value=1, max_value=10, value=3)
+
+        nearest = logger_index.nearest(lon, lat, k)
+        st.dataframe(nearest, hide_index=True, use_container_width=True)
+
+        names = dict(zip(nearest['logger'], nearest['Name']))
+        logger = st.selectbox(
+            langdict['nearest_select'],
+            nearest['logger'],
+            format_func=lambda x: f"{x} - {names[x]}",
+        )
+        history = logger_index.history(logger)
+        h1, h2 = st.columns(2)
+        with h1:
+            st.dataframe(history['hourly'], hide_index=True, use_container_width=True)
+        with h2:
+            st.dataframe(history['daily'], hide_index=True, use_container_width=True)
+        pd = lazy_import('pandas')
+        geo = pd.concat([history['landuse'], history['fitnah']], ignore_index=True)
+        if not geo.empty:
+            st.dataframe(geo, hide_index=True, use_container_width=True)
 
 
 def tn_sd(
-    sdtn_path: Path,
-    daily_stats_path: Path,
+    city: str,
+    period: str,
     basemap: str,
     langdict: dict,
 ) -> None:
@@ -141,10 +621,10 @@ def tn_sd(
     Visualizes Summer Days and Tropical Nights data with adjustable temperature thresholds.
 
     Parameters:
-    sdtn_path : Path
-        Path to the CSV file containing Summer Days and Tropical Nights data.
-    daily_stats_path : Path
-        Path to the CSV file containing daily temperature statistics.
+    city : str
+        Selected city.
+    period : str
+        Selected period key (see period_selector).
     basemap : str
         The basemap to use for visualization.
     langdict : dict
@@ -154,53 +634,72 @@ def tn_sd(
     None
     """
 
-    daily_data = pd.read_csv(daily_stats_path)
-    sdtn_data = pd.read_csv(sdtn_path)
-    sdtn_geo = daily_data.merge(sdtn_data[['Name', 'logger', 'x', 'y']], how='left', on='logger')
+    api = lazy_import('modules.api')
+    maps = lazy_import('modules.maps')
+    panels = lazy_import('modules.panels')
+    plots = lazy_import('modules.plots')
     with st.expander(langdict['sdtn_md_t']):
         st.markdown(load_markdown(langdict['sdtn_md']))
     s1, s2 = st.columns([2, 1])
     with s1:
+        metric_labels = {'summer_days': langdict['sdays_selection'], 'tropical_nights': langdict['nights_selection']}
         metric = st.radio(
             langdict['dtype_tnsd'],
-            [langdict['sdays_selection'], langdict['nights_selection']],
+            list(metric_labels),
+            format_func=metric_labels.get,
+            key='sdtn_metric',
             horizontal=True
         )
 
-        if metric == langdict['sdays_selection']:
+        if metric == 'summer_days':
             threshold_label = langdict['sdays_select']
-            default_threshold = 30
-            data_col = "daily_max"
         else:
             threshold_label = langdict['nights_select']
-            default_threshold = 20
-            data_col = "daily_min"
+        default_threshold = api.REFERENCE_THRESHOLDS[metric]
     with s2:
         threshold = st.slider(
             threshold_label,
             min_value=0.0,
             max_value=50.0,
             value=float(default_threshold),
-            step=0.5
+            step=0.5,
+            key='threshold_selector',
         )
 
+    summary = api.sdtn_exceedances(city, period, metric, threshold)
     tncol1, tncol2 = st.columns([2, 1])
-    with tncol1:
-        summary = sdtn_map(sdtn_geo, data_col, metric, threshold, basemap)
-    with tncol2:
-        tn_sd_histogram(summary, threshold, langdict)
+    panels.render_panels('SD / TN', [
+        panels.Panel('map', tncol1, lambda: maps.sdtn_map_figure(summary, basemap)),
+        panels.Panel('histogram', tncol2, lambda: plots.build_tn_sd_histogram(summary, threshold, langdict),
+                     lambda fig: st.plotly_chart(fig, use_container_width=True)),
+    ], key=view_key(city, period, metric, threshold, basemap))
+    export = lazy_import('modules.export')
+    export_panel([
+        export.Selection('sdtn', city, period, metric=metric, threshold=threshold),
+        export.Selection('daily', city, period),
+    ], langdict, 'sdtn_export')
 
 
 def hourly_evolution(
-    uhi_path: Path,
+    city: str,
+    period: str,
+    basemap: str,
     langdict: dict,
 ) -> None:
     """
     Displays the hourly evolution of Urban Heat Island (UHI) or City Index values.
 
+    If the day x hour x logger cube of the campaign has been built (see modules.cube),
+    the spread across the days of the selected period and single-day profiles can be
+    overlaid.
+
     Parameters:
-    uhi_path : Path
-        Path to the CSV file containing UHI or City Index data.
+    city : str
+        Selected city (for its data, campaign cube and default reference logger).
+    period : str
+        Selected period key; the days of the period restrict the cube.
+    basemap : str
+        The basemap of the map of the profile clusters.
     langdict : dict
         Language dictionary for localization.
 
@@ -208,27 +707,142 @@ def hourly_evolution(
     None
     """
 
-    station_data = pd.read_csv(uhi_path)
+    api = lazy_import('modules.api')
+    plots = lazy_import('modules.plots')
+    cube_module = lazy_import('modules.cube')
+    _, _, uhi_path, tempstats_path, _ = get_files(city, period)
+    cube_dir = get_cube_dir(city)
+    cube = cube_module.open_cube(cube_dir)
     h1, h2 = st.columns([1, 2])
     with h1:
-        data_type = st.radio(langdict['dtype_uhi'], ["uhi", "city_index"], index=0)
+        data_type = st.radio(langdict['dtype_uhi'], ["uhi", "city_index"], index=0, key='evolution_data_type')
+        reference = reference_selector(
+            city, period, langdict, 'evolution_reference', disabled=data_type != 'uhi'
+        )
+    conditions = condition_selector(city, langdict, 'evolution_conditions')
+    if conditions:
+        meteo = lazy_import('modules.meteo')
+        station_data = meteo.conditioned_uhi_ci(
+            uhi_path, tempstats_path, cube_dir, get_meteo_path(city), conditions, reference, episode_days(period)
+        )
+        hour_mask = meteo.load_meteo(get_meteo_path(city), cube_dir).mask(conditions)
+    else:
+        station_data = api.uhi_hourly(city, period, reference)
+        hour_mask = None
 
     # 2) Multi-select for loggers
     with h2:
         selected_loggers = st.multiselect(
             langdict['Sensor'],
             options=sorted(station_data["logger"].unique()),
-            default=[]
+            default=[],
+            key='evolution_loggers',
         )
 
+    bands = day_profile = None
+    if cube is None:
+        st.caption(langdict['cube_missing'])
+    else:
+        # Restrict the cube to the days of the selected period (whole summer or heatwave)
+        period_days = api.daily_stats(city, period)["time"].unique()
+        day_mask = cube.day_mask(period_days)
+        b1, b2 = st.columns([1, 2])
+        with b1:
+            band_labels = langdict['evol_band_choice']
+            band = st.radio(
+                langdict['evol_band'], list(band_labels), format_func=band_labels.get,
+                key='evolution_band', horizontal=True,
+            )
+        with b2:
+            day = st.selectbox(
+                langdict['evol_day'], [str(d) for d in cube.days[day_mask]], index=None, key='evolution_day'
+            )
+        if selected_loggers and band in cube_module.BANDS:
+            bands = cube.percentile_bands(
+                data_type, selected_loggers, cube_module.BANDS[band], day_mask, reference, hour_mask
+            )
+        if selected_loggers and day is not None:
+            day_profile = cube.day_profile(data_type, day, selected_loggers, reference)
+
     # 3) If user selects at least one logger, plot the line chart
     if selected_loggers:
-        plot_uhi_ci_evolution(station_data, selected_loggers, data_type, langdict)
+        plots.plot_uhi_ci_evolution(station_data, selected_loggers, data_type, langdict, bands, day_profile)
     else:
         st.info(langdict['uhi_warning'])
+    profile_clusters(city, period, data_type, reference if data_type == 'uhi' else None, basemap, langdict)
+    export = lazy_import('modules.export')
+    export_panel(
+        [export.Selection('uhi', city, period, reference=reference, conditions=conditions)],
+        langdict, 'evolution_export', selected_loggers,
+    )
+
+    qc_table = api.qc_rates(city, period)
+    with st.expander(langdict['qc_t']):
+        if qc_table is None:
+            st.caption(langdict['qc_missing'])
+        else:
+            st.caption(langdict['qc_info'])
+            st.dataframe(qc_table, hide_index=True, use_container_width=True)
+
+def profile_clusters(
+    city: str,
+    period: str,
+    data_type: str,
+    reference: int | None,
+    basemap: str,
+    langdict: dict,
+) -> None:
+    """
+    Groups the loggers by the shape of their 24-hour profile and shows the groups on a map
+    with the mean profile of each group.
+
+    Parameters:
+    city : str
+        Selected city.
+    period : str
+        Selected period key.
+    data_type : str
+        'uhi' or 'city_index'.
+    reference : int | None
+        Reference logger of the UHI.
+    basemap : str
+        The basemap to use for visualization.
+    langdict : dict
+        Language dictionary for localization.
+
+    Returns:
+    None
+    """
+
+    api = lazy_import('modules.api')
+    maps = lazy_import('modules.maps')
+    panels = lazy_import('modules.panels')
+    plots = lazy_import('modules.plots')
+    with st.expander(langdict['cluster_t']):
+        st.caption(langdict['cluster_info'])
+        c1, c2 = st.columns([1, 2])
+        with c1:
+            method_labels = langdict['cluster_method_choice']
+            method = st.radio(
+                langdict['cluster_method'], list(method_labels), format_func=method_labels.get,
+                key='cluster_method', horizontal=True,
+            )
+        with c2:
+            k = st.slider(langdict['cluster_k'], min_value=2, max_value=8, value=4, key='cluster_k')
+        assignments, centroids = api.profile_clusters(city, period, data_type, k, method, reference)
+        if assignments.empty:
+            st.info(langdict['hourly_empty'])
+            return
+        ccol1, ccol2 = st.columns([1, 1])
+        panels.render_panels('profile clusters', [
+            panels.Panel('map', ccol1, lambda: maps.build_cluster_map(assignments, basemap, langdict)),
+            panels.Panel('profiles', ccol2, lambda: plots.build_cluster_profiles(centroids, data_type, langdict),
+                         lambda fig: st.plotly_chart(fig, use_container_width=True)),
+        ], key=view_key(city, period, data_type, reference, k, method, basemap))
+
 
 def fitnah_tab(
-    fitnah_path: Path,
+    city: str,
     basemap: str,
     langdict: dict,
 ) -> None:
@@ -236,8 +850,8 @@ def fitnah_tab(
     Renders visualizations of Fitnah data using maps and histograms.
 
     Parameters:
-    fitnah_path : Path
-        Path to the CSV file containing Fitnah data.
+    city : str
+        Selected city (FITNAH data only exists for Biel).
     basemap : str
         The basemap to use for visualization.
     langdict : dict
@@ -249,39 +863,47 @@ def fitnah_tab(
 
     with st.expander(langdict['fitnah_md_t']):
         st.markdown(load_markdown(langdict['fitnah_md']))
-    # Read in the data for the selected city
-    fitnah_data = pd.read_csv(fitnah_path)
-
-    # Convert 'geometry_coords' from string to list
-    fitnah_data['geometry_coords'] = fitnah_data['geometry_coords'].apply(ast.literal_eval)
+    api = lazy_import('modules.api')
+    if not api.fitnah_available(city):
+        st.info(langdict['fitnah_missing'])
+        return
+    maps = lazy_import('modules.maps')
+    panels = lazy_import('modules.panels')
+    plots = lazy_import('modules.plots')
     f1, f2, f3 = st.columns(3)
     with f1:
         # Let the user choose buffer size and data type
         buffer_size = st.selectbox(langdict['buffer'], [10, 50, 100, 500], key = 'fitnah_buffer')
     with f2:
-        dtype = st.selectbox(langdict['dtype_fitnah'], ['fitnah_ss', 'fitnah_sv', 'fitnah_temp', 'dem'])
+        dtype = st.selectbox(langdict['dtype_fitnah'], ['fitnah_ss', 'fitnah_sv', 'fitnah_temp', 'dem'], key='fitnah_dtype')
     with f3:
         aggregator = st.selectbox(langdict['aggregator'],
-                                  ['min', 'max', 'mean', 'count'])
-    # Filter the data
-    sel_fitnah_data = fitnah_data[
-        (fitnah_data['buffer'] == buffer_size) &
-        (fitnah_data['dtype'] == dtype)
-        ]
+                                  ['min', 'max', 'mean', 'count'], key='fitnah_aggregator')
+    radius = custom_radius(city, dtype, buffer_size, langdict, 'fitnah_radius')
+    export = lazy_import('modules.export')
+    selection = export.Selection('fitnah', city, 'summer', buffer=buffer_size, radius=radius, dtype=dtype)
+    if radius is None:
+        sel_fitnah_data = api.fitnah_slice(city, buffer_size, dtype)
+    else:
+        buffer_size = radius
+        sel_fitnah_data = api.zonal_slice(city, dtype, radius)
 
     fcol1, fcol2 = st.columns([2, 1])
 
     with fcol1:
         st.markdown(f'#### {dtype} - {aggregator.capitalize()} - {buffer_size}m')
-        plot_fitnah_map(sel_fitnah_data, aggregator, basemap)
-    with fcol2:
-        plot_fitnah_histogram(sel_fitnah_data, aggregator, dtype, buffer_size, langdict)
+    panels.render_panels('FITNAH', [
+        panels.Panel('map', fcol1, lambda: maps.build_fitnah_map(sel_fitnah_data, aggregator, basemap)),
+        panels.Panel('histogram', fcol2,
+                     lambda: plots.build_fitnah_histogram(sel_fitnah_data, aggregator, dtype, buffer_size, langdict)),
+    ], key=view_key(city, dtype, aggregator, buffer_size, radius, basemap))
+    export_panel([selection], langdict, 'fitnah_export')
 
 
 
 
 def tab_explore_geodata(
-    landuse_path: Path,
+    city: str,
     basemap: str,
     langdict: dict,
 ) -> None:
@@ -289,8 +911,8 @@ def tab_explore_geodata(
     Explores geospatial data using selected buffers and data types.
 
     Parameters:
-    landuse_path : Path
-        Path to the CSV file containing land use data.
+    city : str
+        Selected city.
     basemap : str
         The basemap to use for visualization.
     langdict : dict
@@ -302,19 +924,36 @@ def tab_explore_geodata(
 
     st.subheader(langdict['geo_title'])
 
-    landuse = pd.read_csv(landuse_path)
+    api = lazy_import('modules.api')
+    maps = lazy_import('modules.maps')
+    panels = lazy_import('modules.panels')
+    plots = lazy_import('modules.plots')
     g1, g2 = st.columns(2)
     with g1:
-        landuse_type = st.selectbox(langdict['dtype_landuse'], langdict['description_dict'].values())
+        landuse_type = st.selectbox(
+            langdict['dtype_landuse'],
+            list(langdict['description_dict']),
+            format_func=langdict['description_dict'].get,
+            key='landuse_type',
+        )
     with g2:
-        buffer = st.selectbox(langdict['buffer'], landuse['buffer'].unique(), key='geodata_buffer')
-    sel_data = landuse[landuse['buffer'] == buffer]
+        buffer = st.selectbox(langdict['buffer'], api.landuse_buffers(city), key='geodata_buffer')
+    radius = custom_radius(city, 'land_use', buffer, langdict, 'landuse_radius')
+    export = lazy_import('modules.export')
+    selection = export.Selection('landuse', city, 'summer', buffer=buffer, radius=radius)
+    if radius is None:
+        sel_data = api.landuse_slice(city, buffer)
+    else:
+        buffer = radius
+        sel_data = api.zonal_slice(city, 'land_use', radius)
 
     geo1, geo2 = st.columns([2,1])
-    with geo1:
-        plot_geodata(sel_data, landuse_type, basemap, langdict)
-    with geo2:
-        geodata_histogram(sel_data, landuse_type, buffer, langdict)
+    panels.render_panels('land use', [
+        panels.Panel('map', geo1, lambda: maps.build_geodata_map(sel_data, landuse_type, basemap, langdict)),
+        panels.Panel('histogram', geo2,
+                     lambda: plots.build_geodata_histogram(sel_data, landuse_type, buffer, langdict)),
+    ], key=view_key(city, landuse_type, buffer, radius, basemap))
+    export_panel([selection], langdict, 'landuse_export')
 
 
 # 6) Entry Point
@@ -0,0 +1,817 @@
+"""
+Module: api
+================
+
+Headless query API over the app's data. Every function takes plain values (city, period,
+hour, threshold, ...) and returns DataFrames or arrays; nothing here depends on
+Streamlit, so batch analyses and nightly reports can use it directly:
+
+    from modules import api
+    api.uhi_by_hour('biel', 'summer', 3)
+    api.sdtn_exceedances_batch('biel', 'heatwave', 'tropical_nights', (18, 19, 20, 21))
+
+The app's tabs are thin consumers of the same functions.
+
+Results are memoized per argument tuple in process-wide LRU caches (see memoize); callers
+receive a copy of cached DataFrames and arrays, so they may modify them freely. Concurrent
+misses of the same arguments (e.g. many sessions opening the default view at once) are
+computed once and shared (see modules.singleflight). Batch
+variants compute a whole axis (all hours, all thresholds) in one vectorized pass. The
+parsed files and the costlier summaries are also kept in the disk-backed artifact store
+(see modules.artifacts), keyed by the content of their input files, so they survive a
+restart.
+
+Functions:
+- memoize
+- memoized
+- clear_caches
+- read_table
+- read_geodata
+- period_daily
+- episode_daily
+- stations
+- uhi_hourly
+- uhi_by_hour
+- uhi_matrix
+- profile_clusters
+- daily_stats
+- sdtn_summary
+- sdtn_exceedances
+- sdtn_exceedances_batch
+- heatwaves
+- landuse_buffers
+- landuse_slice
+- fitnah_available
+- fitnah_slice
+- raster_available
+- zonal_table
+- zonal_slice
+- qc_rates
+"""
+
+import ast
+import functools
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import singleflight
+from .artifacts import persist
+from .paths import episode_days, episode_period, get_cube_dir, get_files, get_raster_path
+
+SDTN_COLUMNS = {'summer_days': 'daily_max', 'tropical_nights': 'daily_min'}
+# Thresholds of the legal definitions, always counted alongside the selected threshold
+REFERENCE_THRESHOLDS = {'summer_days': 30.0, 'tropical_nights': 20.0}
+
+_memoized = []
+
+
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value
+
+
+def memoize(maxsize: int = 128, cache_none: bool = True):
+    """
+    Decorator caching a function's results per (hashable) argument tuple, LRU-evicted.
+
+    Parameters:
+    maxsize : int
+        Maximum number of cached results.
+    cache_none : bool
+        Whether None results are cached. False for loaders returning None while a file is
+        missing, so that the file is picked up once it has been generated.
+
+    Returns:
+    callable
+        Decorator; the wrapped function returns copies of cached DataFrames / arrays and
+        exposes cache_info(), cache_clear() and cache_entries() (for memory accounting).
+        Its shared() variant returns the cached value itself, for read-only consumers
+        (e.g. modules.export) that would otherwise pay for a copy. Concurrent misses of
+        the same arguments wait for one computation (see modules.singleflight).
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+        counts = {'hits': 0, 'misses': 0}
+        flight = singleflight.group(f'{func.__module__}.{func.__qualname__}')
+
+        def shared(*args, **kwargs):
+            key = args + tuple(sorted(kwargs.items())) if kwargs else args
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    counts['hits'] += 1
+                    return cache[key]
+                counts['misses'] += 1
+
+            def compute():
+                value = func(*args, **kwargs)
+                if value is None and not cache_none:
+                    return value
+                # Cached before the waiters are released, so no later miss recomputes it
+                with lock:
+                    cache[key] = value
+                    cache.move_to_end(key)
+                    while len(cache) > maxsize:
+                        cache.popitem(last=False)
+                return value
+
+            return flight.do(key, compute)[0]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return _copy(shared(*args, **kwargs))
+
+        def cache_info():
+            with lock:
+                return functools._CacheInfo(counts['hits'], counts['misses'], maxsize, len(cache))
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                counts.update(hits=0, misses=0)
+
+        def cache_entries():
+            with lock:
+                return list(cache.items())
+
+        wrapper.shared = shared
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_entries = cache_entries
+        _memoized.append(wrapper)
+        return wrapper
+    return decorator
+
+
+def memoized() -> list:
+    """
+    Return every memoized function (e.g. to account for the memory of their caches).
+    """
+    return list(_memoized)
+
+
+def _period_files(city: str, period: str, *args, **kwargs) -> tuple:
+    # Files of the period and of the whole summer (station metadata, land use, FITNAH);
+    # the hourly values of a detected heat episode come from the campaign cube
+    files = get_files(city, period) + get_files(city, 'summer')
+    if episode_days(period) is not None:
+        files += tuple(get_cube_dir(city) / name for name in ('meta.json', 'temperature.npy', 'uhi.npy', 'city_index.npy'))
+    return files
+
+
+def clear_caches() -> None:
+    """
+    Clear the caches of every memoized function (e.g. after the data files changed).
+    """
+    for func in _memoized:
+        func.cache_clear()
+
+
+# -------------------------------------------------------------------
+# Files
+# -------------------------------------------------------------------
+
+
+@memoize(maxsize=64)
+@persist()
+def read_table(path: Path) -> pd.DataFrame:
+    """
+    Read a CSV data file once per process.
+
+    Parameters:
+    path : Path
+        Path to the CSV file.
+
+    Returns:
+    pd.DataFrame
+        The parsed file.
+    """
+    return pd.read_csv(path)
+
+
+@memoize(maxsize=16)
+@persist()
+def read_geodata(path: Path) -> pd.DataFrame:
+    """
+    Read a FITNAH / land-use CSV with 'geometry_coords' parsed to lists of (lon, lat) tuples.
+
+    Parameters:
+    path : Path
+        Path to the CSV file.
+
+    Returns:
+    pd.DataFrame
+        The parsed file.
+    """
+    data = read_table(path)
+    data['geometry_coords'] = data['geometry_coords'].apply(ast.literal_eval)
+    return data
+
+
+def period_daily(city: str, period: str) -> pd.DataFrame:
+    """
+    Daily temperature statistics of a period.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    period : str
+        'summer', 'heatwave' or the key of a detected heat episode (see heatwaves).
+
+    Returns:
+    pd.DataFrame
+        Rows of the *_temp_stats.csv file of the period; for an episode, the rows of its
+        days in the whole-summer file.
+    """
+    if episode_days(period) is None:
+        return read_table(get_files(city, period)[3])
+    return episode_daily(city, period)
+
+
+@memoize(maxsize=32)
+def episode_daily(city: str, period: str) -> pd.DataFrame:
+    """
+    Rows of the whole-summer daily statistics within the days of a detected heat episode.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    period : str
+        Key of the episode (see paths.episode_period).
+
+    Returns:
+    pd.DataFrame
+        The rows of its days, in file order.
+    """
+    first, last = episode_days(period)
+    daily = read_table.shared(get_files(city, 'summer')[3])
+    # ISO dates order like strings
+    times = daily['time'].to_numpy(dtype=str)
+    return daily[(times >= first) & (times <= last)].reset_index(drop=True)
+
+
+@memoize(maxsize=4, cache_none=False)
+def _cube(city: str):
+    """The campaign cube of a city (see modules.cube), or None if it has not been built."""
+    from .cube import META_FILE, TemperatureCube
+
+    cube_dir = get_cube_dir(city)
+    return TemperatureCube(cube_dir) if (cube_dir / META_FILE).exists() else None
+
+
+# -------------------------------------------------------------------
+# UHI / City Index
+# -------------------------------------------------------------------
+
+
+@memoize()
+def stations(city: str, period: str) -> pd.DataFrame:
+    """
+    Loggers of a city and period with their names and coordinates.
+
+    Returns:
+    pd.DataFrame
+        Columns 'logger', 'Name', 'lon', 'lat', sorted by logger.
+    """
+    hourly = read_table(get_files(city, period)[2])
+    return (
+        hourly[['logger', 'Name', 'x', 'y']]
+        .drop_duplicates('logger')
+        .rename(columns={'x': 'lon', 'y': 'lat'})
+        .sort_values('logger')
+        .reset_index(drop=True)
+    )
+
+
+@memoize()
+def _uhi_grid(city: str, period: str) -> tuple:
+    """Hour x logger array of the shipped UHI, and the grid position of every file row."""
+    hourly = read_table(get_files(city, period)[2])
+    loggers, logger_pos = np.unique(hourly['logger'].to_numpy(), return_inverse=True)
+    hours = hourly['hour'].to_numpy()
+    grid = np.full((int(hours.max()) + 1, len(loggers)), np.nan)
+    grid[hours, logger_pos] = hourly['uhi'].to_numpy(dtype=float)
+    return loggers, grid, hours, logger_pos
+
+
+@memoize()
+def uhi_hourly(city: str, period: str, reference: int = None) -> pd.DataFrame:
+    """
+    Hourly UHI and City Index of every logger, optionally against another reference logger.
+
+    The shipped UHI is relative to the rural reference of the city. Because both the UHI
+    and the hourly averaging are linear, the UHI against logger r is the shipped UHI minus
+    the shipped UHI of r: (T_i - T_ref) - (T_r - T_ref) = T_i - T_r. This is one broadcast
+    subtraction over the hour x logger array.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    period : str
+        'summer' or 'heatwave'.
+    reference : int, optional
+        Logger ID of the reference (default: the shipped rural reference; unknown loggers
+        are ignored).
+
+    A detected heat episode has no shipped file: its values are the means of the campaign
+    cube over the days of the episode, on the rows of the whole-summer file (NaN if the
+    cube has not been built).
+
+    Returns:
+    pd.DataFrame
+        Rows of the *_hourly_uhi_ci.csv file ('hour', 'logger', 'uhi', 'Name', 'x', 'y',
+        'city_index').
+    """
+    hourly = read_table(get_files(city, period)[2])
+    if episode_days(period) is not None:
+        return _episode_hourly(hourly, city, period, reference)
+    if reference is None:
+        return hourly
+    loggers, grid, hours, logger_pos = _uhi_grid(city, period)
+    col = np.searchsorted(loggers, reference)
+    if col == len(loggers) or loggers[col] != reference:
+        return hourly
+    hourly['uhi'] = (grid - grid[:, col:col + 1])[hours, logger_pos]
+    return hourly
+
+
+def _episode_hourly(hourly: pd.DataFrame, city: str, period: str, reference: int = None) -> pd.DataFrame:
+    """The hourly rows with UHI and City Index averaged over the days of an episode in the cube."""
+    cube = _cube(city)
+    if cube is None:
+        hourly[['uhi', 'city_index']] = np.nan
+        return hourly
+    day_mask = cube.day_mask(episode_daily.shared(city, period)['time'].unique())
+    mask = np.broadcast_to(day_mask[:, None], (len(day_mask), 24))
+    loggers = hourly['logger'].to_numpy()
+    hours = hourly['hour'].to_numpy()
+    cols = np.minimum(np.searchsorted(cube.loggers, loggers), len(cube.loggers) - 1)
+    known = cube.loggers[cols] == loggers
+    for variable in ('uhi', 'city_index'):
+        _, means, _ = cube.masked_mean(variable, mask, reference=reference if variable == 'uhi' else None)
+        hourly[variable] = np.where(known, means[hours, cols], np.nan)
+    return hourly
+
+
+def uhi_by_hour(city: str, period: str, hour: int, reference: int = None) -> pd.DataFrame:
+    """
+    UHI and City Index of every logger at one hour.
+
+    Parameters:
+    city, period, reference :
+        See uhi_hourly.
+    hour : int
+        Hour of the day (0-23).
+
+    Returns:
+    pd.DataFrame
+        The rows of uhi_hourly for that hour.
+    """
+    hourly = uhi_hourly(city, period, reference)
+    return hourly[hourly['hour'] == hour]
+
+
+@memoize()
+def uhi_matrix(city: str, period: str, data_type: str = 'uhi', reference: int = None) -> pd.DataFrame:
+    """
+    Batch variant of uhi_by_hour: all hours of all loggers as one hour x logger table.
+
+    Parameters:
+    city, period, reference :
+        See uhi_hourly.
+    data_type : str
+        'uhi' or 'city_index'.
+
+    Returns:
+    pd.DataFrame
+        Index 'hour', one column per logger.
+    """
+    hourly = uhi_hourly(city, period, reference)
+    return hourly.pivot(index='hour', columns='logger', values=data_type)
+
+
+# -------------------------------------------------------------------
+# Clusters of diurnal profiles
+# -------------------------------------------------------------------
+
+
+@memoize(maxsize=32)
+@persist(inputs=_period_files, code=('modules/clusters.py',))
+def _profile_tree(city: str, period: str, data_type: str, reference: int = None) -> tuple:
+    """Logger IDs, 24-hour profiles and Ward tree of a city and period (cut per k by profile_clusters)."""
+    from . import clusters
+
+    loggers, profiles = clusters.profile_matrix(uhi_matrix(city, period, data_type, reference))
+    return loggers, profiles, clusters.ward_tree(profiles)
+
+
+@memoize(maxsize=256)
+def profile_clusters(
+    city: str,
+    period: str,
+    data_type: str = 'uhi',
+    k: int = 4,
+    method: str = 'ward',
+    reference: int = None,
+) -> tuple:
+    """
+    Cluster the loggers by their mean 24-hour UHI / City Index profile (see modules.clusters).
+
+    Parameters:
+    city, period, reference :
+        See uhi_hourly.
+    data_type : str
+        'uhi' or 'city_index'.
+    k : int
+        Number of clusters.
+    method : str
+        'ward' (hierarchical; the tree is built once and cut per k) or 'kmeans'.
+
+    Returns:
+    tuple
+        (assignments, centroids): one row per logger with 'logger', 'Name', 'lon', 'lat'
+        and 'cluster' (1 = warmest mean profile), and the centroid profiles with 'hour',
+        'cluster', the data column and 'n_loggers'; both are empty if no logger has a
+        value in the period.
+    """
+    from . import clusters
+
+    loggers, profiles, tree = _profile_tree(city, period, data_type, reference)
+    if len(loggers) == 0:
+        # No logger has a value in the period (e.g. an episode without its cube)
+        return (
+            stations(city, period).iloc[:0].assign(cluster=pd.Series(dtype=int)),
+            pd.DataFrame({'hour': pd.Series(dtype=int), 'cluster': pd.Series(dtype=int),
+                          data_type: pd.Series(dtype=float), 'n_loggers': pd.Series(dtype=int)}),
+        )
+    k = max(1, min(int(k), len(loggers)))
+    if method == 'kmeans':
+        labels = clusters.kmeans(profiles, k)[0]
+    elif method == 'ward':
+        labels = clusters.cut_tree(tree, len(loggers), k)
+    else:
+        raise ValueError(f"unknown clustering method {method!r}")
+    labels, centroids, sizes = clusters.order_clusters(labels, profiles)
+
+    assignments = (
+        stations(city, period)
+        .merge(pd.DataFrame({'logger': loggers, 'cluster': labels + 1}), on='logger')
+    )
+    hours = uhi_matrix(city, period, data_type, reference).index.to_numpy()
+    n_clusters, n_hours = centroids.shape
+    centroid_table = pd.DataFrame({
+        'hour': np.tile(hours, n_clusters),
+        'cluster': np.repeat(np.arange(1, n_clusters + 1), n_hours),
+        data_type: centroids.ravel(),
+        'n_loggers': np.repeat(sizes, n_hours),
+    })
+    return assignments, centroid_table
+
+
+# -------------------------------------------------------------------
+# Summer days / tropical nights
+# -------------------------------------------------------------------
+
+
+@memoize()
+@persist(inputs=_period_files)
+def daily_stats(city: str, period: str) -> pd.DataFrame:
+    """
+    Daily temperature statistics of every logger, with the station names and coordinates.
+
+    Returns:
+    pd.DataFrame
+        Columns 'time', 'logger', 'daily_max', 'daily_min', 'daily_mean', 'Name', 'x', 'y'.
+    """
+    daily = period_daily(city, period)
+    # The station metadata of the whole summer also covers the heatwave and the episodes
+    station_info = read_table(get_files(city, 'summer')[4])[['Name', 'logger', 'x', 'y']]
+    return daily.merge(station_info, how='left', on='logger')
+
+
+def sdtn_summary(
+    data: pd.DataFrame,
+    data_col: str,
+    metric: str,
+    threshold: float,
+) -> pd.DataFrame:
+    """
+    Count the days above a threshold (and above the reference threshold) per station.
+
+    Parameters:
+    data : pd.DataFrame
+        Daily temperature statistics merged with the station metadata (see daily_stats).
+    data_col : str
+        Column for thresholding ('daily_max' or 'daily_min').
+    metric : str
+        Selected metric key ('summer_days' or 'tropical_nights').
+    threshold : float
+        Temperature threshold for filtering.
+
+    Returns:
+    pd.DataFrame
+        One row per station with 'exceed_count' and 'reference_count'.
+    """
+    reference_threshold = REFERENCE_THRESHOLDS[metric]
+    data = data.assign(
+        exceed_count=(data[data_col] > threshold).astype(int),
+        reference_count=(data[data_col] > reference_threshold).astype(int),
+    )
+
+    return data.groupby(["logger", "Name", "x", "y"], as_index=False).agg(
+        exceed_count=("exceed_count", "sum"),
+        reference_count=("reference_count", "sum"),
+    )
+
+
+@memoize(maxsize=512)
+@persist(inputs=_period_files)
+def sdtn_exceedances(city: str, period: str, metric: str, threshold: float) -> pd.DataFrame:
+    """
+    Days above a threshold per station (summer days: daily maximum, tropical nights: daily minimum).
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    period : str
+        'summer' or 'heatwave'.
+    metric : str
+        'summer_days' or 'tropical_nights'.
+    threshold : float
+        Temperature threshold in °C.
+
+    Returns:
+    pd.DataFrame
+        See sdtn_summary.
+    """
+    return sdtn_summary(daily_stats(city, period), SDTN_COLUMNS[metric], metric, float(threshold))
+
+
+@memoize()
+@persist(inputs=_period_files)
+def sdtn_exceedances_batch(city: str, period: str, metric: str, thresholds: tuple) -> pd.DataFrame:
+    """
+    Batch variant of sdtn_exceedances: the counts of every station for many thresholds.
+
+    The daily values are grouped by station once; the counts of all thresholds follow
+    from one (days x thresholds) comparison summed per station.
+
+    Parameters:
+    city, period, metric :
+        See sdtn_exceedances.
+    thresholds : tuple
+        Temperature thresholds in °C.
+
+    Returns:
+    pd.DataFrame
+        Index 'logger', one column of exceedance counts per threshold.
+    """
+    daily = period_daily(city, period).sort_values('logger', kind='stable')
+    values = daily[SDTN_COLUMNS[metric]].to_numpy(dtype=float)
+    loggers, starts = np.unique(daily['logger'].to_numpy(), return_index=True)
+    # NaN compares False, so missing days never count
+    above = values[:, None] > np.asarray(thresholds, dtype=float)[None, :]
+    counts = np.add.reduceat(above.astype(np.int64), starts, axis=0)
+    return pd.DataFrame(counts, index=pd.Index(loggers, name='logger'), columns=list(thresholds))
+
+
+# -------------------------------------------------------------------
+# Heat episodes
+# -------------------------------------------------------------------
+
+
+@memoize(maxsize=4)
+def _daily_arrays(city: str) -> tuple:
+    """Day x logger arrays of the whole-summer daily statistics (see heatwaves.daily_arrays)."""
+    from . import heatwaves as hw
+
+    return hw.daily_arrays(read_table.shared(get_files(city, 'summer')[3]))
+
+
+@memoize(maxsize=256)
+def heatwaves(
+    city: str,
+    min_days: int = 3,
+    tmax: float = 30.0,
+    tmin: float = None,
+    statistic: str = 'median',
+) -> pd.DataFrame:
+    """
+    Heat episodes of the summer campaign (see modules.heatwaves).
+
+    The daily statistics are arranged as day x logger arrays once per city; every set of
+    criteria is then a scan of the network series.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    min_days : int
+        Minimum number of consecutive hot days.
+    tmax : float
+        Daily maximum (°C) of the network a hot day reaches at least.
+    tmin : float, optional
+        Daily minimum (°C) of the network a hot day stays above.
+    statistic : str
+        Network value of a day: 'median', 'mean' or 'max' over the loggers.
+
+    Returns:
+    pd.DataFrame
+        Index 'episode' (1, 2, ... in time order) with the 'period' key of the episode
+        (accepted by every function taking a period) and the columns of
+        heatwaves.detect_episodes.
+    """
+    from . import heatwaves as hw
+
+    days, _, arrays = _daily_arrays(city)
+    criteria = hw.Criteria(int(min_days), float(tmax), None if tmin is None else float(tmin), statistic)
+    episodes = hw.detect_episodes(days, arrays, criteria)
+    episodes.insert(0, 'period', [episode_period(f, l) for f, l in zip(episodes['first'], episodes['last'])])
+    episodes.index = pd.RangeIndex(1, len(episodes) + 1, name='episode')
+    return episodes
+
+
+# -------------------------------------------------------------------
+# Land use and FITNAH
+# -------------------------------------------------------------------
+
+
+@memoize()
+def landuse_buffers(city: str) -> list:
+    """
+    Buffer radii (m) of the land-use file of a city, in file order.
+    """
+    return read_table(get_files(city, 'summer')[0])['buffer'].unique().tolist()
+
+
+@memoize()
+def landuse_slice(city: str, buffer: int) -> pd.DataFrame:
+    """
+    Land-use raster cell counts per class around every logger for one buffer.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    buffer : int
+        Buffer radius in metres.
+
+    Returns:
+    pd.DataFrame
+        Rows of data_viz_land_use.csv for the buffer (class codes as column names).
+    """
+    landuse = read_table(get_files(city, 'summer')[0])
+    return landuse[landuse['buffer'] == buffer]
+
+
+def fitnah_available(city: str) -> bool:
+    """
+    Whether FITNAH model data exists for a city (it does not for Bern).
+    """
+    return get_files(city, 'summer')[1].exists()
+
+
+@memoize()
+def fitnah_slice(city: str, buffer: int, dtype: str) -> pd.DataFrame:
+    """
+    FITNAH statistics around every logger for one buffer and variable.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    buffer : int
+        Buffer radius in metres.
+    dtype : str
+        FITNAH variable ('fitnah_ss', 'fitnah_sv', 'fitnah_temp', 'dem').
+
+    Returns:
+    pd.DataFrame
+        Rows of data_viz_fitnah.csv with 'mean', 'max', 'min', 'median' and 'count'
+        (empty if the city has no FITNAH data).
+    """
+    if not fitnah_available(city):
+        return pd.DataFrame(columns=['mean', 'max', 'min', 'median', 'count', 'buffer', 'logger', 'dtype', 'lon', 'lat'])
+    fitnah = read_table(get_files(city, 'summer')[1])
+    return fitnah[(fitnah['buffer'] == buffer) & (fitnah['dtype'] == dtype)]
+
+
+# -------------------------------------------------------------------
+# Zonal statistics of local rasters
+# -------------------------------------------------------------------
+
+
+def raster_available(city: str, name: str) -> bool:
+    """
+    Whether a local raster (see modules.zonal) exists for a city.
+    """
+    return get_raster_path(city, name).exists()
+
+
+def _zonal_inputs(city: str, name: str, radii: tuple) -> list:
+    raster_path = get_raster_path(city, name)
+    return [raster_path, raster_path.with_suffix('.json')] + list(_period_files(city, 'summer'))
+
+
+@memoize(maxsize=16)
+def _raster(city: str, name: str):
+    from .zonal import Raster
+    return Raster(get_raster_path(city, name))
+
+
+@memoize(maxsize=256)
+@persist(inputs=_zonal_inputs, code=('modules/zonal.py',))
+def zonal_table(city: str, name: str, radii: tuple) -> pd.DataFrame:
+    """
+    Zonal statistics of a local raster around every logger for many buffer radii at once.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    name : str
+        Raster name (see paths.get_raster_path). 'land_use' yields the cell count of every
+        land-use class, any other raster mean / max / min / median / count.
+    radii : tuple
+        Buffer radii in metres.
+
+    Returns:
+    pd.DataFrame
+        Rows in the schema of data_viz_land_use.csv or data_viz_fitnah.csv (without the
+        buffer polygons).
+    """
+    from . import zonal
+
+    loggers = stations(city, 'summer')
+    args = (
+        _raster(city, name),
+        loggers['logger'].to_numpy(),
+        loggers['lon'].to_numpy(),
+        loggers['lat'].to_numpy(),
+        list(radii),
+    )
+    if name == 'land_use':
+        landuse = read_table(get_files(city, 'summer')[0])
+        classes = [int(column) for column in landuse.columns if column.isdigit()]
+        return zonal.zonal_class_counts(*args, classes)
+    return zonal.zonal_stats(*args).assign(dtype=name)
+
+
+def zonal_slice(city: str, name: str, radius: float) -> pd.DataFrame:
+    """
+    Zonal statistics of a local raster around every logger for one buffer radius.
+
+    Parameters:
+    city, name :
+        See zonal_table.
+    radius : float
+        Buffer radius in metres.
+
+    Returns:
+    pd.DataFrame
+        See zonal_table (cached per radius).
+    """
+    return zonal_table(city, name, (radius,))
+
+
+# -------------------------------------------------------------------
+# Quality control
+# -------------------------------------------------------------------
+
+
+@memoize(cache_none=False)
+def qc_rates(city: str, period: str) -> pd.DataFrame:
+    """
+    Share of hours of every logger flagged by the quality control (see modules.qc).
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    period : str
+        'summer' or 'heatwave'; restricts the rates to the days of the period.
+
+    Returns:
+    pd.DataFrame or None
+        'logger', 'Name', the share (%) of hours with each flag and 'flagged', sorted by
+        'flagged'; None if the campaign cube was built without QC flags.
+    """
+    from . import qc
+
+    cube_dir = get_cube_dir(city)
+    if not (cube_dir / 'qc.npy').exists():
+        return None
+    with open(cube_dir / 'meta.json', encoding='utf-8') as f:
+        meta = json.load(f)
+    days = np.array(meta['days'], dtype='datetime64[D]')
+    period_days = np.asarray(period_daily(city, period)['time'].unique(), dtype='datetime64[D]')
+    bitmap = np.load(cube_dir / 'qc.npy', mmap_mode='r')
+    rates = qc.qc_rates(bitmap, np.array(meta['loggers']), np.isin(days, period_days))
+    names = stations(city, period)[['logger', 'Name']]
+    rates = rates.merge(names, how='left', on='logger')
+    columns = ['logger', 'Name'] + [c for c in rates.columns if c not in ('logger', 'Name')]
+    return rates[columns].sort_values('flagged', ascending=False, ignore_index=True)
@@ -0,0 +1,406 @@
+"""
+Module: artifacts
+================
+
+Disk-backed, content-addressed cache of derived artifacts (parsed tables and geometries,
+groupby summaries, figures), so that a restarted or redeployed process loads them instead
+of recomputing them from the CSVs.
+
+An artifact's key is a SHA-256 over
+
+- the function (module and qualified name) and the hash of its code files,
+- the arguments, where file paths count by the content of the file and DataFrames and
+  arrays by the content of their values,
+- the content of the input files the function declares (see persist),
+- the Python, NumPy, pandas and Plotly versions (pickles are not portable across them).
+
+A changed input file or transformation thus yields a new key; stale entries are never
+read and age out of the store. Results are pickled (highest protocol: NumPy and pandas
+blocks are written as raw buffers) to <root>/<key[:2]>/<key>.pkl.
+
+The store is safe for concurrent readers and writers in several processes: entries are
+written to a private temporary file and atomically renamed into place, so a reader sees a
+complete entry or none, and an unreadable entry is treated as a miss. Reads refresh the
+modification time of an entry; when the store grows beyond its size bound, the least
+recently used entries are removed (by one process at a time, under a file lock where the
+platform has one) until it is back below 80% of the bound.
+
+Entries are unpickled, so the cache directory must only be writable by the app.
+
+Environment:
+- HBS_DISK_CACHE: '0' disables the store (default '1')
+- HBS_CACHE_DIR: store directory (default .cache/artifacts in the repository)
+- HBS_CACHE_MAX_MB: size bound in MB (default 512)
+
+Usage:
+    python -m modules.artifacts --stats
+    python -m modules.artifacts --clear
+
+Classes:
+- ArtifactStore
+
+Functions:
+- file_digest
+- fingerprint
+- persist
+"""
+
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import threading
+import time
+import uuid
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent evictions only race on already removed files
+    fcntl = None
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+ENABLED = os.environ.get('HBS_DISK_CACHE', '1') != '0'
+CACHE_DIR = Path(os.environ.get('HBS_CACHE_DIR', REPO_DIR / '.cache' / 'artifacts'))
+MAX_BYTES = int(float(os.environ.get('HBS_CACHE_MAX_MB', 512)) * 2 ** 20)
+# Eviction stops below this share of the bound, so that it does not run on every write
+EVICT_TO = 0.8
+FORMAT_VERSION = 1
+
+
+def _versions() -> str:
+    versions = [sys.version.split()[0], str(pickle.HIGHEST_PROTOCOL)]
+    for package in ('numpy', 'pandas', 'plotly'):
+        try:
+            versions.append(f'{package}={metadata.version(package)}')
+        except metadata.PackageNotFoundError:
+            versions.append(f'{package}=-')
+    return ';'.join(versions)
+
+
+_SALT = f'{FORMAT_VERSION};{_versions()}'.encode()
+
+# (path, size, mtime_ns) -> digest, so every file is hashed once per process and change
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """
+    SHA-256 of a file's content, memoized per (path, size, modification time).
+
+    Parameters:
+    path : Path
+        File path.
+
+    Returns:
+    str
+        Hex digest, or 'missing' if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+def fingerprint(value) -> bytes:
+    """
+    Content fingerprint of an argument.
+
+    Files count by their content, DataFrames, Series and arrays by their values, containers
+    element-wise and everything else by its repr.
+
+    Parameters:
+    value :
+        Argument value.
+
+    Returns:
+    bytes
+        Digest of the value.
+    """
+    sha = hashlib.sha256()
+    if isinstance(value, Path):
+        sha.update(b'file:' + file_digest(value).encode() if value.is_file() else b'path:' + str(value).encode())
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        sha.update(type(value).__name__.encode())
+        sha.update(repr(value.dtypes if isinstance(value, pd.DataFrame) else value.dtype).encode())
+        sha.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        try:
+            sha.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        except TypeError:
+            # Unhashable cells (e.g. lists of coordinates) count by their repr
+            frame = value.to_frame() if isinstance(value, pd.Series) else value
+            frame = frame.apply(lambda column: column.map(repr) if column.dtype == object else column)
+            sha.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        sha.update(f'{value.dtype}{value.shape}'.encode())
+        sha.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        sha.update(type(value).__name__.encode())
+        for item in value:
+            sha.update(fingerprint(item))
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            sha.update(fingerprint(key) + fingerprint(value[key]))
+    else:
+        sha.update(f'{type(value).__name__}:{value!r}'.encode())
+    return sha.digest()
+
+
+class ArtifactStore:
+    """
+    Size-bounded directory of pickled artifacts addressed by their key.
+
+    Parameters:
+    root : Path
+        Store directory (created on the first write).
+    max_bytes : int
+        Size bound of the stored entries.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        # Estimated size of the store; None until the first write scans the directory
+        self._size = None
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f'{key}.pkl'
+
+    def get(self, key: str) -> tuple:
+        """
+        Load an entry.
+
+        Parameters:
+        key : str
+            Hex key.
+
+        Returns:
+        tuple
+            (True, value) on a hit, (False, None) on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except Exception:
+            # Truncated or incompatible entry: drop it and recompute
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return True, value
+
+    def put(self, key: str, value) -> None:
+        """
+        Store an entry (atomically replacing an existing one) and evict if over the bound.
+
+        Parameters:
+        key : str
+            Hex key.
+        value :
+            Picklable value.
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.stem}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = tmp.stat().st_size
+            os.replace(tmp, path)
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            raise
+        self.writes += 1
+        with self._lock:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self) -> list:
+        entries = []
+        if not self.root.is_dir():
+            return entries
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.pkl'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        """
+        Total size of the stored entries in bytes.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the store is below EVICT_TO of its bound.
+
+        Returns:
+        int
+            Number of removed entries (0 if another process is already evicting).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'a') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                Path(path).unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            # Temporary files of writers that died mid-write
+            cutoff = time.time() - 3600
+            for tmp in self.root.glob('*/*.tmp'):
+                try:
+                    if tmp.stat().st_mtime < cutoff:
+                        tmp.unlink(missing_ok=True)
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._size = total
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove every entry.
+        """
+        for _, _, path in self._entries():
+            Path(path).unlink(missing_ok=True)
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> dict:
+        """
+        Entry count, size and the hit / miss / write counters of this process.
+        """
+        entries = self._entries()
+        return {
+            'root': str(self.root),
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+        }
+
+
+store = ArtifactStore(CACHE_DIR, MAX_BYTES)
+
+
+@functools.lru_cache(maxsize=None)
+def _code_digest(files: tuple) -> str:
+    sha = hashlib.sha256()
+    for path in files:
+        sha.update(file_digest(Path(path)).encode())
+    return sha.hexdigest()
+
+
+def persist(inputs=None, code: tuple = ()):
+    """
+    Decorator storing a function's results in the artifact store.
+
+    Place it below memoize / st.cache_data: the in-memory caches serve repeated calls of a
+    process, the store serves the first call after a restart.
+
+    Parameters:
+    inputs : callable, optional
+        Called with the function's arguments; returns the paths of the files the result
+        is derived from (path arguments are content-addressed without it).
+    code : tuple
+        Further code files (relative to the repository) the transformation depends on;
+        the module of the function is always included.
+
+    Returns:
+    callable
+        Decorator; the wrapped function exposes the store as .store.
+    """
+    def decorator(func):
+        code_files = tuple(str(REPO_DIR / name) for name in code) + (inspect.getfile(func),)
+        name = f'{func.__module__}.{func.__qualname__}'.encode()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            sha = hashlib.sha256(_SALT + name + _code_digest(code_files).encode())
+            sha.update(fingerprint(args) + fingerprint(kwargs))
+            if inputs is not None:
+                for path in inputs(*args, **kwargs):
+                    sha.update(file_digest(Path(path)).encode())
+            key = sha.hexdigest()
+            hit, value = store.get(key)
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            try:
+                store.put(key, value)
+            except (OSError, pickle.PicklingError, TypeError, AttributeError):
+                # A read-only disk or an unpicklable result only costs the persistence
+                pass
+            return value
+
+        wrapper.store = store
+        return wrapper
+    return decorator
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the derived-artifact store.')
+    parser.add_argument('--stats', action='store_true', help='Print the entry count and size.')
+    parser.add_argument('--clear', action='store_true', help='Remove every entry.')
+    args = parser.parse_args()
+    if args.clear:
+        store.clear()
+    stats = store.stats()
+    print(f"{stats['root']}: {stats['entries']} entries, {stats['bytes'] / 2 ** 20:.1f} of {stats['max_bytes'] / 2 ** 20:.0f} MB")
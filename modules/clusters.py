@@ -0,0 +1,239 @@
+"""
+Module: clusters
+================
+
+Clustering of the loggers by their mean 24-hour UHI / City Index profile. Each logger is
+one 24-dimensional vector; loggers with similar diurnal cycles (urban canyons warming up
+at night, lakeside and park sites, rural sites) end up in the same cluster.
+
+Two methods, both in batched NumPy over all loggers at once:
+
+- k-means (k-means++ seeding, Lloyd iterations): all N_INIT restarts run together as one
+  (runs x loggers x clusters) distance computation per iteration; the restart with the
+  lowest within-cluster sum of squares wins.
+- Hierarchical clustering with Ward's criterion: the whole tree is built once with the
+  nearest-neighbour chain algorithm, which only needs the cluster centroids (O(n) memory
+  instead of a pairwise distance matrix); the clusters for any k are then a cut of the
+  tree, so changing k does not recompute anything.
+
+Clusters are numbered by decreasing mean of their centroid profile (cluster 0 is the
+warmest), so the numbering is stable when k or the method changes.
+
+Functions:
+- profile_matrix
+- kmeans
+- ward_tree
+- cut_tree
+- order_clusters
+"""
+
+import numpy as np
+import pandas as pd
+
+# Restarts of k-means, run as one batch
+N_INIT = 8
+MAX_ITER = 100
+SEED = 0
+
+
+def profile_matrix(matrix: pd.DataFrame) -> tuple:
+    """
+    Profiles of the loggers from an hour x logger table.
+
+    Hours missing for a logger are filled with the logger's mean; loggers without any
+    value are dropped.
+
+    Parameters:
+    matrix : pd.DataFrame
+        Index 'hour', one column per logger (see api.uhi_matrix).
+
+    Returns:
+    tuple
+        (loggers, profiles): logger IDs and the (loggers x hours) array of profiles.
+    """
+    profiles = matrix.to_numpy(dtype=float).T
+    loggers = matrix.columns.to_numpy()
+    valid = ~np.isnan(profiles).all(axis=1)
+    profiles, loggers = profiles[valid], loggers[valid]
+    means = np.nanmean(profiles, axis=1, keepdims=True) if len(profiles) else profiles[:, :1]
+    return loggers, np.where(np.isnan(profiles), means, profiles)
+
+
+def _squared_distances(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """(runs x points x clusters) squared distances of points (n x d) to centroids (runs x k x d)."""
+    distances = (
+        (points ** 2).sum(axis=1)[None, :, None]
+        - 2 * np.einsum('nd,rkd->rnk', points, centroids)
+        + (centroids ** 2).sum(axis=2)[:, None, :]
+    )
+    return np.maximum(distances, 0)
+
+
+def kmeans(
+    points: np.ndarray,
+    k: int,
+    n_init: int = N_INIT,
+    max_iter: int = MAX_ITER,
+    seed: int = SEED,
+) -> tuple:
+    """
+    k-means clustering with k-means++ seeding, all restarts batched.
+
+    Parameters:
+    points : np.ndarray
+        (n x d) vectors.
+    k : int
+        Number of clusters (at most n).
+    n_init : int
+        Number of restarts.
+    max_iter : int
+        Maximum number of Lloyd iterations.
+    seed : int
+        Random seed, so that the result is reproducible.
+
+    Returns:
+    tuple
+        (labels, centroids, inertia) of the best restart.
+    """
+    n, dims = points.shape
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+
+    # k-means++: every next centroid is drawn with probability proportional to the
+    # squared distance to the closest centroid so far
+    centroids = np.empty((n_init, k, dims))
+    centroids[:, 0] = points[rng.integers(n, size=n_init)]
+    closest = ((points[None] - centroids[:, :1]) ** 2).sum(axis=2)
+    for j in range(1, k):
+        cumulative = np.cumsum(closest, axis=1)
+        draws = rng.random(n_init) * cumulative[:, -1]
+        picks = np.minimum((cumulative <= draws[:, None]).sum(axis=1), n - 1)
+        centroids[:, j] = points[picks]
+        closest = np.minimum(closest, ((points[None] - centroids[:, j:j + 1]) ** 2).sum(axis=2))
+
+    labels = None
+    for _ in range(max_iter):
+        new_labels = _squared_distances(points, centroids).argmin(axis=2)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        members = np.zeros((n_init, n, k))
+        np.put_along_axis(members, labels[..., None], 1.0, axis=2)
+        counts = members.sum(axis=1)
+        sums = np.einsum('rnk,nd->rkd', members, points)
+        # An emptied cluster keeps its centroid
+        centroids = np.where(counts[..., None] > 0, sums / np.maximum(counts, 1)[..., None], centroids)
+
+    distances = _squared_distances(points, centroids)
+    labels = distances.argmin(axis=2)
+    inertia = np.take_along_axis(distances, labels[..., None], axis=2)[..., 0].sum(axis=1)
+    best = int(inertia.argmin())
+    return labels[best], centroids[best], float(inertia[best])
+
+
+def ward_tree(points: np.ndarray) -> np.ndarray:
+    """
+    Agglomerative clustering tree with Ward's criterion (nearest-neighbour chain).
+
+    The cost of merging clusters A and B is the increase of the within-cluster sum of
+    squares, |A||B| / (|A| + |B|) * |c_A - c_B|^2. It is computed from the centroids of
+    the current clusters, one row at a time.
+
+    Parameters:
+    points : np.ndarray
+        (n x d) vectors.
+
+    Returns:
+    np.ndarray
+        (n - 1) x 4 merges [kept, absorbed, cost, size]: the cluster in row 'absorbed'
+        joins the one in row 'kept' (row indices of points stand for the clusters).
+    """
+    n = len(points)
+    centroids = points.astype(float).copy()
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    merges = []
+    chain = []
+    while len(merges) < n - 1:
+        if not chain:
+            chain.append(int(np.flatnonzero(active)[0]))
+        a = chain[-1]
+        cost = sizes * sizes[a] / (sizes + sizes[a]) * ((centroids - centroids[a]) ** 2).sum(axis=1)
+        cost[~active] = np.inf
+        cost[a] = np.inf
+        b = int(cost.argmin())
+        # Prefer the previous chain element on ties, so that the chain always ends
+        if len(chain) > 1 and cost[chain[-2]] <= cost[b]:
+            b = chain[-2]
+        if len(chain) > 1 and b == chain[-2]:
+            del chain[-2:]
+            kept, absorbed = min(a, b), max(a, b)
+            size = sizes[a] + sizes[b]
+            centroids[kept] = (sizes[a] * centroids[a] + sizes[b] * centroids[b]) / size
+            sizes[kept] = size
+            active[absorbed] = False
+            merges.append((kept, absorbed, cost[b], size))
+        else:
+            chain.append(b)
+    return np.array(merges, dtype=float).reshape(-1, 4)
+
+
+def cut_tree(merges: np.ndarray, n: int, k: int) -> np.ndarray:
+    """
+    Clusters of a ward_tree when it is cut into k clusters.
+
+    The merges are replayed in order of increasing cost (Ward's costs are monotone, so
+    this respects the tree) until k clusters are left.
+
+    Parameters:
+    merges : np.ndarray
+        Result of ward_tree.
+    n : int
+        Number of points.
+    k : int
+        Number of clusters.
+
+    Returns:
+    np.ndarray
+        Cluster label (0 to k - 1, in no particular order) of every point.
+    """
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Ties keep the order in which the chain merged them
+    order = np.lexsort((np.arange(len(merges)), merges[:, 2]))
+    for kept, absorbed in merges[order[:max(n - k, 0)], :2].astype(int):
+        parent[find(absorbed)] = find(kept)
+    roots = np.array([find(i) for i in range(n)])
+    return np.unique(roots, return_inverse=True)[1]
+
+
+def order_clusters(labels: np.ndarray, points: np.ndarray) -> tuple:
+    """
+    Renumber clusters by decreasing mean of their centroid and compute the centroids.
+
+    Parameters:
+    labels : np.ndarray
+        Cluster label of every point.
+    points : np.ndarray
+        (n x d) vectors.
+
+    Returns:
+    tuple
+        (labels, centroids, sizes) with cluster 0 the one with the highest mean.
+    """
+    clusters, labels = np.unique(labels, return_inverse=True)
+    sizes = np.bincount(labels, minlength=len(clusters))
+    centroids = np.zeros((len(clusters), points.shape[1]), dtype=float)
+    for i, column in enumerate(points.T):
+        centroids[:, i] = np.bincount(labels, weights=column, minlength=len(clusters))
+    centroids /= sizes[:, None]
+    rank = np.argsort(-centroids.mean(axis=1), kind='stable')
+    new_label = np.empty_like(rank)
+    new_label[rank] = np.arange(len(rank))
+    return new_label[labels], centroids[rank], sizes[rank]
@@ -0,0 +1,384 @@
+"""
+Module: cube
+================
+
+This module stores the hourly measurements of a campaign as memory-mapped float32 cubes
+of shape (day, hour, logger), one per variable:
+
+- temperature: hourly mean temperature of each logger
+- uhi: temperature minus the temperature of the rural reference logger
+- city_index: temperature minus the mean temperature of all loggers at that hour
+
+The season-averaged *_hourly_uhi_ci.csv files only hold one value per (hour, logger); the
+cube keeps every day, so the spread of a logger's hourly values, heatwave-only subsets
+and single-day profiles are NumPy reductions over a slice of the cube. The arrays are
+opened with mmap_mode='r', so only the pages of the selected loggers are read.
+
+The cube is built once from the raw logger series (CSV with the columns 'time', 'logger'
+and 'temperature', or a store of modules.rawstore):
+
+    python -m modules.cube --raw raw_biel.csv --city biel
+    python -m modules.cube --raw data/biel/raw/summer23 --city biel
+
+If the series carries the 'qc' bitfield of modules.qc, flagged samples are left out, hours
+inconsistent with the neighbouring loggers are masked, and the hourly flags are stored
+as a (day, hour, logger) uint8 bitmap (qc.npy) for reporting.
+
+Classes:
+- TemperatureCube
+
+Functions:
+- build_cube
+- open_cube
+"""
+
+import argparse
+import json
+import os
+import warnings
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import qc
+from .api import memoize, stations
+from .paths import REFERENCE_LOGGERS, get_cube_dir
+from .spatial import KDTree, to_local_metres
+
+VARIABLES = ['temperature', 'uhi', 'city_index']
+HOURS = 24
+META_FILE = 'meta.json'
+QC_FILE = 'qc.npy'
+
+# Percentile bands offered in the hourly evolution tab, as (lower, upper) percentiles
+BANDS = {'p25_75': (25, 75), 'p10_90': (10, 90)}
+
+
+class TemperatureCube:
+    """
+    Read-only view of a campaign cube.
+
+    Parameters:
+    cube_dir : Path
+        Directory written by build_cube.
+    """
+
+    def __init__(self, cube_dir: Path):
+        cube_dir = Path(cube_dir)
+        with open(cube_dir / META_FILE, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.days = np.array(meta['days'], dtype='datetime64[D]')
+        self.loggers = np.array(meta['loggers'])
+        self.reference = meta['reference']
+        self.arrays = {
+            variable: np.load(cube_dir / f'{variable}.npy', mmap_mode='r') for variable in VARIABLES
+        }
+        # (day, hour, logger) QC bitmap; None if the cube was built from unflagged series
+        self.qc_bitmap = np.load(cube_dir / QC_FILE, mmap_mode='r') if (cube_dir / QC_FILE).exists() else None
+        self._positions = {logger: i for i, logger in enumerate(self.loggers.tolist())}
+
+    def logger_positions(self, loggers: list) -> np.ndarray:
+        """
+        Column positions of the given loggers; loggers missing from the cube are dropped.
+        """
+        return np.array([self._positions[l] for l in loggers if l in self._positions], dtype=np.intp)
+
+    def day_mask(self, days) -> np.ndarray:
+        """
+        Boolean mask over the day axis selecting the given dates.
+
+        Parameters:
+        days : array-like
+            Dates (strings, datetime64 or Timestamps).
+
+        Returns:
+        np.ndarray
+            Boolean array of length len(self.days).
+        """
+        return np.isin(self.days, np.asarray(days, dtype='datetime64[D]'))
+
+    def _slice(self, variable: str, loggers: list, day_mask: np.ndarray = None, reference: int = None) -> tuple:
+        cols = self.logger_positions(loggers)
+        # Index the (small) day axis first so only the selected days are paged in
+        days = np.flatnonzero(day_mask) if day_mask is not None else slice(None)
+        if variable == 'uhi' and reference not in (None, self.reference) and reference in self._positions:
+            # UHI against another logger: T_i - T_r
+            temperature = self.arrays['temperature'][days]
+            ref_col = self._positions[reference]
+            return temperature[:, :, cols] - temperature[:, :, ref_col:ref_col + 1], self.loggers[cols]
+        return self.arrays[variable][days][:, :, cols], self.loggers[cols]
+
+    def percentile_bands(
+        self,
+        variable: str,
+        loggers: list,
+        percentiles: tuple = (25, 50, 75),
+        day_mask: np.ndarray = None,
+        reference: int = None,
+        hour_mask: np.ndarray = None,
+    ) -> pd.DataFrame:
+        """
+        Percentiles across days of every (hour, logger) value.
+
+        Parameters:
+        variable : str
+            One of VARIABLES.
+        loggers : list
+            Logger IDs.
+        percentiles : tuple
+            Percentiles to compute (0-100).
+        day_mask : np.ndarray, optional
+            Boolean mask over the day axis (default: all days).
+        reference : int, optional
+            Reference logger of the UHI (default: the reference the cube was built with).
+        hour_mask : np.ndarray, optional
+            Boolean (day, hour) mask, e.g. a weather condition; other cells are ignored.
+
+        Returns:
+        pd.DataFrame
+            Long format with 'hour', 'logger' and one column 'p<q>' per percentile.
+        """
+        if hour_mask is not None:
+            day_mask = hour_mask.any(axis=1) & (day_mask if day_mask is not None else True)
+        values, loggers = self._slice(variable, loggers, day_mask, reference)
+        if values.shape[0] == 0 or values.shape[2] == 0:
+            return pd.DataFrame(columns=['hour', 'logger'] + [f'p{q}' for q in percentiles])
+        if hour_mask is not None:
+            values = np.where(hour_mask[day_mask][:, :, None], values, np.nan)
+        # Hours without a single valid day yield NaN without a RuntimeWarning
+        with _ignore_nan_warnings():
+            bands = np.nanpercentile(values, percentiles, axis=0)  # (percentile, hour, logger)
+        hours, cols = np.meshgrid(np.arange(HOURS), np.arange(len(loggers)), indexing='ij')
+        result = {'hour': hours.ravel(), 'logger': loggers[cols.ravel()]}
+        for i, q in enumerate(percentiles):
+            result[f'p{q}'] = bands[i].ravel()
+        return pd.DataFrame(result)
+
+    def day_profile(self, variable: str, day, loggers: list, reference: int = None) -> pd.DataFrame:
+        """
+        Hourly values of the given loggers on a single day.
+
+        Returns:
+        pd.DataFrame
+            Long format with 'day', 'hour', 'logger' and the variable column (empty if
+            the day is not part of the campaign).
+        """
+        mask = self.day_mask([day])
+        values, loggers = self._slice(variable, loggers, mask, reference)
+        if not mask.any():
+            return pd.DataFrame(columns=['day', 'hour', 'logger', variable])
+        hours, cols = np.meshgrid(np.arange(HOURS), np.arange(len(loggers)), indexing='ij')
+        return pd.DataFrame({
+            'day': str(self.days[mask][0]),
+            'hour': hours.ravel(),
+            'logger': loggers[cols.ravel()],
+            variable: values[0].ravel(),
+        })
+
+    def hour_values(
+        self, variable: str, hour: int, logger, day_mask: np.ndarray = None, reference: int = None
+    ) -> pd.Series:
+        """
+        Values of one logger at one hour on every (selected) day, e.g. the 3 a.m. UHI.
+
+        Returns:
+        pd.Series
+            Values indexed by day.
+        """
+        values, loggers = self._slice(variable, [logger], day_mask, reference)
+        days = self.days[day_mask] if day_mask is not None else self.days
+        return pd.Series(values[:, hour, 0] if len(loggers) else np.full(len(days), np.nan), index=days, name=variable)
+
+    def masked_mean(
+        self, variable: str, mask: np.ndarray, loggers: list = None, reference: int = None
+    ) -> tuple:
+        """
+        Mean over the (day, hour) cells selected by a mask, per hour and logger.
+
+        Parameters:
+        variable : str
+            One of VARIABLES.
+        mask : np.ndarray
+            Boolean (day, hour) array, e.g. a weather condition (see modules.meteo).
+        loggers : list, optional
+            Logger IDs (default: all loggers of the cube).
+        reference : int, optional
+            Reference logger of the UHI.
+
+        Returns:
+        tuple
+            (loggers, means, counts): means and numbers of valid values are (hour, logger)
+            arrays; hours without a selected value are NaN.
+        """
+        loggers = self.loggers.tolist() if loggers is None else loggers
+        days = mask.any(axis=1)
+        values, loggers = self._slice(variable, loggers, days, reference)
+        selected = np.where(mask[days][:, :, None], values, np.nan)
+        counts = np.sum(~np.isnan(selected), axis=0)
+        with _ignore_nan_warnings():
+            means = np.nanmean(selected, axis=0)
+        return loggers, means, counts
+
+
+
+@contextmanager
+def _ignore_nan_warnings():
+    """Silence the 'All-NaN slice' / 'Mean of empty slice' warnings of the nan-reductions."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        yield
+
+
+def _nearest_others(coordinates: pd.DataFrame, loggers: np.ndarray, k: int) -> np.ndarray:
+    """(logger, k) cube positions of the k nearest other loggers with known coordinates."""
+    coordinates = coordinates.drop_duplicates('logger').set_index('logger').reindex(loggers)
+    known = np.flatnonzero(coordinates['lon'].notna().to_numpy())
+    points = to_local_metres(coordinates['lon'].to_numpy()[known], coordinates['lat'].to_numpy()[known],
+                             float(coordinates['lat'].mean()))
+    tree = KDTree(points)
+    # Loggers without coordinates compare against themselves, i.e. are never flagged
+    neighbors = np.repeat(np.arange(len(loggers))[:, None], k, axis=1)
+    for i, point in zip(known, points):
+        _, idx = tree.query(point, k + 1)
+        others = known[idx[1:]]
+        neighbors[i, :len(others)] = others
+    return neighbors
+
+
+def build_cube(
+    raw: pd.DataFrame,
+    cube_dir: Path,
+    reference: int,
+    coordinates: pd.DataFrame = None,
+) -> TemperatureCube:
+    """
+    Build the cubes of a campaign from the raw logger series.
+
+    Parameters:
+    raw : pd.DataFrame
+        Raw measurements with 'time', 'logger' and 'temperature' columns (any resolution;
+        values are averaged per hour), optionally with the 'qc' bitfield of modules.qc.
+    cube_dir : Path
+        Output directory.
+    reference : int
+        Logger ID of the rural reference station.
+    coordinates : pd.DataFrame, optional
+        'logger', 'lon' and 'lat' of the loggers, for the neighbour consistency test of
+        flagged series.
+
+    Returns:
+    TemperatureCube
+        The written cube.
+    """
+    cube_dir = Path(cube_dir)
+    cube_dir.mkdir(parents=True, exist_ok=True)
+
+    time = pd.to_datetime(raw['time'])
+    samples = pd.DataFrame({
+        'day': time.dt.floor('D').values.astype('datetime64[D]'),
+        'hour': time.dt.hour.values,
+        'logger': raw['logger'].values,
+        'temperature': raw['temperature'].astype('float64').values,
+    })
+    flags = raw['qc'].to_numpy(dtype=np.uint8) if 'qc' in raw else None
+    valid = samples if flags is None else samples[(flags & qc.SAMPLE_MASK) == 0]
+    hourly = valid.groupby(['day', 'hour', 'logger'], sort=False)['temperature'].mean()
+    day_values = hourly.index.get_level_values('day').values.astype('datetime64[D]')
+    days = np.arange(day_values.min(), day_values.max() + np.timedelta64(1, 'D'))
+    loggers = np.sort(hourly.index.get_level_values('logger').unique().values)
+    if reference not in set(loggers.tolist()):
+        raise ValueError(f"Reference logger {reference} is not part of the raw data.")
+
+    temperature = np.full((len(days), HOURS, len(loggers)), np.nan, dtype=np.float32)
+    day_idx = (day_values - days[0]).astype(int)
+    hour_idx = hourly.index.get_level_values('hour').values
+    logger_idx = np.searchsorted(loggers, hourly.index.get_level_values('logger').values)
+    temperature[day_idx, hour_idx, logger_idx] = hourly.values
+
+    bitmap = None
+    if flags is not None:
+        bitmap = np.zeros(temperature.shape, dtype=np.uint8)
+        sample_days = (samples['day'].values.astype('datetime64[D]') - days[0]).astype(int)
+        sample_loggers = np.searchsorted(loggers, samples['logger'].values)
+        inside = loggers[np.minimum(sample_loggers, len(loggers) - 1)] == samples['logger'].values
+        np.bitwise_or.at(
+            bitmap,
+            (sample_days[inside], samples['hour'].values[inside], sample_loggers[inside]),
+            flags[inside],
+        )
+        bitmap[np.isnan(temperature)] |= qc.GAP
+        if coordinates is not None and len(loggers) > qc.NEIGHBORS:
+            inconsistent = qc.neighbor_flags(temperature, _nearest_others(coordinates, loggers, qc.NEIGHBORS))
+            bitmap[inconsistent] |= qc.NEIGHBOR
+            temperature[inconsistent] = np.nan
+
+    ref_col = int(np.searchsorted(loggers, reference))
+    with _ignore_nan_warnings():
+        arrays = {
+            'temperature': temperature,
+            'uhi': temperature - temperature[:, :, ref_col:ref_col + 1],
+            'city_index': temperature - np.nanmean(temperature, axis=2, keepdims=True),
+        }
+
+    for variable, values in arrays.items():
+        out = np.lib.format.open_memmap(
+            cube_dir / f'{variable}.tmp.npy', mode='w+', dtype=np.float32, shape=values.shape
+        )
+        out[:] = values
+        out.flush()
+        del out
+        os.replace(cube_dir / f'{variable}.tmp.npy', cube_dir / f'{variable}.npy')
+    if bitmap is not None:
+        np.save(cube_dir / QC_FILE, bitmap)
+    elif (cube_dir / QC_FILE).exists():
+        os.remove(cube_dir / QC_FILE)
+
+    meta = {
+        'days': [str(d) for d in days],
+        'loggers': loggers.tolist(),
+        'reference': int(reference),
+        'variables': VARIABLES,
+    }
+    with open(cube_dir / META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return TemperatureCube(cube_dir)
+
+
+@memoize(maxsize=8, cache_none=False)
+def open_cube(cube_dir: Path) -> TemperatureCube:
+    """
+    Open a campaign cube once per process.
+
+    Parameters:
+    cube_dir : Path
+        Directory written by build_cube (see structure.get_cube_dir).
+
+    Returns:
+    TemperatureCube or None
+        None if the cube has not been built.
+    """
+    if not (Path(cube_dir) / META_FILE).exists():
+        return None
+    return TemperatureCube(cube_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the day x hour x logger cube of a campaign.')
+    parser.add_argument(
+        '--raw', required=True,
+        help="CSV with 'time', 'logger', 'temperature' and optionally 'qc', or a raw series store directory",
+    )
+    parser.add_argument('--city', required=True, choices=sorted(REFERENCE_LOGGERS))
+    parser.add_argument('--reference', type=int, default=None, help='reference logger (default: rural reference)')
+    args = parser.parse_args()
+
+    if Path(args.raw).is_dir():
+        from .rawstore import RawStore
+        raw = RawStore(args.raw).read()
+    else:
+        raw = pd.read_csv(args.raw, usecols=lambda column: column in ('time', 'logger', 'temperature', 'qc'))
+    reference = args.reference if args.reference is not None else REFERENCE_LOGGERS[args.city]
+    cube = build_cube(raw, get_cube_dir(args.city), reference, stations(args.city, 'summer'))
+    print(f"{len(cube.days)} days x {HOURS} hours x {len(cube.loggers)} loggers -> {get_cube_dir(args.city)}")
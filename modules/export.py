@@ -0,0 +1,424 @@
+"""
+Module: export
+================
+
+Streaming export of the data behind a tab's current selection (city, period, hour, buffer,
+variable, loggers, date window) as CSV or Parquet.
+
+The rows are taken from the cached datasets of modules.api without copying them (see
+memoize's shared()): the selection is resolved to row positions once, and the rows are
+then sliced, joined with the station metadata where needed (daily values) and serialized
+CHUNK_ROWS at a time by a generator. Neither the joined table nor the whole CSV text
+exists in memory at any point; the caller decides where the chunks go (a file, a socket).
+The app writes them to a temporary file (write_file) and hands that file to its download
+button. Streamlit's download button reads the file into memory to serve it, so the
+app only offers files up to MAX_DOWNLOAD_BYTES (HBS_EXPORT_MAX_MB, default 100); larger
+selections are exported headless. The temporary files of sessions that went away are
+removed when a newer export is written, once they are older than EXPORT_TTL_S
+(HBS_EXPORT_TTL_S, default one hour); the rest is removed when the process exits.
+
+Parquet requires pyarrow; without it only CSV is offered.
+
+Usage:
+    python -m modules.export daily biel summer --loggers 206 207 --days 2023-07-01 2023-07-31 -o out.csv
+    python -m modules.export uhi bern heatwave --hour 3 --format parquet -o uhi.parquet
+
+Classes:
+- Selection
+
+Functions:
+- formats
+- date_range
+- iter_chunks
+- iter_csv
+- iter_parquet
+- stream
+- write_file
+- file_name
+"""
+
+import argparse
+import atexit
+import functools
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from . import api
+from .paths import episode_days, get_cube_dir, get_files, get_meteo_path
+
+# Rows serialized per chunk; a few MB of CSV text
+CHUNK_ROWS = 50_000
+# Format -> (MIME type, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+DATASETS = ('uhi', 'daily', 'sdtn', 'landuse', 'fitnah')
+# Datasets with a 'time' column that a date window applies to
+DATED = ('daily',)
+# Row index of the CSV files, not part of the data
+_INDEX_COLUMNS = ['Unnamed: 0']
+# Largest file offered by the app (Streamlit's download button holds it in memory)
+MAX_DOWNLOAD_BYTES = int(float(os.environ.get('HBS_EXPORT_MAX_MB', '100')) * 2 ** 20)
+# Age after which temporary export files are removed (s)
+EXPORT_TTL_S = float(os.environ.get('HBS_EXPORT_TTL_S', 3600))
+
+
+class Selection(NamedTuple):
+    """
+    What to export: a dataset and the selection of the tab it is shown in.
+
+    Attributes:
+    dataset : str
+        'uhi' (hourly UHI / City Index), 'daily' (daily temperatures with the station
+        metadata), 'sdtn' (days above a threshold per station), 'landuse' or 'fitnah'.
+    city, period : str
+        City and period keys.
+    hour : int, optional
+        Hour of the day (uhi; None: all hours).
+    reference : int, optional
+        Reference logger of the UHI.
+    conditions : tuple
+        Weather conditions the UHI is restricted to (see modules.meteo).
+    metric, threshold :
+        Summer days / tropical nights and the threshold (sdtn).
+    buffer : int, optional
+        Precomputed buffer radius (landuse, fitnah).
+    radius : int, optional
+        Any buffer radius computed from a local raster (replaces buffer).
+    dtype : str, optional
+        FITNAH variable.
+    loggers : tuple
+        Logger IDs to keep (empty: all).
+    days : tuple, optional
+        (first, last) ISO date of the window to keep (daily).
+    """
+    dataset: str
+    city: str
+    period: str
+    hour: int = None
+    reference: int = None
+    conditions: tuple = ()
+    metric: str = 'tropical_nights'
+    threshold: float = None
+    buffer: int = None
+    radius: int = None
+    dtype: str = None
+    loggers: tuple = ()
+    days: tuple = None
+
+
+def formats() -> list:
+    """
+    Export formats available in this environment (Parquet requires pyarrow).
+    """
+    return [fmt for fmt in FORMATS if fmt != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+
+def date_range(city: str, period: str) -> tuple:
+    """
+    First and last day of the daily values of a period.
+
+    Returns:
+    tuple
+        (first, last) as ISO date strings.
+    """
+    times = _daily(city, period)['time']
+    return times.min(), times.max()
+
+
+def _daily(city: str, period: str) -> pd.DataFrame:
+    """The cached daily statistics of a period (see api.period_daily), without a copy."""
+    if episode_days(period) is None:
+        return api.read_table.shared(get_files(city, period)[3])
+    return api.episode_daily.shared(city, period)
+
+
+def _source(selection: Selection) -> tuple:
+    """The cached frame holding the selection's rows, and the metadata joined to every chunk."""
+    city, period = selection.city, selection.period
+    dataset = selection.dataset
+    if dataset == 'uhi':
+        if selection.conditions:
+            from . import meteo
+            _, _, uhi_path, tempstats_path, _ = get_files(city, period)
+            frame = meteo.conditioned_uhi_ci(
+                uhi_path, tempstats_path, get_cube_dir(city), get_meteo_path(city),
+                tuple(selection.conditions), selection.reference, episode_days(period),
+            )
+        else:
+            frame = api.uhi_hourly.shared(city, period, selection.reference)
+        return frame, None
+    if dataset == 'daily':
+        # The join of daily_stats, done per chunk instead of on the whole table
+        station_info = api.read_table.shared(get_files(city, 'summer')[4])[['Name', 'logger', 'x', 'y']]
+        return _daily(city, period), station_info
+    if dataset == 'sdtn':
+        threshold = selection.threshold
+        if threshold is None:
+            threshold = api.REFERENCE_THRESHOLDS[selection.metric]
+        return api.sdtn_exceedances.shared(city, period, selection.metric, float(threshold)), None
+    if dataset == 'landuse':
+        if selection.radius is not None:
+            return api.zonal_table.shared(city, 'land_use', (selection.radius,)), None
+        return api.landuse_slice.shared(city, selection.buffer), None
+    if dataset == 'fitnah':
+        if selection.radius is not None:
+            return api.zonal_table.shared(city, selection.dtype, (selection.radius,)), None
+        if not api.fitnah_available(city):
+            return api.fitnah_slice(city, selection.buffer, selection.dtype), None
+        return api.fitnah_slice.shared(city, selection.buffer, selection.dtype), None
+    raise ValueError(f"unknown dataset {dataset!r}, expected one of {DATASETS}")
+
+
+def _positions(frame: pd.DataFrame, selection: Selection) -> np.ndarray:
+    """Row positions of the frame that match the selection's hour, loggers and date window."""
+    keep = np.ones(len(frame), dtype=bool)
+    if selection.dataset == 'uhi' and selection.hour is not None:
+        keep &= frame['hour'].to_numpy() == selection.hour
+    if selection.loggers:
+        keep &= np.isin(frame['logger'].to_numpy(), np.asarray(selection.loggers))
+    if selection.dataset in DATED and selection.days:
+        first, last = (str(day) for day in selection.days)
+        # ISO dates order like strings
+        times = frame['time'].to_numpy(dtype=str)
+        keep &= (times >= first) & (times <= last)
+    return np.flatnonzero(keep)
+
+
+def iter_chunks(selection: Selection, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yield the rows of a selection as DataFrames of at most chunk_rows rows.
+
+    At least one (possibly empty) chunk is yielded, so that writers always see the columns.
+
+    Parameters:
+    selection : Selection
+        What to export.
+    chunk_rows : int
+        Rows per chunk.
+
+    Yields:
+    pd.DataFrame
+        Consecutive chunks of the selected rows, in file order.
+    """
+    frame, metadata = _source(selection)
+    positions = _positions(frame, selection)
+    columns = [i for i, column in enumerate(frame.columns) if column not in _INDEX_COLUMNS]
+    for start in range(0, max(len(positions), 1), chunk_rows):
+        chunk = frame.iloc[positions[start:start + chunk_rows], columns]
+        if metadata is not None:
+            chunk = chunk.merge(metadata, how='left', on='logger')
+        yield chunk.reset_index(drop=True)
+
+
+def iter_csv(chunks):
+    """
+    Serialize DataFrame chunks as one CSV document (header once, no row index).
+
+    Parameters:
+    chunks : iterable
+        DataFrames with the same columns.
+
+    Yields:
+    bytes
+        UTF-8 encoded CSV, one piece per chunk.
+    """
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer writes until it is drained."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def iter_parquet(chunks):
+    """
+    Serialize DataFrame chunks as one Parquet file, one row group per chunk.
+
+    The schema of the file is that of the first chunk.
+
+    Parameters:
+    chunks : iterable
+        DataFrames with the same columns.
+
+    Yields:
+    bytes
+        Consecutive pieces of the file (each written row group, then the footer).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _Sink()
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+def stream(selection: Selection, fmt: str = 'csv', chunk_rows: int = CHUNK_ROWS):
+    """
+    Stream the rows of a selection in an export format.
+
+    Parameters:
+    selection : Selection
+        What to export.
+    fmt : str
+        'csv' or 'parquet'.
+    chunk_rows : int
+        Rows per chunk.
+
+    Returns:
+    generator
+        Pieces of the file as bytes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {list(FORMATS)}")
+    writer = iter_parquet if fmt == 'parquet' else iter_csv
+    return writer(iter_chunks(selection, chunk_rows))
+
+
+@functools.lru_cache(maxsize=None)
+def _spool_dir() -> str:
+    """Temporary directory of the files written by the process, removed at exit."""
+    path = tempfile.mkdtemp(prefix='hbs_export_')
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def _sweep(directory: str) -> None:
+    """Remove the files of the temporary export directory older than EXPORT_TTL_S."""
+    expired = time.time() - EXPORT_TTL_S
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < expired:
+                os.unlink(entry.path)
+        except OSError:
+            # Removed meanwhile by its own session
+            pass
+
+
+def _new_file(fmt: str) -> Path:
+    """A new empty file in the temporary export directory, after sweeping expired ones."""
+    _sweep(_spool_dir())
+    fd, path = tempfile.mkstemp(suffix='.' + FORMATS[fmt][1], dir=_spool_dir())
+    os.close(fd)
+    return Path(path)
+
+
+def write_file(selection: Selection, fmt: str = 'csv', path=None, max_bytes: int = None):
+    """
+    Stream the rows of a selection into a file.
+
+    Parameters:
+    selection : Selection
+        What to export.
+    fmt : str
+        'csv' or 'parquet'.
+    path : Path, optional
+        Output file (default: a new temporary file, removed after EXPORT_TTL_S or when
+        the process exits).
+    max_bytes : int, optional
+        Give up once the file grows beyond this size.
+
+    Returns:
+    Path or None
+        The written file, or None if it exceeded max_bytes (nothing is left on disk).
+    """
+    path = Path(path) if path is not None else _new_file(fmt)
+    size = 0
+    with open(path, 'wb') as out:
+        for piece in stream(selection, fmt):
+            size += out.write(piece)
+            if max_bytes is not None and size > max_bytes:
+                break
+    if max_bytes is not None and size > max_bytes:
+        path.unlink(missing_ok=True)
+        return None
+    return path
+
+
+def file_name(selection: Selection, fmt: str = 'csv') -> str:
+    """
+    Descriptive file name of an export, e.g. 'biel_summer_uhi_h03.csv'.
+    """
+    parts = [selection.city, selection.period, selection.dataset]
+    if selection.dataset == 'uhi' and selection.hour is not None:
+        parts.append(f'h{selection.hour:02d}')
+    if selection.dataset == 'sdtn':
+        parts.append(selection.metric)
+        if selection.threshold is not None:
+            parts.append(f'{selection.threshold:g}')
+    if selection.dtype:
+        parts.append(selection.dtype)
+    if selection.radius is not None or selection.buffer is not None:
+        parts.append(f'{selection.radius if selection.radius is not None else selection.buffer}m')
+    if selection.days:
+        parts.append('_'.join(str(day) for day in selection.days))
+    return '_'.join(parts) + '.' + FORMATS[fmt][1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a selection of the app data as CSV or Parquet.')
+    parser.add_argument('dataset', choices=DATASETS)
+    parser.add_argument('city')
+    parser.add_argument('period')
+    parser.add_argument('--hour', type=int)
+    parser.add_argument('--reference', type=int)
+    parser.add_argument('--metric', default='tropical_nights', choices=list(api.SDTN_COLUMNS))
+    parser.add_argument('--threshold', type=float)
+    parser.add_argument('--buffer', type=int)
+    parser.add_argument('--radius', type=int)
+    parser.add_argument('--dtype')
+    parser.add_argument('--loggers', type=int, nargs='*', default=())
+    parser.add_argument('--days', nargs=2, metavar=('FIRST', 'LAST'))
+    parser.add_argument('--format', default='csv', choices=list(FORMATS))
+    parser.add_argument('-o', '--out', help='Output file (default: standard output).')
+    args = parser.parse_args()
+    selection = Selection(
+        args.dataset, args.city, args.period, hour=args.hour, reference=args.reference,
+        metric=args.metric, threshold=args.threshold, buffer=args.buffer, radius=args.radius,
+        dtype=args.dtype, loggers=tuple(args.loggers), days=tuple(args.days) if args.days else None,
+    )
+    if args.out:
+        write_file(selection, args.format, args.out)
+    else:
+        for piece in stream(selection, args.format):
+            sys.stdout.buffer.write(piece)
@@ -0,0 +1,168 @@
+"""
+Module: heatwaves
+================
+
+Detection of heat episodes in the daily temperature statistics of a campaign.
+
+The daily maxima and minima of all loggers are held as (day x logger) arrays over the
+full calendar of the campaign (days without data are NaN). Every day gets one network
+value per statistic (by default the median over the loggers, so that single sensors in
+the sun do not trigger an episode), a day is hot if it meets the criteria, and the
+episodes are the runs of at least Criteria.min_days consecutive hot days, found by
+run-length encoding the boolean day series. Days without data break a run.
+
+The statistics of all episodes are computed at once from cumulative sums over the
+network series, without slicing the data per episode.
+
+Detected episodes are offered as periods next to the whole summer and the shipped main
+heatwave; their data are derived from the whole-summer files (see paths.episode_period).
+
+Classes:
+- Criteria
+
+Functions:
+- daily_arrays
+- network_series
+- runs
+- detect_episodes
+"""
+
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Network statistic of the loggers' daily values
+STATISTICS = {'median': np.nanmedian, 'mean': np.nanmean, 'max': np.nanmax}
+# Daily minimum of a tropical night (°C)
+TROPICAL_NIGHT = 20.0
+
+
+class Criteria(NamedTuple):
+    """
+    Definition of a heat episode.
+
+    Attributes:
+    min_days : int
+        Minimum number of consecutive hot days.
+    tmax : float
+        Daily maximum (°C) a hot day reaches at least.
+    tmin : float, optional
+        Daily minimum (°C) a hot day stays above (None: no condition on the nights).
+    statistic : str
+        Network value of a day: 'median', 'mean' or 'max' over the loggers.
+    """
+    min_days: int = 3
+    tmax: float = 30.0
+    tmin: float = None
+    statistic: str = 'median'
+
+
+def daily_arrays(daily: pd.DataFrame, columns: tuple = ('daily_max', 'daily_min', 'daily_mean')) -> tuple:
+    """
+    (day x logger) arrays of daily statistics over the full calendar of the data.
+
+    Parameters:
+    daily : pd.DataFrame
+        Rows of a *_temp_stats.csv file ('time', 'logger' and the columns).
+    columns : tuple
+        Statistics to arrange.
+
+    Returns:
+    tuple
+        (days, loggers, arrays): datetime64[D] days from the first to the last date,
+        sorted logger IDs and a dict column -> (day x logger) float array, NaN where a
+        logger has no value.
+    """
+    dates = np.asarray(daily['time'], dtype='datetime64[D]')
+    first = dates.min() if len(dates) else np.datetime64('1970-01-01')
+    last = dates.max() if len(dates) else first - 1
+    days = np.arange(first, last + 1)
+    loggers, logger_pos = np.unique(daily['logger'].to_numpy(), return_inverse=True)
+    day_pos = (dates - first).astype(int)
+    arrays = {}
+    for column in columns:
+        grid = np.full((len(days), len(loggers)), np.nan)
+        grid[day_pos, logger_pos] = daily[column].to_numpy(dtype=float)
+        arrays[column] = grid
+    return days, loggers, arrays
+
+
+def network_series(grid: np.ndarray, statistic: str = 'median') -> np.ndarray:
+    """
+    One value per day from a (day x logger) array; NaN on days without any value.
+    """
+    with warnings.catch_warnings():
+        # All-NaN days (gaps in the campaign) are expected
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return STATISTICS[statistic](grid, axis=1)
+
+
+def runs(mask: np.ndarray) -> tuple:
+    """
+    Run-length encoding of the True runs of a boolean series.
+
+    Parameters:
+    mask : np.ndarray
+        Boolean series.
+
+    Returns:
+    tuple
+        (starts, lengths) of every run of consecutive True values.
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def _segment_sums(values: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    return cumulative[stops] - cumulative[starts]
+
+
+def detect_episodes(days: np.ndarray, arrays: dict, criteria: Criteria = Criteria()) -> pd.DataFrame:
+    """
+    Find the heat episodes of a campaign.
+
+    Parameters:
+    days : np.ndarray
+        Consecutive datetime64[D] days (see daily_arrays).
+    arrays : dict
+        (day x logger) arrays with at least 'daily_max' and 'daily_min'.
+    criteria : Criteria
+        Definition of a hot day and the minimum length of an episode.
+
+    Returns:
+    pd.DataFrame
+        One row per episode, in time order: 'first' and 'last' day (ISO dates), 'days',
+        the network daily maximum at its peak ('peak_max') and on average ('mean_max'),
+        the average network daily minimum ('mean_min') and the number of tropical nights
+        of the network ('tropical_nights').
+    """
+    tmax = network_series(arrays['daily_max'], criteria.statistic)
+    tmin = network_series(arrays['daily_min'], criteria.statistic)
+    # NaN compares False, so days without data are never hot
+    hot = tmax >= criteria.tmax
+    if criteria.tmin is not None:
+        hot &= tmin >= criteria.tmin
+    starts, lengths = runs(hot)
+    keep = lengths >= max(int(criteria.min_days), 1)
+    starts, lengths = starts[keep], lengths[keep]
+    stops = starts + lengths
+
+    # Maximum over [start, stop): reduceat over the interleaved bounds, every other result
+    bounds = np.column_stack([starts, stops]).ravel()
+    peak = np.maximum.reduceat(np.append(tmax, -np.inf), bounds)[::2] if len(starts) else np.empty(0)
+    # Hot days always have a maximum; a minimum may be missing
+    nights = _segment_sums(~np.isnan(tmin), starts, stops)
+    mean_min = _segment_sums(np.nan_to_num(tmin), starts, stops) / np.maximum(nights, 1)
+    return pd.DataFrame({
+        'first': days[starts].astype(str),
+        'last': days[stops - 1].astype(str),
+        'days': lengths,
+        'peak_max': np.round(peak, 1),
+        'mean_max': np.round(_segment_sums(np.nan_to_num(tmax), starts, stops) / np.maximum(lengths, 1), 1),
+        'mean_min': np.round(np.where(nights > 0, mean_min, np.nan), 1),
+        'tropical_nights': _segment_sums(tmin > TROPICAL_NIGHT, starts, stops).astype(int),
+    })
@@ -0,0 +1,207 @@
+"""
+Module: hexbin
+================
+
+This module provides the level-of-detail mode of the maps for dense sensor networks.
+Above LOD_THRESHOLD stations, drawing one marker per logger makes the figures slow to
+build and large to ship, so the stations are aggregated into hexagonal bins whose size
+corresponds to a fixed number of screen pixels at the zoom level of the map.
+
+The hexagon of every station is computed once per station set for all ZOOM_LEVELS
+(HexGrid); aggregating a value column is then a pair of np.bincount calls.
+
+Classes:
+- HexGrid
+
+Functions:
+- metres_per_pixel
+- build_hex_grid
+- lod_frame
+"""
+
+import numpy as np
+import pandas as pd
+
+from .api import memoize
+from .spatial import EARTH_RADIUS_M, to_local_metres
+
+# Number of stations above which the maps switch to hexagonal bins
+LOD_THRESHOLD = 1000
+ZOOM_LEVELS = range(8, 18)
+# Diameter of a hexagon on screen, in pixels
+HEX_PIXELS = 24
+
+SQRT3 = np.sqrt(3.0)
+
+
+def metres_per_pixel(zoom: float, lat: float) -> float:
+    """
+    Ground resolution of a web-mercator map.
+
+    Parameters:
+    zoom : float
+        Map zoom level.
+    lat : float
+        Latitude in degrees.
+
+    Returns:
+    float
+        Metres per screen pixel.
+    """
+    return 2 * np.pi * EARTH_RADIUS_M * np.cos(np.radians(lat)) / (256 * 2 ** zoom)
+
+
+def _hex_cells(points: np.ndarray, size: float) -> tuple:
+    """
+    Assign points to pointy-top hexagons of the given size (centre-to-corner, metres).
+
+    Returns:
+    tuple
+        (cell index of every point, (n_cells, 2) array of cell centres in metres).
+    """
+    q = (SQRT3 / 3 * points[:, 0] - points[:, 1] / 3) / size
+    r = (2 / 3 * points[:, 1]) / size
+    # Cube-coordinate rounding
+    x, z = q, r
+    y = -x - z
+    rx, ry, rz = np.round(x), np.round(y), np.round(z)
+    dx, dy, dz = np.abs(rx - x), np.abs(ry - y), np.abs(rz - z)
+    fix_x = (dx > dy) & (dx > dz)
+    fix_z = ~fix_x & (dz >= dy)
+    rx = np.where(fix_x, -ry - rz, rx)
+    rz = np.where(fix_z, -rx - ry, rz)
+
+    # Encode the axial coordinates as one integer key; a 1-D unique is much faster than axis=0
+    rx, rz = rx.astype(np.int64), rz.astype(np.int64)
+    if len(rx) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+    width = rz.max() - rz.min() + 1
+    keys, inverse = np.unique((rx - rx.min()) * width + (rz - rz.min()), return_inverse=True)
+    cell_q = keys // width + rx.min()
+    cell_r = keys % width + rz.min()
+    centres = np.column_stack([
+        size * SQRT3 * (cell_q + cell_r / 2),
+        size * 1.5 * cell_r,
+    ])
+    return inverse.ravel(), centres
+
+
+class HexGrid:
+    """
+    Hexagonal bins of a set of stations at every zoom level.
+
+    Parameters:
+    lon : np.ndarray
+        Station longitudes in degrees.
+    lat : np.ndarray
+        Station latitudes in degrees.
+    """
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray):
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        self.origin_lat = float(np.nanmean(lat)) if len(lat) else 0.0
+        valid = ~(np.isnan(lon) | np.isnan(lat))
+        points = to_local_metres(lon[valid], lat[valid], self.origin_lat)
+        scale = np.cos(np.radians(self.origin_lat))
+
+        self.valid = valid
+        self.levels = {}
+        for zoom in ZOOM_LEVELS:
+            # Centre-to-corner size of a hexagon HEX_PIXELS wide on screen
+            size = HEX_PIXELS * metres_per_pixel(zoom, self.origin_lat) / SQRT3
+            inverse, centres = _hex_cells(points, size)
+            centre_lon = np.degrees(centres[:, 0] / (EARTH_RADIUS_M * scale))
+            centre_lat = np.degrees(centres[:, 1] / EARTH_RADIUS_M)
+            self.levels[zoom] = (inverse, centre_lon, centre_lat)
+
+    def aggregate(self, values: dict, zoom: float) -> pd.DataFrame:
+        """
+        Mean of each value column per hexagon at a zoom level.
+
+        Parameters:
+        values : dict
+            Column name -> array of station values (same order as the coordinates).
+        zoom : float
+            Map zoom; the nearest precomputed level is used.
+
+        Returns:
+        pd.DataFrame
+            One row per non-empty hexagon with 'lon', 'lat', the mean of every value
+            column (NaN values are skipped) and 'n_stations'.
+        """
+        level = min(ZOOM_LEVELS, key=lambda z: abs(z - zoom))
+        inverse, centre_lon, centre_lat = self.levels[level]
+        n_cells = len(centre_lon)
+        result = {
+            'lon': centre_lon,
+            'lat': centre_lat,
+        }
+        for column, column_values in values.items():
+            column_values = np.asarray(column_values, dtype=float)[self.valid]
+            finite = ~np.isnan(column_values)
+            sums = np.bincount(inverse, weights=np.where(finite, column_values, 0.0), minlength=n_cells)
+            counts = np.bincount(inverse, weights=finite, minlength=n_cells)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[column] = sums / counts
+        result['n_stations'] = np.bincount(inverse, minlength=n_cells)
+        return pd.DataFrame(result)
+
+
+@memoize(maxsize=64)
+def _hex_grid(lon: bytes, lat: bytes) -> HexGrid:
+    """HexGrid of float64 coordinates given as bytes (hashable cache keys)."""
+    return HexGrid(np.frombuffer(lon), np.frombuffer(lat))
+
+
+def build_hex_grid(lon: np.ndarray, lat: np.ndarray) -> HexGrid:
+    """
+    Build (once per station set) the hexagonal bins of all zoom levels.
+
+    Parameters:
+    lon : np.ndarray
+        Station longitudes in degrees.
+    lat : np.ndarray
+        Station latitudes in degrees.
+
+    Returns:
+    HexGrid
+        The precomputed bins.
+    """
+    return _hex_grid(
+        np.ascontiguousarray(lon, dtype=np.float64).tobytes(), np.ascontiguousarray(lat, dtype=np.float64).tobytes()
+    )
+
+
+def lod_frame(
+    data: pd.DataFrame,
+    lon_col: str,
+    lat_col: str,
+    value_columns: list,
+    zoom: float,
+) -> pd.DataFrame:
+    """
+    Aggregate the stations into hexagons if there are more than LOD_THRESHOLD of them.
+
+    Parameters:
+    data : pd.DataFrame
+        One row per station.
+    lon_col : str
+        Longitude column.
+    lat_col : str
+        Latitude column.
+    value_columns : list
+        Numeric columns to average per hexagon.
+    zoom : float
+        Zoom level of the map.
+
+    Returns:
+    pd.DataFrame or None
+        Hexagon data with lon_col, lat_col, the value columns and 'n_stations', or None if
+        the stations should be drawn individually.
+    """
+    if len(data) <= LOD_THRESHOLD:
+        return None
+    grid = build_hex_grid(data[lon_col].to_numpy(dtype=float), data[lat_col].to_numpy(dtype=float))
+    hexes = grid.aggregate({column: data[column].to_numpy(dtype=float) for column in value_columns}, zoom)
+    return hexes.rename(columns={'lon': lon_col, 'lat': lat_col})
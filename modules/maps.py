@@ -7,13 +7,37 @@ Provides functionalities for visualizing Fitnah geospatial data, including:
 - A PyDeck-based map for station-based UHI or City Index values (hourly data).
 - A Plotly histogram function for aggregator-based data.
 - A Plotly histogram function for station-based UHI/CI data.
+- A map of the loggers colored by the cluster of their diurnal profile.
+
+Figures are built by cached, language-independent *_figure functions; the build_*
+functions return the localized figure (see relabel_figure) without displaying it, so tabs
+can build their panels concurrently (see modules.panels), and the plot_* functions build
+and display it.
+
+Above hexbin.LOD_THRESHOLD stations the maps aggregate the stations into hexagonal bins
+(see modules.hexbin) instead of drawing one marker per logger.
+
+The figures are also kept in the disk-backed artifact store (see modules.artifacts), so a
+restarted process does not rebuild them.
 """
 
 import numpy as np
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-from .structure import sensor_labels
+from .artifacts import persist
+from .hexbin import HEX_PIXELS, lod_frame
+from .structure import relabel_figure, sensor_labels
+
+FITNAH_MAP_COLUMNS = ['logger', 'lat', 'lon', 'mean', 'max', 'min', 'count']
+# Colors of the profile clusters, shared with their centroid curves (see plots)
+CLUSTER_COLORS = px.colors.qualitative.Safe
+BASEMAP_SOURCES = {
+    'color': 'https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.pixelkarte-farbe/default/current/3857/{z}/{x}/{y}.jpeg',
+    'grey': 'https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.pixelkarte-grau/default/current/3857/{z}/{x}/{y}.jpeg',
+    'relief': 'https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.swissalti3d-reliefschattierung/default/current/3857/{z}/{x}/{y}.png',
+    'landcover': "https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.vec200-landcover/default/current/3857/{z}/{x}/{y}.png",
+}
 
 def plot_fitnah_map(
     sel_data: pd.DataFrame,
@@ -29,12 +53,49 @@ def plot_fitnah_map(
     aggregator : str
         The column for color scaling (e.g., 'mean', 'max').
     maptype : str
-        Selected SwissTopo basemap.
+        Selected SwissTopo basemap key.
 
     Returns:
     None
         Displays the map in Streamlit.
     """
+    st.plotly_chart(build_fitnah_map(sel_data, aggregator, maptype))
+
+
+def build_fitnah_map(
+    sel_data: pd.DataFrame,
+    aggregator: str,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the Fitnah map shown by plot_fitnah_map.
+    """
+    return fitnah_map_figure(sel_data[FITNAH_MAP_COLUMNS], aggregator, maptype)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py', 'modules/structure.py'))
+def fitnah_map_figure(
+    sel_data: pd.DataFrame,
+    aggregator: str,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the (language-independent) Fitnah map figure.
+
+    Parameters:
+    sel_data : pd.DataFrame
+        Filtered Fitnah data without the geometry column.
+    aggregator : str
+        The column for color scaling (e.g., 'mean', 'max').
+    maptype : str
+        Selected SwissTopo basemap key.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The map figure.
+    """
+    sel_data = sel_data.copy()
     # Normalize values for color
     if 'logger' in sel_data.columns:
         sel_data['name'] = sel_data['logger'].apply(lambda x: sensor_labels.get(x, f"Logger {x}"))
@@ -43,7 +104,7 @@ def plot_fitnah_map(
     for col in ['mean', 'max', 'min']:
         sel_data[col] = np.round(sel_data[col], 2)
 
-    fig = px.scatter_map(
+    fig = _scatter_map(
         sel_data,
         lat="lat",
         lon="lon",
@@ -51,50 +112,50 @@ def plot_fitnah_map(
         hover_data=['logger','mean','max','min','count'],
         color=aggregator,  # Assigns the column to the color scale
         zoom=13,
-        height=500,
+        marker_size=25,
     )
-    fig.update_traces(marker={'size': 25})
 
-    final_fig = update_with_swisstopo(fig, maptype)
-
-    st.plotly_chart(final_fig)
+    return update_with_swisstopo(fig, maptype)
 
 def sdtn_map(
-    data: pd.DataFrame,
-    data_col: str,
-    metric: str,
-    threshold: int,
+    station_summary: pd.DataFrame,
     maptype: str,
-) -> pd.DataFrame:
+) -> None:
     """
     Visualize Summer Days and Tropical Nights with adjustable thresholds.
 
     Parameters:
-    data : pd.DataFrame
-        DataFrame with temperature data for analysis.
-    data_col : str
-        Column for thresholding ('daily_max' or 'daily_min').
-    metric : str
-        Selected metric (e.g., 'Summer Days', 'Tropical Nights').
-    threshold : int
-        Temperature threshold for filtering.
+    station_summary : pd.DataFrame
+        Exceedance counts per station (see api.sdtn_exceedances).
     maptype : str
-        Selected SwissTopo basemap.
+        Selected SwissTopo basemap key.
 
     Returns:
-    pd.DataFrame
-        Aggregated data for histogram plotting.
+    None
     """
-    data["exceed_count"] = (data[data_col] > threshold).astype(int)
-    reference_threshold = 30 if "Summer" in metric else 20
-    data["reference_count"] = (data[data_col] > reference_threshold).astype(int)
+    st.plotly_chart(sdtn_map_figure(station_summary, maptype))
 
-    station_summary = data.groupby(["logger", "Name", "x", "y"], as_index=False).agg(
-        exceed_count=("exceed_count", "sum"),
-        reference_count=("reference_count", "sum"),
-    )
 
-    fig = px.scatter_map(
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py', 'modules/structure.py'))
+def sdtn_map_figure(
+    station_summary: pd.DataFrame,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the (language-independent) exceedance map figure.
+
+    Parameters:
+    station_summary : pd.DataFrame
+        Exceedance counts per station.
+    maptype : str
+        Selected SwissTopo basemap key.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The map figure.
+    """
+    fig = _scatter_map(
         station_summary,
         lat="y",
         lon="x",
@@ -102,14 +163,10 @@ def sdtn_map(
         hover_data=['logger', 'exceed_count', 'reference_count'],
         color='exceed_count',  # Assigns the column to the color scale
         zoom=13,
-        height=500,
+        marker_size=25,
     )
-    fig.update_traces(marker={'size': 25})
-
-    final_fig = update_with_swisstopo(fig, maptype)
 
-    st.plotly_chart(final_fig)
-    return station_summary
+    return update_with_swisstopo(fig, maptype)
 
 
 def plot_uhi_ci_map(
@@ -117,7 +174,7 @@ def plot_uhi_ci_map(
     value_column: str,
     hour: int,
     maptype: str,
-) -> None:
+) -> dict:
     """
     Render a PyDeck map for UHI or City Index data at a specific hour.
 
@@ -129,16 +186,65 @@ def plot_uhi_ci_map(
     hour : int
         Hour for filtering data.
     maptype : str
-        Selected SwissTopo basemap.
+        Selected SwissTopo basemap key.
 
     Returns:
-    None
-        Displays the map in Streamlit.
+    dict
+        Selection event of the map; clicking a station selects its point.
+    """
+    return show_uhi_ci_map(build_uhi_ci_map(station_data, value_column, hour, maptype))
+
+
+def build_uhi_ci_map(
+    station_data: pd.DataFrame,
+    value_column: str,
+    hour: int,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the UHI / City Index map shown by plot_uhi_ci_map.
+    """
+    hour_data = station_data[station_data["hour"] == hour]
+    return uhi_ci_map_figure(hour_data, value_column, maptype)
+
+
+def show_uhi_ci_map(fig: "plotly.graph_objects.Figure") -> dict:
+    """
+    Display the UHI / City Index map with station selection.
+
+    Returns:
+    dict
+        Selection event of the map; clicking a station selects its point.
+    """
+    return st.plotly_chart(fig, on_select="rerun", selection_mode="points", key="uhi_map")
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py', 'modules/structure.py'))
+def uhi_ci_map_figure(
+    hour_data: pd.DataFrame,
+    value_column: str,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the (language-independent) UHI / City Index map figure for one hour.
+
+    Parameters:
+    hour_data : pd.DataFrame
+        Station data of a single hour.
+    value_column : str
+        Data column for visualization (e.g., 'uhi', 'city_index').
+    maptype : str
+        Selected SwissTopo basemap key.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The map figure.
     """
-    hour_data = station_data[station_data["hour"] == hour].copy()
+    hour_data = hour_data.copy()
     hour_data[value_column] = np.round(hour_data[value_column], 2)
 
-    fig = px.scatter_map(
+    fig = _scatter_map(
         hour_data,
         lat="y",
         lon="x",
@@ -146,16 +252,77 @@ def plot_uhi_ci_map(
         hover_data=['city_index', 'uhi'],
         color=value_column,
         zoom=12,
+        marker_size=25,
+    )
+
+    return update_with_swisstopo(fig, maptype)
+
+def build_cluster_map(
+    assignments: pd.DataFrame,
+    maptype: str,
+    langdict: dict,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized map of the loggers colored by the cluster of their diurnal profile.
+    """
+    fig = cluster_map_figure(assignments, maptype)
+    relabel_figure(fig, {'cluster': langdict['cluster_label'], 'share': langdict['cluster_share']})
+    return fig.update_layout(legend_title_text=langdict['cluster_label'])
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py', 'modules/structure.py'))
+def cluster_map_figure(
+    assignments: pd.DataFrame,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the (language-independent) map of the profile clusters.
+
+    Dense networks are drawn as hexagons colored by the most frequent cluster of their
+    loggers, with its share of the loggers on hover.
+
+    Parameters:
+    assignments : pd.DataFrame
+        One row per logger with 'logger', 'Name', 'lon', 'lat' and 'cluster' (see
+        api.profile_clusters).
+    maptype : str
+        Selected SwissTopo basemap key.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The map figure, one trace per cluster.
+    """
+    clusters = sorted(assignments['cluster'].unique())
+    data, hover_name, hover_data, marker_size = assignments, 'Name', ['logger'], 25
+    members = {f'cluster_{c}': (assignments['cluster'] == c).to_numpy(dtype=float) for c in clusters}
+    hexes = lod_frame(assignments.assign(**members), 'lon', 'lat', list(members), 12)
+    if hexes is not None:
+        shares = hexes[list(members)].to_numpy()
+        data = hexes.assign(
+            cluster=np.asarray(clusters)[shares.argmax(axis=1)],
+            share=np.round(shares.max(axis=1), 2),
+        )
+        hover_name, hover_data, marker_size = None, ['share', 'n_stations'], HEX_PIXELS
+    fig = px.scatter_map(
+        data.assign(cluster=data['cluster'].astype(str)),
+        lat='lat',
+        lon='lon',
+        hover_name=hover_name,
+        hover_data=hover_data,
+        color='cluster',
+        category_orders={'cluster': [str(c) for c in clusters]},
+        color_discrete_sequence=CLUSTER_COLORS,
+        zoom=12,
         height=500,
     )
-    fig.update_traces(marker={'size': 25})
+    fig.update_traces(marker={'size': marker_size})
+    return update_with_swisstopo(fig, maptype)
 
-    final_fig = update_with_swisstopo(fig, maptype)
-    st.plotly_chart(final_fig)
 
 def plot_geodata(
     df: pd.DataFrame,
-    selection: str,
+    selection: int,
     maptype: str,
     langdict: dict,
 ) -> None:
@@ -165,10 +332,10 @@ def plot_geodata(
     Parameters:
     df : pd.DataFrame
         DataFrame with geospatial data.
-    selection : str
-        Column for color scaling.
+    selection : int
+        Land-use class code used for color scaling (a key of 'description_dict').
     maptype : str
-        Selected SwissTopo basemap.
+        Selected SwissTopo basemap key.
     langdict : dict
         Language dictionary for localization.
 
@@ -176,27 +343,116 @@ def plot_geodata(
     None
         Displays the map in Streamlit.
     """
-    rename_map = {str(k): v for k, v in langdict['description_dict'].items()}
-    newdf = df.rename(columns=rename_map).copy()
+    st.plotly_chart(build_geodata_map(df, selection, maptype, langdict))
+
+
+def build_geodata_map(
+    df: pd.DataFrame,
+    selection: int,
+    maptype: str,
+    langdict: dict,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized land-use map shown by plot_geodata.
+    """
+    columns = ['logger', 'lat', 'lon'] + [str(k) for k in langdict['description_dict']]
+    fig = geodata_map_figure(df[columns], str(selection), maptype)
+    labels = {str(k): v for k, v in langdict['description_dict'].items()}
+    return relabel_figure(fig, labels)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py', 'modules/structure.py'))
+def geodata_map_figure(
+    df: pd.DataFrame,
+    selection: str,
+    maptype: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the land-use map figure with the land-use class codes as labels.
 
+    Parameters:
+    df : pd.DataFrame
+        Land-use data of one buffer, with the class codes as column names.
+    selection : str
+        Class code column for color scaling.
+    maptype : str
+        Selected SwissTopo basemap key.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The map figure; localize it with relabel_figure.
+    """
+    newdf = df.copy()
     if 'logger' in newdf.columns:
         newdf['name'] = newdf['logger'].apply(lambda x: sensor_labels.get(x, f"Logger {x}"))
     else:
         newdf['name'] = "Unknown"
     newdf['name_num'] = newdf['name'] + '_' + newdf['logger'].astype(str)
-    fig = px.scatter_map(
+    fig = _scatter_map(
         newdf,
         lat="lat",
         lon="lon",
         hover_name="name_num",
-        hover_data=langdict['description_dict'].values(),
+        hover_data=[col for col in df.columns if col not in ('logger', 'lat', 'lon')],
         color=selection,  # Assigns the column to the color scale
         zoom=12,
+        marker_size=50,
+    )
+    return update_with_swisstopo(fig, maptype)
+
+
+def _scatter_map(
+    data: pd.DataFrame,
+    lat: str,
+    lon: str,
+    hover_name: str,
+    hover_data: list,
+    color: str,
+    zoom: int,
+    marker_size: int,
+) -> "plotly.graph_objects.Figure":
+    """
+    Draw one marker per station, or hexagonal bins for dense networks.
+
+    Parameters:
+    data : pd.DataFrame
+        One row per station.
+    lat, lon : str
+        Coordinate columns.
+    hover_name : str
+        Column shown as hover title (per-station markers only).
+    hover_data : list
+        Columns shown on hover.
+    color : str
+        Column for the color scale.
+    zoom : int
+        Initial zoom of the map, which also selects the hexagon size.
+    marker_size : int
+        Marker size of a single station.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The map figure without basemap.
+    """
+    value_columns = list(dict.fromkeys(c for c in hover_data + [color] if c != 'logger'))
+    hexes = lod_frame(data, lon, lat, value_columns, zoom)
+    if hexes is not None:
+        hexes[value_columns] = hexes[value_columns].round(2)
+        data, hover_name, hover_data, marker_size = hexes, None, value_columns + ['n_stations'], HEX_PIXELS
+
+    fig = px.scatter_map(
+        data,
+        lat=lat,
+        lon=lon,
+        hover_name=hover_name,
+        hover_data=hover_data,
+        color=color,
+        zoom=zoom,
         height=500,
     )
-    fig.update_traces(marker={'size': 50})
-    final_fig = update_with_swisstopo(fig, maptype)
-    st.plotly_chart(final_fig)
+    fig.update_traces(marker={'size': marker_size})
+    return fig
 
 
 def update_with_swisstopo(fig, maptype: str) -> "plotly.graph_objects.Figure":
@@ -207,21 +463,13 @@ def update_with_swisstopo(fig, maptype: str) -> "plotly.graph_objects.Figure":
     fig : plotly.graph_objects.Figure
         The base Plotly figure.
     maptype : str
-        Selected SwissTopo basemap.
+        Selected SwissTopo basemap key (see BASEMAPS in modules.structure).
 
     Returns:
     plotly.graph_objects.Figure
         Updated figure with SwissTopo basemap applied.
     """
-    if maptype in ['Carte nationale suisse en couleur', 'Schweizer Landeskarte Farbe', 'Swiss National Map Color']:
-        mapstring = 'https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.pixelkarte-farbe/default/current/3857/{z}/{x}/{y}.jpeg'
-    elif maptype == 'SwissAlti3D':
-        mapstring = 'https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.swissalti3d-reliefschattierung/default/current/3857/{z}/{x}/{y}.png'
-    elif maptype in ['Bodenbedeckung', 'Landcover', 'Couverture du sol']:
-        mapstring = "https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.vec200-landcover/default/current/3857/{z}/{x}/{y}.png"
-
-    else:
-        mapstring = 'https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.pixelkarte-grau/default/current/3857/{z}/{x}/{y}.jpeg'
+    mapstring = BASEMAP_SOURCES.get(maptype, BASEMAP_SOURCES['grey'])
 
     newfig = fig.update_layout(
         map_style="white-bg",
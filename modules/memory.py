@@ -0,0 +1,363 @@
+"""
+Module: memory
+================
+
+Memory accounting of a server process: what the loaded datasets, the caches and the
+sessions hold, and where a rerun allocates.
+
+- Datasets: deep size of every parsed file in the query API caches (modules.api).
+- Caches: deep size of the entries of every memoized API function, the st.cache_data and
+  st.cache_resource caches (Streamlit's own stats), and the artifact store on disk.
+- Sessions: deep size of each session's st.session_state, recorded by its latest rerun.
+  Walking the session state costs time on every rerun, so sessions (and reruns, below)
+  are only accounted in the admin view (HBS_ADMIN=1) or with a session budget.
+- Reruns: with HBS_TRACEMALLOC=1, tracemalloc snapshots are taken around every rerun and
+  the allocation sites that grew most are kept per session. Tracing is process-wide, so
+  traced reruns hold a process-wide lock and run one at a time (a diagnostic mode); the
+  sites still include what background threads (e.g. the prefetch) allocate meanwhile.
+- Budget: if a session holds more than HBS_SESSION_BUDGET_MB, a warning is logged and
+  shown in the admin view.
+
+The numbers are shown in the admin view of the app (HBS_ADMIN=1) and are added to the
+metrics endpoint of the Streamlit server (/_stcore/metrics) as cache_memory_bytes with
+the cache types hbs_dataset, hbs_api, hbs_session and hbs_process.
+
+Memory-mapped arrays (the day cube, local rasters) are file-backed and counted with 0
+bytes; the OS pages them in and out on demand.
+
+Classes:
+- MemoryStatsProvider
+
+Functions:
+- deep_size
+- dataset_sizes
+- cache_sizes
+- track_rerun
+- current_session
+- over_budget
+- session_sizes
+- rerun_sites
+- process_rss
+- register_metrics
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+ADMIN = os.environ.get('HBS_ADMIN', '0') == '1'
+TRACEMALLOC = os.environ.get('HBS_TRACEMALLOC', '0') == '1'
+SESSION_BUDGET_MB = float(os.environ.get('HBS_SESSION_BUDGET_MB', 0))
+TOP_SITES = 10
+# Sessions not seen for this long are dropped from the accounting
+SESSION_TTL_S = 3600
+
+# session id -> {'state_bytes', 'rerun_bytes', 'sites', 'seen'}
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+# Serializes the traced reruns, whose snapshots would otherwise include other sessions
+_trace_lock = threading.Lock()
+
+
+def deep_size(obj, _seen: set = None) -> int:
+    """
+    Approximate deep size of an object in bytes.
+
+    DataFrames and Series count their values including Python objects (e.g. the lists of
+    'geometry_coords'), in-memory arrays their buffer and memory-mapped arrays nothing;
+    containers are summed element-wise and other objects measured with asizeof.
+
+    Parameters:
+    obj :
+        Object to measure.
+
+    Returns:
+    int
+        Size in bytes (shared objects are counted once).
+    """
+    if isinstance(obj, (int, float, str, bytes, bool, type(None), np.generic)):
+        return sys.getsizeof(obj)
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return _frame_size(obj if isinstance(obj, pd.DataFrame) else obj.to_frame(), seen)
+    if isinstance(obj, np.memmap):
+        return 0
+    if isinstance(obj, np.ndarray):
+        # Views count their base array once (nothing if it is a memory map)
+        if obj.base is None:
+            return obj.nbytes
+        return deep_size(obj.base, seen) if isinstance(obj.base, np.ndarray) else 0
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(deep_size(item, seen) for item in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    from streamlit.vendor.pympler.asizeof import asizeof
+    try:
+        return asizeof(obj)
+    except Exception:
+        return sys.getsizeof(obj)
+
+
+def _frame_size(frame: pd.DataFrame, seen: set) -> int:
+    size = int(frame.index.memory_usage(deep=True))
+    for _, column in frame.items():
+        if column.dtype != object:
+            size += int(column.memory_usage(deep=False, index=False))
+            continue
+        sample = column.dropna()
+        if len(sample) and isinstance(sample.iloc[0], (list, tuple, dict, set)):
+            # pandas counts containers (e.g. 'geometry_coords') shallowly
+            size += 8 * len(column) + sum(deep_size(value, seen) for value in column)
+        else:
+            size += int(column.memory_usage(deep=True, index=False))
+    return size
+
+
+def dataset_sizes() -> pd.DataFrame:
+    """
+    Deep size of every parsed data file held by the query API.
+
+    Returns:
+    pd.DataFrame
+        'dataset' (file name), 'loader' (read_table / read_geodata), 'rows' and 'bytes',
+        largest first.
+    """
+    from . import api
+
+    rows = []
+    for func in (api.read_table, api.read_geodata):
+        for key, value in func.cache_entries():
+            rows.append({
+                'dataset': f'{key[0].parent.name}/{key[0].name}' if hasattr(key[0], 'parent') else str(key[0]),
+                'loader': func.__name__,
+                'rows': len(value),
+                'bytes': deep_size(value),
+            })
+    return pd.DataFrame(rows, columns=['dataset', 'loader', 'rows', 'bytes']).sort_values('bytes', ascending=False)
+
+
+def cache_sizes() -> pd.DataFrame:
+    """
+    Entry count and deep size of every cache of the process.
+
+    Returns:
+    pd.DataFrame
+        'cache_type' (hbs_api, st_cache_data, st_cache_resource, hbs_artifacts on
+        disk), 'cache', 'entries' and 'bytes', largest first.
+    """
+    from . import api, artifacts
+
+    rows = []
+    for func in api.memoized():
+        entries = func.cache_entries()
+        seen = set()
+        rows.append({
+            'cache_type': 'hbs_api',
+            'cache': func.__name__,
+            'entries': len(entries),
+            'bytes': sum(deep_size(value, seen) for _, value in entries),
+        })
+    try:
+        from streamlit.runtime.caching import get_data_cache_stats_provider, get_resource_cache_stats_provider
+        for provider in (get_data_cache_stats_provider(), get_resource_cache_stats_provider()):
+            grouped = {}
+            for stat in provider.get_stats():
+                entry = grouped.setdefault((stat.category_name, stat.cache_name), [0, 0])
+                entry[0] += 1
+                entry[1] += stat.byte_length
+            for (category, name), (count, size) in grouped.items():
+                rows.append({'cache_type': category, 'cache': name.rsplit('.', 1)[-1],
+                             'entries': count, 'bytes': size})
+    except ImportError:
+        pass
+    store = artifacts.store.stats()
+    rows.append({'cache_type': 'hbs_artifacts', 'cache': 'disk', 'entries': store['entries'],
+                 'bytes': store['bytes']})
+    return pd.DataFrame(rows, columns=['cache_type', 'cache', 'entries', 'bytes']).sort_values('bytes', ascending=False)
+
+
+def _top_sites(before, after) -> list:
+    stats = after.compare_to(before, 'lineno')
+    sites = []
+    for stat in stats[:TOP_SITES]:
+        frame = stat.traceback[0]
+        # The file and its directory are enough to locate a site
+        site = os.path.join(*os.path.normpath(frame.filename).split(os.sep)[-2:])
+        sites.append({'site': f'{site}:{frame.lineno}', 'bytes': stat.size_diff, 'blocks': stat.count_diff})
+    return sites
+
+
+@contextmanager
+def track_rerun():
+    """
+    Context manager accounting for one rerun of the current session.
+
+    Records the deep size of the session state after the rerun, and with HBS_TRACEMALLOC=1
+    the net allocation of the rerun and its top allocation sites; traced reruns of all
+    sessions run one at a time, so that the snapshots only differ by this rerun. Logs a
+    warning if the session exceeds HBS_SESSION_BUDGET_MB. Does nothing unless HBS_ADMIN=1
+    or a session budget is set.
+    """
+    if not (ADMIN or SESSION_BUDGET_MB):
+        yield
+        return
+    session_id = current_session()
+    if TRACEMALLOC:
+        _trace_lock.acquire()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+    before = tracemalloc.take_snapshot() if TRACEMALLOC else None
+    try:
+        yield
+    finally:
+        after = tracemalloc.take_snapshot() if before is not None else None
+        if TRACEMALLOC:
+            _trace_lock.release()
+        state = st.session_state
+        record = {'state_bytes': deep_size({key: state[key] for key in list(state.keys())}),
+                  'rerun_bytes': None, 'sites': [], 'seen': time.time()}
+        if before is not None:
+            after = after.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            before = before.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            record['sites'] = _top_sites(before, after)
+            record['rerun_bytes'] = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        with _sessions_lock:
+            _sessions[session_id] = record
+            _sessions.move_to_end(session_id)
+            while _sessions and next(iter(_sessions.values()))['seen'] < time.time() - SESSION_TTL_S:
+                _sessions.popitem(last=False)
+        if over_budget(session_id):
+            logger.warning(
+                "session %s holds %.1f MB of session state (budget %g MB)",
+                session_id, record['state_bytes'] / 2 ** 20, SESSION_BUDGET_MB,
+            )
+
+
+def current_session() -> str:
+    """
+    Id of the session whose script is running on this thread ('bare' outside of a session).
+    """
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'bare'
+
+
+def over_budget(session_id: str) -> bool:
+    """
+    Whether a session's state exceeds HBS_SESSION_BUDGET_MB (never if no budget is set).
+    """
+    with _sessions_lock:
+        record = _sessions.get(session_id)
+    return bool(SESSION_BUDGET_MB and record and record['state_bytes'] > SESSION_BUDGET_MB * 2 ** 20)
+
+
+def session_sizes() -> pd.DataFrame:
+    """
+    Per session the deep size of its state and the net allocation of its latest rerun.
+
+    Returns:
+    pd.DataFrame
+        'session', 'state_bytes', 'rerun_bytes' (None without HBS_TRACEMALLOC=1),
+        'over_budget' and 'age_s' (since the latest rerun).
+    """
+    now = time.time()
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+    rows = [{
+        'session': session_id,
+        'state_bytes': record['state_bytes'],
+        'rerun_bytes': record['rerun_bytes'],
+        'over_budget': bool(SESSION_BUDGET_MB and record['state_bytes'] > SESSION_BUDGET_MB * 2 ** 20),
+        'age_s': round(now - record['seen'], 1),
+    } for session_id, record in sessions]
+    return pd.DataFrame(rows, columns=['session', 'state_bytes', 'rerun_bytes', 'over_budget', 'age_s'])
+
+
+def rerun_sites(session_id: str) -> pd.DataFrame:
+    """
+    Top allocation sites of a session's latest rerun (HBS_TRACEMALLOC=1).
+
+    Returns:
+    pd.DataFrame
+        'site' (file:line), 'bytes' and 'blocks' of net allocation, largest first.
+    """
+    with _sessions_lock:
+        record = _sessions.get(session_id)
+    return pd.DataFrame(record['sites'] if record else [], columns=['site', 'bytes', 'blocks'])
+
+
+def process_rss() -> int:
+    """
+    Resident set size of the process in bytes (0 where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class MemoryStatsProvider:
+    """
+    Stats provider adding the accounting of this module to /_stcore/metrics.
+
+    Parameters:
+    ttl : float
+        Seconds a computed set of stats is reused (scrapers may poll often).
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        self.ttl = ttl
+        self._stats = (0.0, [])
+        self._lock = threading.Lock()
+
+    def get_stats(self) -> list:
+        with self._lock:
+            computed, stats = self._stats
+            if time.monotonic() - computed > self.ttl:
+                stats = self._compute()
+                self._stats = (time.monotonic(), stats)
+        return stats
+
+    def _compute(self) -> list:
+        from streamlit.runtime.stats import CacheStat
+
+        stats = [CacheStat('hbs_process', 'rss', process_rss())]
+        stats += [CacheStat('hbs_dataset', row.dataset, int(row.bytes)) for row in dataset_sizes().itertuples()]
+        stats += [
+            CacheStat('hbs_api', row.cache, int(row.bytes))
+            for row in cache_sizes().itertuples() if row.cache_type == 'hbs_api'
+        ]
+        stats += [CacheStat('hbs_session', row.session, int(row.state_bytes)) for row in session_sizes().itertuples()]
+        return stats
+
+
+@st.cache_resource(show_spinner=False)
+def register_metrics() -> bool:
+    """
+    Add MemoryStatsProvider to the stats of the running Streamlit server, once per process.
+
+    Returns:
+    bool
+        Whether a server runtime was found.
+    """
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return False
+    Runtime.instance().stats_mgr.register_provider(MemoryStatsProvider())
+    return True
@@ -0,0 +1,218 @@
+"""
+Module: meteo
+================
+
+This module conditions the UHI / City Index on the weather, e.g. "calm, clear nights".
+It reads an optional local meteorological series of the campaign (e.g. exported from the
+nearest SwissMetNet station) as a CSV with the columns
+
+- time: timestamp (any resolution; values are averaged per hour)
+- wind_speed: m/s
+- global_radiation: W/m²
+- cloud_cover: octas (0-8)
+
+The series is aligned to the (day, hour) axis of the campaign cube (see modules.cube), and
+a boolean mask is precomputed for every condition in CONDITIONS. A condition set is the
+AND of its masks, and the conditioned values are masked means over the cube, cached per
+condition set.
+
+Classes:
+- MeteoSeries
+
+Functions:
+- load_meteo
+- conditioned_uhi_ci
+- uhi_by_hour
+"""
+
+import operator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from . import api
+from .cube import HOURS, open_cube
+from .structure import episode_days, get_cube_dir, get_files, get_meteo_path, load_csv
+
+METEO_COLUMNS = ['wind_speed', 'global_radiation', 'cloud_cover']
+
+# Condition key -> (meteo column, comparison, threshold); the labels are in langdict['conditions']
+CONDITIONS = {
+    'calm': ('wind_speed', operator.lt, 2.0),
+    'windy': ('wind_speed', operator.ge, 4.0),
+    'clear': ('cloud_cover', operator.le, 2),
+    'overcast': ('cloud_cover', operator.ge, 6),
+    'night': ('global_radiation', operator.lt, 5.0),
+    'sunny': ('global_radiation', operator.ge, 400.0),
+}
+
+
+class MeteoSeries:
+    """
+    Hourly meteorological values on the (day, hour) axis of a campaign cube.
+
+    Parameters:
+    meteo : pd.DataFrame
+        Raw series with 'time' and the METEO_COLUMNS.
+    days : np.ndarray
+        datetime64[D] day axis of the cube.
+    """
+
+    def __init__(self, meteo: pd.DataFrame, days: np.ndarray):
+        self.days = days
+        time = pd.to_datetime(meteo['time'])
+        day = time.dt.floor('D').values.astype('datetime64[D]')
+        inside = (day >= days[0]) & (day <= days[-1])
+        day_idx = (day[inside] - days[0]).astype(int)
+        hour_idx = time.dt.hour.values[inside]
+
+        self.values = {}
+        for column in METEO_COLUMNS:
+            if column not in meteo:
+                continue
+            values = meteo[column].to_numpy(dtype=float)[inside]
+            valid = ~np.isnan(values)
+            # Hourly means on the cube grid via scatter-add of sums and counts
+            sums = np.zeros((len(days), HOURS))
+            counts = np.zeros((len(days), HOURS))
+            np.add.at(sums, (day_idx[valid], hour_idx[valid]), values[valid])
+            np.add.at(counts, (day_idx[valid], hour_idx[valid]), 1)
+            with np.errstate(invalid='ignore'):
+                self.values[column] = sums / counts
+
+        # Comparisons with missing (NaN) values are False, so gaps never satisfy a condition
+        self.masks = {
+            key: compare(self.values[column], threshold)
+            if column in self.values else np.zeros((len(days), HOURS), dtype=bool)
+            for key, (column, compare, threshold) in CONDITIONS.items()
+        }
+        self._combined = {}
+
+    def mask(self, conditions: tuple) -> np.ndarray:
+        """
+        Boolean (day, hour) mask of the hours satisfying every condition.
+
+        Parameters:
+        conditions : tuple
+            Keys of CONDITIONS (empty: every hour).
+
+        Returns:
+        np.ndarray
+            The combined mask (memoized per condition set).
+        """
+        key = frozenset(conditions)
+        if key not in self._combined:
+            combined = np.ones((len(self.days), HOURS), dtype=bool)
+            for condition in key:
+                combined &= self.masks[condition]
+            self._combined[key] = combined
+        return self._combined[key]
+
+
+@st.cache_resource(show_spinner=False)
+def load_meteo(meteo_path: Path, cube_dir: Path) -> MeteoSeries:
+    """
+    Load the meteorological series of a campaign once per process.
+
+    Parameters:
+    meteo_path : Path
+        CSV path (see structure.get_meteo_path).
+    cube_dir : Path
+        Directory of the campaign cube whose day axis the series is aligned to.
+
+    Returns:
+    MeteoSeries or None
+        None if the series or the cube is not available.
+    """
+    cube = open_cube(cube_dir)
+    if cube is None or not Path(meteo_path).exists():
+        return None
+    return MeteoSeries(pd.read_csv(meteo_path), cube.days)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def conditioned_uhi_ci(
+    uhi_path: Path,
+    tempstats_path: Path,
+    cube_dir: Path,
+    meteo_path: Path,
+    conditions: tuple,
+    reference: int = None,
+    days: tuple = None,
+) -> pd.DataFrame:
+    """
+    Hourly UHI / City Index averaged over the hours of the period that satisfy the conditions.
+
+    Parameters:
+    uhi_path : Path
+        Hourly UHI / City Index file of the period; provides the rows, names and coordinates.
+    tempstats_path : Path
+        Daily temperature statistics of the period; its dates define the selected period.
+    cube_dir : Path
+        Directory of the campaign cube.
+    meteo_path : Path
+        Meteorological series of the campaign.
+    conditions : tuple
+        Sorted keys of CONDITIONS.
+    reference : int, optional
+        Reference logger of the UHI.
+    days : tuple, optional
+        (first, last) ISO date restricting the dates of tempstats_path (a detected heat
+        episode, see paths.episode_days).
+
+    Returns:
+    pd.DataFrame
+        The hourly file with 'uhi' and 'city_index' replaced by the conditioned means and
+        an added 'n_hours' column (number of matching hours per row).
+    """
+    cube = open_cube(cube_dir)
+    meteo = load_meteo(meteo_path, cube_dir)
+    data = load_csv(uhi_path)
+
+    dates = load_csv(tempstats_path)['time'].unique()
+    if days is not None:
+        # ISO dates order like strings
+        dates = dates[(dates >= days[0]) & (dates <= days[1])]
+    mask = meteo.mask(conditions) & cube.day_mask(dates)[:, None]
+    hours = data['hour'].to_numpy()
+    loggers = data['logger'].to_numpy()
+    cols = np.minimum(np.searchsorted(cube.loggers, loggers), len(cube.loggers) - 1)
+    known = cube.loggers[cols] == loggers
+
+    for variable in ('uhi', 'city_index'):
+        _, means, counts = cube.masked_mean(variable, mask, reference=reference)
+        data[variable] = np.where(known, means[hours, cols], np.nan)
+    data['n_hours'] = np.where(known, counts[hours, cols], 0)
+    return data
+
+
+def uhi_by_hour(city: str, period: str, hour: int, reference: int = None, conditions: tuple = ()) -> pd.DataFrame:
+    """
+    UHI / City Index of every logger at one hour, restricted to the weather conditions if any.
+
+    Parameters:
+    city : str
+        'biel' or 'bern'.
+    period : str
+        'summer', 'heatwave' or the key of a detected heat episode.
+    hour : int
+        Hour of the day (0-23).
+    reference : int, optional
+        Reference logger of the UHI.
+    conditions : tuple
+        Sorted keys of CONDITIONS (empty: all hours, see api.uhi_by_hour).
+
+    Returns:
+    pd.DataFrame
+        The rows of that hour (with 'n_hours' if conditioned).
+    """
+    if not conditions:
+        return api.uhi_by_hour(city, period, hour, reference)
+    _, _, uhi_path, tempstats_path, _ = get_files(city, period)
+    data = conditioned_uhi_ci(
+        uhi_path, tempstats_path, get_cube_dir(city), get_meteo_path(city), conditions, reference,
+        episode_days(period),
+    )
+    return data[data['hour'] == hour]
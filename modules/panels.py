@@ -0,0 +1,189 @@
+"""
+Module: panels
+================
+
+Concurrent construction of the independent figures of a tab. A tab declares its panels
+(e.g. the map and the histogram of the same slice) with the container each one is shown
+in; the figures are built in a worker pool shared by all sessions and every panel is
+emitted into its container on the script thread as soon as its figure is ready. When all
+PANEL_WORKERS are busy (other sessions rendering), the remaining panels are built inline
+on the script thread instead of waiting for a free worker, so a rerun is never slower than
+building its panels one after the other. A worker carries the script run context of the
+session only for the duration of one build. The tab then takes about as
+long as its slowest panel instead of the sum of all of them, as far as the builds release
+the GIL (pandas / NumPy work does, pure-Python Plotly validation does not).
+
+Every render is recorded with the start and end of each panel relative to the start of
+the render, so the startup profile can show how much the panels overlapped.
+
+A tab that passes the key of its selection shares its figures across sessions: concurrent
+builds of the same panel and key wait for one build (see modules.singleflight). The built
+figures are only read afterwards (st.plotly_chart serializes a copy).
+
+Classes:
+- Panel
+
+Functions:
+- render_panels
+- panel_report
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, NamedTuple
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:  # streamlit < 1.38
+    from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from . import singleflight
+
+PANEL_WORKERS = 4
+# Renders kept for panel_report
+REPORT_ENTRIES = 64
+
+_pool = ThreadPoolExecutor(max_workers=PANEL_WORKERS, thread_name_prefix='hbs-panel')
+# Builds running in the pool, so that saturated renders build inline
+_busy = 0
+_busy_lock = threading.Lock()
+_renders = deque(maxlen=REPORT_ENTRIES)
+_renders_lock = threading.Lock()
+_flight = singleflight.group('panels')
+
+
+class Panel(NamedTuple):
+    """
+    One independent figure of a tab.
+
+    Attributes:
+    name : str
+        Name shown in the panel report.
+    container :
+        Streamlit container (e.g. a column) the panel is shown in.
+    build : callable
+        Returns the figure; runs in a worker thread and must not emit elements.
+    emit : callable
+        Shows the figure (default st.plotly_chart); runs on the script thread.
+    """
+    name: str
+    container: object
+    build: Callable
+    emit: Callable = st.plotly_chart
+
+
+def _timed_build(panel: Panel, t0: float, key: tuple = None) -> tuple:
+    start = time.perf_counter()
+    figure = panel.build() if key is None else _flight.do(key, panel.build)[0]
+    return figure, start - t0, time.perf_counter() - t0, threading.current_thread().name
+
+
+def _pooled_build(panel: Panel, ctx, t0: float, key: tuple = None) -> tuple:
+    global _busy
+    thread = threading.current_thread()
+    if ctx is not None:
+        # Cached functions called by the build belong to the session's script run
+        add_script_run_ctx(thread, ctx)
+    try:
+        return _timed_build(panel, t0, key)
+    finally:
+        # The worker serves other sessions next; it must not keep this one's context
+        vars(thread).pop(SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+        with _busy_lock:
+            _busy -= 1
+
+
+def _reserve_worker() -> bool:
+    global _busy
+    with _busy_lock:
+        if _busy >= PANEL_WORKERS:
+            return False
+        _busy += 1
+        return True
+
+
+def render_panels(tab: str, panels: list, key: tuple = None) -> list:
+    """
+    Build the figures of a tab concurrently and emit each one as soon as it is ready.
+
+    Panels for which no worker is free are built on the calling thread while the
+    others run in the pool.
+
+    Parameters:
+    tab : str
+        Tab name for the panel report.
+    panels : list
+        Panel tuples.
+    key : tuple, optional
+        Hashable values of everything the builds depend on (language and widgets); the
+        builds of sessions with the same key are coalesced. None: always built.
+
+    Returns:
+    list
+        Return values of the emit calls (e.g. map selection events), in panel order.
+    """
+    t0 = time.perf_counter()
+    ctx = get_script_run_ctx()
+    futures = {}
+    inline = []
+    for i, panel in enumerate(panels):
+        panel_key = None if key is None else (tab, panel.name) + tuple(key)
+        if _reserve_worker():
+            futures[_pool.submit(_pooled_build, panel, ctx, t0, panel_key)] = i
+        else:
+            inline.append((i, panel, panel_key))
+    for i, panel, panel_key in inline:
+        future = Future()
+        try:
+            future.set_result(_timed_build(panel, t0, panel_key))
+        except Exception as error:
+            future.set_exception(error)
+        futures[future] = i
+    results = [None] * len(panels)
+    rows = []
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        # Emit in completion order; panel order breaks ties so reruns are stable
+        for future in sorted(done, key=futures.get):
+            i = futures[future]
+            figure, start, end, thread = future.result()
+            with panels[i].container:
+                results[i] = panels[i].emit(figure)
+            rows.append({'tab': tab, 'panel': panels[i].name, 'start': start, 'end': end, 'thread': thread})
+    wall = time.perf_counter() - t0
+    with _renders_lock:
+        _renders.append((tab, wall, rows))
+    return results
+
+
+def panel_report() -> list:
+    """
+    Return the recorded panel renders, most recent last.
+
+    Returns:
+    list
+        Per render one dict with 'tab', 'wall' (s, build to last emit), 'sum' (s, sum
+        of the panel builds), 'overlap' (sum - wall, the time saved by building
+        concurrently) and 'panels' ('name start-end' in ms).
+    """
+    with _renders_lock:
+        renders = list(_renders)
+    report = []
+    for tab, wall, rows in renders:
+        total = sum(row['end'] - row['start'] for row in rows)
+        report.append({
+            'tab': tab,
+            'wall': round(wall, 4),
+            'sum': round(total, 4),
+            'overlap': round(total - wall, 4),
+            'panels': ', '.join(
+                f"{row['panel']} {1000 * row['start']:.0f}-{1000 * row['end']:.0f}" for row in rows
+            ),
+        })
+    return report
@@ -0,0 +1,180 @@
+"""
+Module: paths
+================
+
+This module locates the data files of each city and period. It has no Streamlit or
+pandas dependency, so it can be used by the headless query API (modules.api) and by
+batch scripts as well as by the app.
+
+Functions:
+- episode_period
+- episode_days
+- get_files
+- get_cube_dir
+- get_raw_dir
+- get_meteo_path
+- get_raster_path
+"""
+
+
+from pathlib import Path
+
+# Language-independent option keys; their order matches the localized labels in
+# langdict['period_choice'] and langdict['map_choice'] respectively.
+PERIODS = ['summer', 'heatwave']
+BASEMAPS = ['color', 'grey', 'relief', 'landcover']
+
+# Measurement campaign and rural reference logger of each city (see content/uhi_*.md)
+CAMPAIGNS = {'biel': 'summer23', 'bern': 'summer22'}
+REFERENCE_LOGGERS = {'biel': 206, 'bern': 98}
+
+
+def episode_period(first: str, last: str) -> str:
+    """
+    Period key of a detected heat episode (see modules.heatwaves), e.g. '2023-08-11_2023-08-24'.
+
+    Parameters:
+    first, last : str
+        First and last day of the episode (ISO dates).
+
+    Returns:
+    str
+        Period key; accepted wherever a key of PERIODS is.
+    """
+
+    return f'{first}_{last}'
+
+
+def episode_days(period: str) -> tuple | None:
+    """
+    First and last day of an episode period key.
+
+    Parameters:
+    period : str
+        Period key.
+
+    Returns:
+    tuple | None
+        (first, last) ISO dates, or None for the keys of PERIODS.
+    """
+
+    if period in PERIODS:
+        return None
+    first, _, last = period.partition('_')
+    return first, last
+
+
+def get_files(city: str, period: str) -> tuple:
+    """
+    Retrieve file paths for data files based on the selected city and period.
+
+    Parameters:
+    city : str
+        Name of the city ('bern' or 'biel').
+    period : str
+        Time period key ('summer' or 'heatwave', see PERIODS) or the key of a detected
+        heat episode (see episode_period), whose data are derived from the whole-summer
+        files.
+
+    Returns:
+    tuple
+        Paths for land use, Fitnah, UHI, temperature stats, and SD/TN files.
+    """
+
+    fitnah_path = Path.cwd() / 'data' / city / 'data_viz_fitnah.csv'
+    landuse_path = Path.cwd() / 'data' / city / 'data_viz_land_use.csv'
+
+    hw = period == 'heatwave'
+
+    if city == 'bern':
+        if hw:
+            uhi_path = Path.cwd() / 'data' / city / 'heatwave_22_hourly_uhi_ci.csv'
+            tempstats = Path.cwd() / 'data' / city / 'heatwave_22_temp_stats.csv'
+            sdtn = Path.cwd() / 'data' / city / 'heatwave_22_sdtn.csv'
+        else:
+            uhi_path = Path.cwd() / 'data' / city / 'summer22_hourly_uhi_ci.csv'
+            tempstats = Path.cwd() / 'data' / city / 'summer22_temp_stats.csv'
+            sdtn = Path.cwd() / 'data' / city / 'summer22_sdtn.csv'
+
+    if city == 'biel':
+        if hw:
+            uhi_path = Path.cwd() / 'data' / city / 'heatwave_23_hourly_uhi_ci.csv'
+            tempstats = Path.cwd() / 'data' / city / 'heatwave_23_temp_stats.csv'
+            sdtn = Path.cwd() / 'data' / city / 'heatwave_23_sdtn.csv'
+
+        else:
+            uhi_path = Path.cwd() / 'data' / city / 'summer23_hourly_uhi_ci.csv'
+            tempstats = Path.cwd() / 'data' / city / 'summer23_temp_stats.csv'
+            sdtn = Path.cwd() / 'data' / city / 'summer23_sdtn.csv'
+
+
+
+    return landuse_path, fitnah_path, uhi_path, tempstats, sdtn
+
+
+def get_cube_dir(city: str) -> Path:
+    """
+    Directory of the day x hour x logger cube of a city's campaign (see modules.cube).
+
+    Parameters:
+    city : str
+        Name of the city ('bern' or 'biel').
+
+    Returns:
+    Path
+        Cube directory; it only exists once the cube has been built from the raw data.
+    """
+
+    return Path.cwd() / 'data' / city / 'cube' / CAMPAIGNS[city]
+
+
+def get_raw_dir(city: str) -> Path:
+    """
+    Directory of the raw logger series store of a city's campaign (see modules.rawstore).
+
+    Parameters:
+    city : str
+        Name of the city ('bern' or 'biel').
+
+    Returns:
+    Path
+        Store directory; it only exists once the raw series have been converted.
+    """
+
+    return Path.cwd() / 'data' / city / 'raw' / CAMPAIGNS[city]
+
+
+def get_meteo_path(city: str) -> Path:
+    """
+    Path of the optional local meteorological series of a city's campaign (see modules.meteo).
+
+    Parameters:
+    city : str
+        Name of the city ('bern' or 'biel').
+
+    Returns:
+    Path
+        CSV path; the file is not part of the repository and may not exist.
+    """
+
+    return Path.cwd() / 'data' / city / 'meteo' / f'{CAMPAIGNS[city]}.csv'
+
+
+def get_raster_path(city: str, name: str) -> Path:
+    """
+    Path of an optional local raster of a city (see modules.zonal).
+
+    Parameters:
+    city : str
+        Name of the city ('bern' or 'biel').
+    name : str
+        Raster name: a FITNAH variable ('fitnah_ss', 'fitnah_sv', 'fitnah_temp', 'dem') or
+        'land_use'.
+
+    Returns:
+    Path
+        Path of the .npy array; its georeference is stored next to it as <name>.json.
+        Rasters are not part of the repository and may not exist.
+    """
+
+    return Path.cwd() / 'data' / city / 'raster' / f'{name}.npy'
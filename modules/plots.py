@@ -5,22 +5,34 @@ Module: plots
 This module provides visualization functions using Plotly for creating histograms,
 line plots, and other interactive plots for geospatial and temporal data.
 
+Figures are built once by cached, language-independent *_figure functions; the build_*
+functions apply the localized titles and axis labels and return the figure, and the
+display functions show it in Streamlit. Histograms of more than hexbin.LOD_THRESHOLD
+rows are binned with NumPy and drawn as bars, so the raw rows are not sent to the browser.
+The figures are also kept in the disk-backed artifact store (see modules.artifacts).
+
 Functions:
 - geodata_histogram
 - plot_uhi_ci_evolution
+- build_cluster_profiles
 - plot_uhi_ci_histogram
 - tn_sd_histogram
 - plot_fitnah_histogram
 """
 
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
+from . import hexbin
+from .artifacts import persist
+from .maps import CLUSTER_COLORS
+from .structure import relabel_figure
 
 def geodata_histogram(
     sel_geo_data: pd.DataFrame,
-    dtype: str,
+    dtype: int,
     buffer: int,
     langdict: dict,
     bins: int = 20,
@@ -31,8 +43,8 @@ def geodata_histogram(
     Parameters:
     sel_geo_data : pd.DataFrame
         Filtered DataFrame containing geospatial data.
-    dtype : str
-        Data type for the histogram (e.g., 'fitnah_ss', 'fitnah_sv').
+    dtype : int
+        Land-use class code (a key of 'description_dict').
     buffer : int
         The buffer distance in meters.
     langdict : dict
@@ -45,29 +57,92 @@ def geodata_histogram(
         Displays the histogram in Streamlit.
     """
 
-    refdict = {v:str(k) for k,v in langdict['description_dict'].items()}
-    fig = px.histogram(
-        sel_geo_data,
-        x=refdict[dtype],
-        nbins=bins,
-        title=f"Histogram of the count of {dtype} raster cells within a {buffer} meter buffer.",
-        height=550,
-        width=500
-    )
+    st.plotly_chart(build_geodata_histogram(sel_geo_data, dtype, buffer, langdict, bins))
+
+
+def build_geodata_histogram(
+    sel_geo_data: pd.DataFrame,
+    dtype: int,
+    buffer: int,
+    langdict: dict,
+    bins: int = 20,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized land-use histogram shown by geodata_histogram.
+    """
 
-    fig.update_layout(
-        xaxis_title=f"Number of {dtype} raster cells",
+    label = langdict['description_dict'][dtype]
+    fig = histogram_figure(sel_geo_data[[str(dtype)]], str(dtype), bins, 550, 500)
+    return relabel_figure(
+        fig,
+        {},
+        title=f"Histogram of the count of {label} raster cells within a {buffer} meter buffer.",
+        xaxis_title=f"Number of {label} raster cells",
         yaxis_title="Sensor Count",
-        template="plotly_white",
     )
 
-    st.plotly_chart(fig)
+
+@st.cache_data(show_spinner=False, max_entries=512)
+@persist(code=('modules/hexbin.py',))
+def histogram_figure(
+    data: pd.DataFrame,
+    column: str,
+    bins: int,
+    height: int,
+    width: int = None,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build a language-independent histogram of one column.
+
+    Parameters:
+    data : pd.DataFrame
+        Data containing the column.
+    column : str
+        Column to bin.
+    bins : int
+        Number of bins.
+    height : int
+        Figure height in pixels.
+    width : int, optional
+        Figure width in pixels.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The histogram; titles are applied by the caller.
+    """
+
+    if len(data) > hexbin.LOD_THRESHOLD:
+        # Dense networks: bin on the server instead of shipping every row to the browser
+        values = data[column].to_numpy(dtype=float)
+        counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+        fig = px.bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            labels={"x": column, "y": "count"},
+            height=height,
+            width=width,
+        )
+        fig.update_traces(width=np.diff(edges))
+        fig.update_layout(bargap=0)
+    else:
+        fig = px.histogram(
+            data,
+            x=column,
+            nbins=bins,
+            height=height,
+            width=width,
+        )
+    fig.update_layout(template="plotly_white")
+    return fig
+
 
 def plot_uhi_ci_evolution(
     station_data: pd.DataFrame,
     loggers: list,
     data_type: str,
-    lang_dict: dict
+    lang_dict: dict,
+    bands: pd.DataFrame = None,
+    day_profile: pd.DataFrame = None,
 ) -> None:
     """
     Plot the hourly evolution of UHI or City Index for selected loggers.
@@ -81,22 +156,76 @@ def plot_uhi_ci_evolution(
         Data column to plot (e.g., 'uhi', 'city_index').
     lang_dict : dict
         Language dictionary for translations
+    bands : pd.DataFrame, optional
+        Percentile bands across days from modules.cube ('hour', 'logger', lower and
+        upper percentile columns), drawn as shaded areas around each line.
+    day_profile : pd.DataFrame, optional
+        Hourly values of a single day ('day', 'hour', 'logger', data column), drawn dashed.
 
 
     Returns:
     None
         Displays a line chart in Streamlit.
-        :param lang_dict:
     """
 
     # Filter data for the selected loggers
-    subset = station_data[station_data["logger"].isin(loggers)].copy()
+    subset = station_data.loc[station_data["logger"].isin(loggers), ["hour", "logger", data_type]]
     if subset.empty:
         st.warning("No data found for the selected logger(s).")
         return
 
-    # Optionally sort by hour for a cleaner line
-    subset.sort_values("hour", inplace=True)
+    st.plotly_chart(
+        build_uhi_ci_evolution(subset, data_type, lang_dict, bands, day_profile), use_container_width=True
+    )
+
+
+def build_uhi_ci_evolution(
+    subset: pd.DataFrame,
+    data_type: str,
+    lang_dict: dict,
+    bands: pd.DataFrame = None,
+    day_profile: pd.DataFrame = None,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized hourly evolution chart of the given logger rows.
+    """
+
+    fig = evolution_figure(subset, data_type, bands, day_profile)
+    return relabel_figure(
+        fig,
+        {"hour": lang_dict['Hour'], data_type: data_type.capitalize()},
+        title=lang_dict['hourly_evol_title'] + f' {data_type.capitalize()} ',
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py',))
+def evolution_figure(
+    subset: pd.DataFrame,
+    data_type: str,
+    bands: pd.DataFrame = None,
+    day_profile: pd.DataFrame = None,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the language-independent hourly evolution line chart.
+
+    Parameters:
+    subset : pd.DataFrame
+        Rows of the selected loggers with 'hour', 'logger' and the data column.
+    data_type : str
+        Data column to plot (e.g., 'uhi', 'city_index').
+    bands : pd.DataFrame, optional
+        Lower / upper percentiles per 'hour' and 'logger' (the 3rd and 4th columns).
+    day_profile : pd.DataFrame, optional
+        Single-day values per 'hour' and 'logger', with the date in 'day'.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The line chart; titles are applied by the caller.
+    """
+
+    # Sort by hour for a cleaner line
+    subset = subset.sort_values("hour")
 
     # Create a line chart
     fig = px.line(
@@ -104,17 +233,91 @@ def plot_uhi_ci_evolution(
         x="hour",
         y=data_type,  # e.g., "uhi" or "city_index"
         color="logger",
-        title=lang_dict['hourly_evol_title'] + f' {data_type.capitalize()} ',
         markers=True,
-        labels={
-            "hour": lang_dict['Hour'],
-            data_type: f"{data_type.capitalize()}"
-        },
         height=700
     )
+    colors = {trace.name: trace.line.color for trace in fig.data}
+
+    if bands is not None and not bands.empty:
+        lower, upper = bands.columns[2:4]
+        n_lines = len(fig.data)
+        for logger, rows in bands.sort_values("hour").groupby("logger"):
+            color = colors.get(str(logger))
+            if color is None:
+                continue
+            r, g, b = px.colors.hex_to_rgb(color)
+            for column, fill in ((upper, None), (lower, "tonexty")):
+                fig.add_scatter(
+                    x=rows["hour"], y=rows[column], mode="lines", line_width=0, fill=fill,
+                    fillcolor=f"rgba({r},{g},{b},0.2)", legendgroup=str(logger), showlegend=False,
+                    hoverinfo="skip",
+                )
+        # Draw the shaded bands underneath the lines
+        fig.data = fig.data[n_lines:] + fig.data[:n_lines]
+
+    if day_profile is not None and not day_profile.empty:
+        for logger, rows in day_profile.sort_values("hour").groupby("logger"):
+            fig.add_scatter(
+                x=rows["hour"], y=rows[data_type], mode="lines", line_dash="dash",
+                line_color=colors.get(str(logger)), legendgroup=str(logger), name=f"{logger} ({rows['day'].iloc[0]})",
+                hovertemplate=f"hour=%{{x}}<br>{data_type}=%{{y}}<extra></extra>",
+            )
+
     fig.update_layout(template="plotly_white")
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
+
+def build_cluster_profiles(
+    centroids: pd.DataFrame,
+    data_type: str,
+    lang_dict: dict,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized chart of the cluster centroid profiles.
+    """
+    fig = cluster_profile_figure(centroids, data_type)
+    relabel_figure(
+        fig,
+        {'hour': lang_dict['Hour'], data_type: data_type.capitalize(), 'cluster': lang_dict['cluster_label'],
+         'n_loggers': lang_dict['cluster_size']},
+        title=lang_dict['cluster_profiles'],
+    )
+    return fig.update_layout(legend_title_text=lang_dict['cluster_label'])
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+@persist(code=('modules/hexbin.py',))
+def cluster_profile_figure(
+    centroids: pd.DataFrame,
+    data_type: str,
+) -> "plotly.graph_objects.Figure":
+    """
+    Build the language-independent line chart of the cluster centroid profiles.
+
+    Parameters:
+    centroids : pd.DataFrame
+        'hour', 'cluster', the data column and 'n_loggers' (see api.profile_clusters).
+    data_type : str
+        Data column to plot (e.g., 'uhi', 'city_index').
+
+    Returns:
+    plotly.graph_objects.Figure
+        One line per cluster, in the colors of the cluster map.
+    """
+    clusters = sorted(centroids['cluster'].unique())
+    fig = px.line(
+        centroids.assign(cluster=centroids['cluster'].astype(str)).sort_values('hour'),
+        x='hour',
+        y=data_type,
+        color='cluster',
+        hover_data=['n_loggers'],
+        category_orders={'cluster': [str(c) for c in clusters]},
+        color_discrete_sequence=CLUSTER_COLORS,
+        markers=True,
+        height=500,
+    )
+    fig.update_layout(template="plotly_white")
+    return fig
 
 
 def plot_uhi_ci_histogram(
@@ -132,8 +335,8 @@ def plot_uhi_ci_histogram(
         Filtered DataFrame with hourly UHI or City Index data.
     data_type : str
         Data type for the histogram (e.g., 'uhi', 'city_index').
-    hour : int
-        Hour of the day to filter data.
+    hour_str : str
+        Zero-padded hour shown in the title.
     lang_dict : dict
         Language dictionary for translations
     bins : int, optional
@@ -142,25 +345,31 @@ def plot_uhi_ci_histogram(
     Returns:
     None
         Displays the histogram in Streamlit.
-        :param hour_str:
     """
 
-    fig = px.histogram(
-        selected_data,
-        x=data_type.lower(),
-        nbins=bins,
-        title=f"{data_type.capitalize()} - {hour_str}:00",
-        labels={data_type.lower(): f"{data_type}"},
-        height=600,
-        width=500
-    )
+    st.plotly_chart(build_uhi_ci_histogram(selected_data, data_type, hour_str, lang_dict, bins))
 
-    fig.update_layout(
+
+def build_uhi_ci_histogram(
+    selected_data: pd.DataFrame,
+    data_type: str,
+    hour_str: str,
+    lang_dict: dict,
+    bins: int = 20,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized UHI / City Index histogram shown by plot_uhi_ci_histogram.
+    """
+
+    column = data_type.lower()
+    fig = histogram_figure(selected_data[[column]], column, bins, 600, 500)
+    return relabel_figure(
+        fig,
+        {},
+        title=f"{data_type.capitalize()} - {hour_str}:00",
         xaxis_title=f"{data_type.capitalize()}",
         yaxis_title=lang_dict['frequency'],
-        template="plotly_white",
     )
-    st.plotly_chart(fig)
 
 
 
@@ -186,17 +395,24 @@ def tn_sd_histogram(
         Displays the histogram in Streamlit.
     """
 
-    fig_hist = px.histogram(
-        station_summary,
-        x="exceed_count",
-        nbins=20,
+    st.plotly_chart(build_tn_sd_histogram(station_summary, threshold, lang_dict), use_container_width=True)
+
+
+def build_tn_sd_histogram(
+    station_summary: pd.DataFrame,
+    threshold: int,
+    lang_dict: dict,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized exceedance histogram shown by tn_sd_histogram.
+    """
+
+    fig_hist = histogram_figure(station_summary[["exceed_count"]], "exceed_count", 20, 600, 500)
+    return relabel_figure(
+        fig_hist,
+        {"exceed_count": lang_dict['frequency']},
         title=lang_dict['exceedences_title'] + f'{threshold} °C)',
-        labels={"exceed_count": lang_dict['frequency']},
-        height=600,
-        width=500
     )
-    fig_hist.update_layout(template="plotly_white")
-    st.plotly_chart(fig_hist, use_container_width=True)
 
 def plot_fitnah_histogram(
     sel_fitnah_data: pd.DataFrame,
@@ -228,21 +444,26 @@ def plot_fitnah_histogram(
         Displays the histogram in Streamlit.
     """
 
+    st.plotly_chart(build_fitnah_histogram(sel_fitnah_data, aggregator, dtype, buffer, lang_dict, bins))
 
-    fig = px.histogram(
-        sel_fitnah_data,
-        x=aggregator,
-        nbins=bins,
-        title=f"{dtype} - {aggregator} - {buffer}m",
-        labels={aggregator: aggregator.capitalize()},
-        height=550,
-        width=500
-    )
 
-    fig.update_layout(
+def build_fitnah_histogram(
+    sel_fitnah_data: pd.DataFrame,
+    aggregator: str,
+    dtype: str,
+    buffer: int,
+    lang_dict: dict,
+    bins: int = 20,
+) -> "plotly.graph_objects.Figure":
+    """
+    Return the localized Fitnah histogram shown by plot_fitnah_histogram.
+    """
+
+    fig = histogram_figure(sel_fitnah_data[[aggregator]], aggregator, bins, 550, 500)
+    return relabel_figure(
+        fig,
+        {},
+        title=f"{dtype} - {aggregator} - {buffer}m",
         xaxis_title=f"{aggregator.capitalize()}",
         yaxis_title=lang_dict['frequency'],
-        template="plotly_white",
     )
-
-    st.plotly_chart(fig)
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+Module: prefetch
+================
+
+Background prefetch of the selections a visitor is likely to open next. After the first
+view, visitors almost always flip the period (whole summer / main heatwave), the city
+(Biel / Bern) or move the hour slider by an hour or two. After every run of the script,
+the prefetcher warms the datasets and figures of those adjacent selections in a small
+thread pool, so that the flip is served from the caches.
+
+Warming goes through the same cached functions as the tabs (modules.api,
+modules.meteo.uhi_by_hour, the *_figure builders and spatial.build_logger_index), so the
+prefetched results land in the caches the next run reads from.
+
+- Cancellation: every new selection of a session starts a new generation of that
+  session. Queued tasks of its older generations are cancelled, and running ones stop at
+  their next step; the prefetches of other sessions are left alone.
+- Memory: at most MAX_PENDING tasks are queued per session, the generations of the
+  SESSION_ENTRIES most recent sessions are kept, and everything that is warmed lives in
+  the caches' own LRU bounds (api.memoize maxsize, st.cache_data max_entries).
+  No new tasks start while the process is above MEMORY_BUDGET_MB of resident memory
+  (HBS_PREFETCH_MAX_MB, Linux only).
+- Set HBS_PREFETCH=0 to disable prefetching.
+
+Classes:
+- Cancelled
+- Prefetcher
+
+Functions:
+- adjacent_selections
+- warm_selection
+- get_prefetcher
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from .paths import PERIODS, REFERENCE_LOGGERS, get_files
+
+ENABLED = os.environ.get('HBS_PREFETCH', '1') != '0'
+MAX_WORKERS = 2
+MAX_PENDING = 8
+# Hours on either side of the hour slider that are prefetched
+HOUR_RADIUS = 2
+MEMORY_BUDGET_MB = float(os.environ.get('HBS_PREFETCH_MAX_MB', 1536))
+# Selections remembered as warm, so that reruns do not queue them again
+WARMED_ENTRIES = 256
+# Sessions whose generation is kept; the oldest one's tasks are cancelled beyond that
+SESSION_ENTRIES = 256
+CITIES = list(REFERENCE_LOGGERS)
+
+
+class Cancelled(Exception):
+    """Raised inside a task whose generation has been superseded."""
+
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def adjacent_selections(city: str, period: str, hour: int) -> list:
+    """
+    Selections likely to be opened next, most likely first.
+
+    Parameters:
+    city : str
+        Current city.
+    period : str
+        Current period key.
+    hour : int
+        Current hour of the UHI tab.
+
+    Returns:
+    list
+        (city, period, hour) tuples: the other period, the other city (only for the
+        periods both cities have, not for heatwave episodes), then the hours next to the
+        current one.
+    """
+    selections = [(city, other, hour) for other in PERIODS if other != period]
+    if period in PERIODS:
+        selections += [(other, period, hour) for other in CITIES if other != city]
+    for offset in range(1, HOUR_RADIUS + 1):
+        selections += [(city, period, (hour + offset) % 24), (city, period, (hour - offset) % 24)]
+    return selections
+
+
+def warm_selection(city: str, period: str, hour: int, view: dict, check=lambda: None) -> None:
+    """
+    Load the datasets and build the default figures of one selection into the caches.
+
+    Parameters:
+    city, period, hour :
+        The selection.
+    view : dict
+        Current widget values: 'data_type', 'basemap', 'metric', 'threshold' and per city
+        'references' and 'conditions'.
+    check : callable
+        Called between steps; raises Cancelled to stop the task.
+
+    Returns:
+    None
+    """
+    from . import api, maps, meteo, plots, spatial
+    from .structure import load_csv
+
+    reference = view['references'].get(city, REFERENCE_LOGGERS[city])
+    conditions = view['conditions'].get(city, ())
+    data_type = view['data_type']
+
+    check()
+    hour_data = meteo.uhi_by_hour(city, period, hour, reference, conditions)
+    check()
+    maps.uhi_ci_map_figure(hour_data, data_type, view['basemap'])
+    plots.histogram_figure(hour_data[[data_type]], data_type, 20, 600, 500)
+    if (city, period) == (view['city'], view['period']):
+        # Only the hour differs: the rest of the page is already warm
+        return
+
+    lu_path, f_path, u_path, tpath, spath = get_files(city, period)
+    for path in (u_path, tpath, spath, lu_path, f_path):
+        check()
+        if path.exists():
+            load_csv(path)
+    check()
+    spatial.build_logger_index(u_path, tpath, f_path, lu_path)
+    check()
+    summary = api.sdtn_exceedances(city, period, view['metric'], view['threshold'])
+    maps.sdtn_map_figure(summary, view['basemap'])
+    plots.histogram_figure(summary[['exceed_count']], 'exceed_count', 20, 600, 500)
+    check()
+    api.daily_stats(city, period)
+
+
+class Prefetcher:
+    """
+    Thread pool warming the selections adjacent to the latest one.
+
+    Parameters:
+    max_workers : int
+        Number of background threads.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hbs-prefetch')
+        self._lock = threading.Lock()
+        # Per session id: generation, and the queued futures by selection
+        self._generations = OrderedDict()
+        self._futures = {}
+        self._warmed = OrderedDict()
+        self.counts = {'submitted': 0, 'completed': 0, 'cancelled': 0, 'failed': 0, 'skipped': 0}
+
+    def _run(self, key: tuple, session: str, generation: int, view: dict) -> None:
+        def check():
+            if self._generations.get(session) != generation:
+                raise Cancelled()
+
+        try:
+            warm_selection(*key, view, check)
+        except Cancelled:
+            self._count('cancelled')
+            return
+        except Exception:
+            # A failed prefetch only costs the warm cache; the script thread reports errors
+            self._count('failed')
+            return
+        with self._lock:
+            self._warmed[key + (view['fingerprint'],)] = None
+            while len(self._warmed) > WARMED_ENTRIES:
+                self._warmed.popitem(last=False)
+        self._count('completed')
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def cancel(self, session: str) -> None:
+        """
+        Cancel the queued tasks of a session and stop its running ones at their next step.
+
+        Parameters:
+        session : str
+            Session id.
+        """
+        with self._lock:
+            futures = self._supersede(session)
+        self._cancel_futures(futures)
+
+    def _supersede(self, session: str) -> list:
+        # Caller holds the lock; returns the futures to cancel outside of it
+        self._generations[session] = self._generations.get(session, 0) + 1
+        self._generations.move_to_end(session)
+        futures = list(self._futures.pop(session, {}).values())
+        while len(self._generations) > SESSION_ENTRIES:
+            oldest, _ = self._generations.popitem(last=False)
+            futures += self._futures.pop(oldest, {}).values()
+        return futures
+
+    def _cancel_futures(self, futures: list) -> None:
+        for future in futures:
+            if future.cancel():
+                self._count('cancelled')
+
+    def prefetch(self, view: dict, session: str = None) -> int:
+        """
+        Supersede the session's previous prefetch and queue the selections adjacent to a view.
+
+        Parameters:
+        view : dict
+            'city', 'period', 'hour' and the widget values used by warm_selection.
+        session : str, optional
+            Session id; default the session of the current script run.
+
+        Returns:
+        int
+            Number of queued selections.
+        """
+        if not ENABLED:
+            return 0
+        if session is None:
+            ctx = get_script_run_ctx()
+            session = ctx.session_id if ctx is not None else 'bare'
+        self.cancel(session)
+        if MEMORY_BUDGET_MB and _rss_mb() > MEMORY_BUDGET_MB:
+            self._count('skipped')
+            return 0
+        # The widget values that change what a selection warms
+        view = dict(view, fingerprint=repr(sorted(
+            (k, v) for k, v in view.items() if k not in ('city', 'period', 'hour')
+        )))
+        queued = 0
+        with self._lock:
+            generation = self._generations.get(session)
+            futures = self._futures.setdefault(session, {})
+            for key in adjacent_selections(view['city'], view['period'], view['hour']):
+                if queued == MAX_PENDING:
+                    break
+                if key + (view['fingerprint'],) in self._warmed:
+                    continue
+                futures[key] = self._pool.submit(self._run, key, session, generation, view)
+                self.counts['submitted'] += 1
+                queued += 1
+        return queued
+
+    def stats(self) -> dict:
+        """
+        Task counters and the number of selections remembered as warm.
+        """
+        with self._lock:
+            return dict(self.counts, warmed=len(self._warmed))
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher() -> Prefetcher:
+    """
+    Return the process-wide prefetcher; each session's latest selection supersedes only
+    that session's earlier prefetches.
+    """
+    return Prefetcher()
@@ -0,0 +1,331 @@
+"""
+Module: qc
+================
+
+Quality control of the raw logger series (CSV with 'time', 'logger' and 'temperature').
+Faulty readings (sun-exposed radiation shields, dead batteries, swapped loggers) are
+flagged before the series are aggregated into the campaign cube (see modules.cube).
+
+Every sample gets a uint8 bitfield of FLAGS:
+
+- spike: more than SPIKE_K from the running median of SPIKE_WINDOW samples
+- flatline: part of a run of identical readings lasting at least FLATLINE_MINUTES
+- step: the mean level of the next STEP_WINDOW samples differs from the previous ones
+  by more than STEP_K beyond the local trend (on the median-filtered series, so spikes
+  do not count)
+- gap: first sample after more than GAP_MINUTES without readings
+
+The series are processed in chunks, so files of any length stream through in constant
+memory. QualityControl holds back the last samples of every logger until enough context
+after them has arrived, and keeps enough context before the next sample: HISTORY /
+LOOKAHEAD samples for the spike and step windows and CONTEXT_MINUTES of time for the
+flatline and gap tests, which are defined in time. The flags therefore do not depend on
+the chunk size or the sampling interval. The tests are vectorized over each logger's
+part of a chunk.
+
+When the cube is built, samples flagged with SAMPLE_MASK are dropped, the flags are
+OR-ed into a (day, hour, logger) bitmap, hours without any valid sample are flagged as
+gaps, and the hourly values are checked against the median of the NEIGHBORS nearest
+loggers (neighbor flag; such hours are masked in the cube). Each logger's typical
+difference to its neighbours at every hour of the day is removed first, so the urban
+heat island itself is not flagged.
+
+Usage:
+    python -m modules.qc --raw raw_biel.csv --out raw_biel_qc.csv
+    python -m modules.cube --raw raw_biel_qc.csv --city biel
+
+Classes:
+- QualityControl
+
+Functions:
+- sample_flags
+- flag_chunks
+- run_qc
+- neighbor_flags
+- qc_rates
+"""
+
+import argparse
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+SPIKE, FLATLINE, STEP, GAP, NEIGHBOR = 1, 2, 4, 8, 16
+FLAGS = {'spike': SPIKE, 'flatline': FLATLINE, 'step': STEP, 'gap': GAP, 'neighbor': NEIGHBOR}
+# Samples with these flags are left out of the hourly means
+SAMPLE_MASK = SPIKE | FLATLINE | STEP
+
+SPIKE_WINDOW = 5
+SPIKE_K = 3.0
+FLATLINE_MINUTES = 180
+FLATLINE_TOLERANCE = 1e-3
+STEP_WINDOW = 6
+STEP_K = 3.0
+GAP_MINUTES = 60
+NEIGHBORS = 4
+NEIGHBOR_K = 3.0
+
+# Samples of context kept before and after the samples of a chunk that are emitted
+HISTORY = 3 * STEP_WINDOW + SPIKE_WINDOW
+LOOKAHEAD = 3 * STEP_WINDOW + SPIKE_WINDOW // 2
+# Time of context kept before and after them (a flatline run is judged by its duration)
+CONTEXT_MINUTES = max(FLATLINE_MINUTES, GAP_MINUTES)
+NS_PER_MINUTE = 60 * 10 ** 9
+
+
+def sample_flags(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Flag the samples of one logger's series.
+
+    Parameters:
+    times : np.ndarray
+        Sample times as int64 nanoseconds, increasing.
+    values : np.ndarray
+        Temperatures (no NaN).
+
+    Returns:
+    np.ndarray
+        uint8 bitfield of FLAGS per sample (without the neighbor flag).
+    """
+    n = len(values)
+    flags = np.zeros(n, dtype=np.uint8)
+    if n == 0:
+        return flags
+
+    flags[1:][np.diff(times) > GAP_MINUTES * NS_PER_MINUTE] |= GAP
+
+    half = SPIKE_WINDOW // 2
+    median = np.median(sliding_window_view(np.pad(values, half, mode='edge'), SPIKE_WINDOW), axis=1)
+    flags[np.abs(values - median) > SPIKE_K] |= SPIKE
+
+    # Runs of identical readings: run starts and durations, then broadcast back to samples
+    same = np.abs(np.diff(values)) <= FLATLINE_TOLERANCE
+    starts = np.flatnonzero(np.r_[True, ~same])
+    stops = np.r_[starts[1:] - 1, n - 1]
+    duration = times[stops] - times[starts]
+    run = np.cumsum(np.r_[True, ~same]) - 1
+    flags[duration[run] >= FLATLINE_MINUTES * NS_PER_MINUTE] |= FLATLINE
+
+    w = STEP_WINDOW
+    if n >= 4 * w:
+        total = np.r_[0.0, np.cumsum(median)]
+        # Difference between the mean of the next and of the previous w samples ...
+        i = np.arange(w, n - w + 1)
+        change = ((total[i + w] - total[i]) - (total[i] - total[i - w])) / w
+        # ... minus the same difference one window earlier and later, which cancels the
+        # (locally linear) diurnal trend but not a level shift
+        jump = np.abs(change[w:-w] - (change[:-2 * w] + change[2 * w:]) / 2)
+        i = i[w:-w]
+        # Only the largest jump of a neighbourhood marks the step
+        peak = jump == np.max(sliding_window_view(np.pad(jump, w, mode='edge'), 2 * w + 1), axis=1)
+        flags[i[(jump > STEP_K) & peak]] |= STEP
+    return flags
+
+
+class QualityControl:
+    """
+    Streaming quality control of raw logger series.
+
+    Feed chunks of the raw series (rows of each logger in chronological order) to
+    process(); every returned row has been tested with at least HISTORY samples and
+    CONTEXT_MINUTES of context before it and LOOKAHEAD samples and CONTEXT_MINUTES after
+    it (or the start of the series), so its flags equal those of the whole series.
+    flush() returns the remaining rows at the end.
+    """
+
+    def __init__(self):
+        # logger -> (times, values, number of leading samples already emitted)
+        self._carry = {}
+
+    def _run(self, logger, times: np.ndarray, values: np.ndarray, final: bool) -> pd.DataFrame:
+        carry_times, carry_values, emitted = self._carry.pop(logger, (np.zeros(0, np.int64), np.zeros(0), 0))
+        times = np.concatenate([carry_times, times])
+        values = np.concatenate([carry_values, values])
+        flags = sample_flags(times, values)
+
+        context = CONTEXT_MINUTES * NS_PER_MINUTE
+        if final:
+            ready = len(times)
+        else:
+            # Samples followed by LOOKAHEAD samples and CONTEXT_MINUTES of readings
+            complete = np.searchsorted(times, times[-1] - context, side='right') if len(times) else 0
+            ready = max(min(len(times) - LOOKAHEAD, complete), emitted)
+            # Keep HISTORY samples before the next sample to emit, and the last sample at
+            # least CONTEXT_MINUTES before it
+            keep = max(ready - HISTORY, 0)
+            if ready < len(times):
+                keep = min(keep, max(np.searchsorted(times, times[ready] - context, side='right') - 1, 0))
+            self._carry[logger] = (times[keep:], values[keep:], ready - keep)
+        return pd.DataFrame({
+            'time': pd.to_datetime(times[emitted:ready]),
+            'logger': logger,
+            'temperature': values[emitted:ready],
+            'qc': flags[emitted:ready],
+        })
+
+    def process(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Flag a chunk of the raw series.
+
+        Parameters:
+        chunk : pd.DataFrame
+            Rows with 'time', 'logger' and 'temperature'; rows without a temperature are
+            dropped (they show up as gaps).
+
+        Returns:
+        pd.DataFrame
+            The rows that are ready, with a 'qc' bitfield column.
+        """
+        chunk = chunk.dropna(subset=['temperature'])
+        times = pd.to_datetime(chunk['time']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        loggers = chunk['logger'].to_numpy()
+        order = np.lexsort((times, loggers))
+        loggers, times = loggers[order], times[order]
+        values = chunk['temperature'].to_numpy(dtype=float)[order]
+        bounds = np.flatnonzero(np.r_[True, loggers[1:] != loggers[:-1], True])
+        parts = [
+            self._run(loggers[start], times[start:stop], values[start:stop], final=False)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return pd.concat(parts, ignore_index=True) if parts else _empty_flags()
+
+    def flush(self) -> pd.DataFrame:
+        """
+        Flag and return the samples held back as context of the last chunk.
+        """
+        parts = [
+            self._run(logger, np.zeros(0, np.int64), np.zeros(0), final=True)
+            for logger in list(self._carry)
+        ]
+        return pd.concat(parts, ignore_index=True) if parts else _empty_flags()
+
+
+def _empty_flags() -> pd.DataFrame:
+    return pd.DataFrame({
+        'time': pd.Series(dtype='datetime64[ns]'),
+        'logger': pd.Series(dtype=int),
+        'temperature': pd.Series(dtype=float),
+        'qc': pd.Series(dtype=np.uint8),
+    })
+
+
+def flag_chunks(chunks):
+    """
+    Flag an iterable of raw chunks (e.g. pd.read_csv(..., chunksize=...)).
+
+    Parameters:
+    chunks : iterable
+        DataFrames with 'time', 'logger' and 'temperature'.
+
+    Yields:
+    pd.DataFrame
+        Flagged rows with a 'qc' column (see QualityControl.process).
+    """
+    qc = QualityControl()
+    for chunk in chunks:
+        yield qc.process(chunk)
+    yield qc.flush()
+
+
+def run_qc(raw_path, out_path, chunksize: int = 200_000) -> pd.DataFrame:
+    """
+    Stream a raw CSV through the quality control and write it with a 'qc' column.
+
+    Parameters:
+    raw_path : Path
+        CSV with 'time', 'logger' and 'temperature', or a raw series store directory
+        (see modules.rawstore; read day by day).
+    out_path : Path
+        Output CSV.
+    chunksize : int
+        Rows read per chunk.
+
+    Returns:
+    pd.DataFrame
+        Per logger the number of samples and the share (%) of samples with each flag.
+    """
+    counts = []
+    if Path(raw_path).is_dir():
+        from .rawstore import RawStore
+        chunks = RawStore(raw_path).iter_days()
+    else:
+        chunks = pd.read_csv(raw_path, usecols=['time', 'logger', 'temperature'], chunksize=chunksize)
+    for i, flagged in enumerate(flag_chunks(chunks)):
+        flagged.to_csv(out_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        bits = {name: (flagged['qc'].to_numpy() & bit) != 0 for name, bit in FLAGS.items() if bit != NEIGHBOR}
+        counts.append(pd.DataFrame({'logger': flagged['logger'], 'samples': 1, **bits}).groupby('logger').sum())
+    totals = pd.concat(counts).groupby(level=0).sum()
+    rates = totals.drop(columns='samples').div(totals['samples'], axis=0) * 100
+    return pd.concat([totals[['samples']], rates.round(2)], axis=1).reset_index()
+
+
+def neighbor_flags(temperature: np.ndarray, neighbors: np.ndarray) -> np.ndarray:
+    """
+    Flag hourly values inconsistent with the neighbouring loggers.
+
+    Parameters:
+    temperature : np.ndarray
+        (day, hour, logger) hourly temperatures.
+    neighbors : np.ndarray
+        (logger, NEIGHBORS) positions of the nearest other loggers.
+
+    Returns:
+    np.ndarray
+        Boolean (day, hour, logger) array: the difference to the neighbours' median deviates
+        by more than NEIGHBOR_K from the logger's typical difference at that hour.
+    """
+    flags = np.zeros(temperature.shape, dtype=bool)
+    with warnings.catch_warnings():
+        # Hours without (enough) neighbour values yield NaN and are not flagged
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        # Loggers are processed in blocks to bound the (day, hour, block, neighbours) array
+        block = max(1, 2 ** 24 // max(1, temperature.shape[0] * temperature.shape[1] * neighbors.shape[1]))
+        for start in range(0, temperature.shape[2], block):
+            cols = np.arange(start, min(start + block, temperature.shape[2]))
+            around = temperature[:, :, neighbors[cols]]
+            enough = np.sum(~np.isnan(around), axis=3) >= 2
+            difference = np.where(enough, temperature[:, :, cols] - np.nanmedian(around, axis=3), np.nan)
+            typical = np.nanmedian(difference, axis=0, keepdims=True)
+            flags[:, :, cols] = np.abs(difference - typical) > NEIGHBOR_K
+    return flags
+
+
+def qc_rates(bitmap: np.ndarray, loggers: np.ndarray, day_mask: np.ndarray = None) -> pd.DataFrame:
+    """
+    Share of flagged hours per logger.
+
+    Parameters:
+    bitmap : np.ndarray
+        (day, hour, logger) uint8 QC bitmap of a cube.
+    loggers : np.ndarray
+        Logger IDs of the bitmap columns.
+    day_mask : np.ndarray, optional
+        Boolean mask over the day axis (default: all days).
+
+    Returns:
+    pd.DataFrame
+        'logger', the share (%) of hours with each flag and 'flagged' (any flag that
+        masks or drops data).
+    """
+    if day_mask is not None:
+        bitmap = bitmap[np.flatnonzero(day_mask)]
+    bitmap = np.asarray(bitmap).reshape(-1, len(loggers))
+    rates = {'logger': loggers}
+    for name, bit in FLAGS.items():
+        rates[name] = ((bitmap & bit) != 0).mean(axis=0) * 100
+    rates['flagged'] = ((bitmap & (SAMPLE_MASK | NEIGHBOR)) != 0).mean(axis=0) * 100
+    return pd.DataFrame(rates).round(2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flag the raw logger series (see modules.qc).')
+    parser.add_argument(
+        '--raw', required=True, help="CSV with 'time', 'logger' and 'temperature' columns, or a raw series store"
+    )
+    parser.add_argument('--out', required=True, help='output CSV with an added qc bitfield column')
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    args = parser.parse_args()
+    print(run_qc(args.raw, args.out, args.chunksize).to_string(index=False))
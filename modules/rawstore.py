@@ -0,0 +1,341 @@
+"""
+Module: rawstore
+================
+
+Compact storage of the raw high-frequency logger series of a campaign (e.g. 10-minute
+readings of hundreds of loggers over a season), from which the cube (modules.cube), the
+quality control (modules.qc) and the derived *_temp_stats / *_hourly_uhi_ci files are
+reprocessed. Scanning the raw CSV dominates such reprocessing; the store is a fraction of
+its size and reads one logger or one day without touching the rest.
+
+Layout of a store directory:
+
+- data.bin: one zlib stream per chunk, i.e. per (logger, day); chunks are ordered by
+  logger, then day, so the season of a logger is contiguous.
+- index.npy: one row per chunk with the logger and day position, the number of samples
+  and the byte range of the chunk in data.bin (the time index of the store).
+- meta.json: logger IDs, first day, number of days, quantization step and whether the
+  samples carry the 'qc' bitfield of modules.qc.
+
+Within a chunk the temperatures are quantized to SCALE (0.01 °C) as int16 and the times to
+whole seconds of the day as int32; both are delta encoded (the first sample keeps its
+absolute value), so regular 10-minute readings become runs of equal small numbers. The
+bytes of each delta array are shuffled (all low bytes, then all high bytes) before zlib,
+which compresses the mostly-zero high bytes to almost nothing. Missing readings are not
+stored; the times show the gaps.
+
+Decoding is vectorized over all chunks of a read: the decompressed buffers are joined,
+unshuffled with one gather per byte plane and integrated with one cumulative sum that
+restarts at every chunk.
+
+Usage:
+    python -m modules.rawstore --raw raw_biel.csv --city biel
+    python -m modules.cube --raw data/biel/raw/summer23 --city biel
+
+Classes:
+- RawStore
+
+Functions:
+- write_store
+- open_store
+"""
+
+import argparse
+import json
+import os
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .paths import CAMPAIGNS, get_raw_dir
+
+SCALE = 0.01
+DATA_FILE = 'data.bin'
+INDEX_FILE = 'index.npy'
+META_FILE = 'meta.json'
+INDEX_DTYPE = np.dtype([
+    ('logger', '<i4'), ('day', '<i4'), ('samples', '<i4'), ('offset', '<i8'), ('nbytes', '<i4'),
+])
+# zlib level of write_store: higher levels barely shrink the shuffled deltas further
+LEVEL = 6
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    """Bytes of a little-endian array grouped by significance (all first bytes, then all second ...)."""
+    return np.ascontiguousarray(values.view(np.uint8).reshape(-1, values.itemsize).T).tobytes()
+
+
+def _deltas(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Differences to the previous value, the absolute value at every chunk start."""
+    deltas = np.empty_like(values)
+    deltas[1:] = values[1:] - values[:-1]
+    deltas[starts] = values[starts]
+    return deltas
+
+
+def _integrate(deltas: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Inverse of _deltas: cumulative sum restarting at every chunk (of the given lengths)."""
+    total = np.cumsum(deltas, dtype=np.int64)
+    ends = np.cumsum(counts)
+    before = np.concatenate(([0], total[ends[:-1] - 1])) if len(counts) else np.empty(0, dtype=np.int64)
+    return total - np.repeat(before, counts)
+
+
+class RawStore:
+    """
+    Read-only view of a raw series store.
+
+    Parameters:
+    store_dir : Path
+        Directory written by write_store.
+    """
+
+    def __init__(self, store_dir: Path):
+        store_dir = Path(store_dir)
+        with open(store_dir / META_FILE, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.loggers = np.array(meta['loggers'])
+        self.days = np.datetime64(meta['first_day'], 'D') + np.arange(meta['n_days'])
+        self.scale = meta['scale']
+        self.has_qc = meta['qc']
+        self.index = np.load(store_dir / INDEX_FILE)
+        size = (store_dir / DATA_FILE).stat().st_size
+        data = np.memmap(store_dir / DATA_FILE, dtype=np.uint8, mode='r') if size else np.empty(0, np.uint8)
+        # Slices of a memoryview are cheaper than those of a memmap (one per chunk read)
+        self._data = memoryview(data)
+        self._positions = {logger: i for i, logger in enumerate(self.loggers.tolist())}
+
+    @property
+    def samples(self) -> int:
+        """Number of stored readings."""
+        return int(self.index['samples'].sum())
+
+    def chunks(self, loggers: list = None, start=None, end=None) -> np.ndarray:
+        """
+        Positions (in the index) of the chunks of the given loggers between two days.
+
+        Parameters:
+        loggers : list, optional
+            Logger IDs (default: all; unknown loggers are ignored).
+        start, end : optional
+            First day and the day after the last one (dates or timestamps; only the day
+            counts, default: the whole campaign).
+
+        Returns:
+        np.ndarray
+            Chunk positions in storage order (logger, then day).
+        """
+        keep = np.ones(len(self.index), dtype=bool)
+        if loggers is not None:
+            positions = [self._positions[l] for l in loggers if l in self._positions]
+            keep &= np.isin(self.index['logger'], positions)
+        if start is not None:
+            keep &= self.index['day'] >= (np.datetime64(pd.Timestamp(start), 'D') - self.days[0]).astype(int)
+        if end is not None:
+            # A time within a day needs that day's chunk
+            last = np.datetime64(pd.Timestamp(end) - pd.Timedelta(1, 'ns'), 'D')
+            keep &= self.index['day'] <= (last - self.days[0]).astype(int)
+        return np.flatnonzero(keep)
+
+    def decode(self, chunks: np.ndarray) -> pd.DataFrame:
+        """
+        Decode chunks into raw readings.
+
+        Parameters:
+        chunks : np.ndarray
+            Chunk positions (see chunks).
+
+        Returns:
+        pd.DataFrame
+            'time' (datetime64[s]), 'logger', 'temperature' (°C, float32) and, if stored,
+            'qc', in the order of the chunks.
+        """
+        rows = self.index[chunks]
+        counts = rows['samples'].astype(np.int64)
+        buffer = np.frombuffer(
+            b''.join(zlib.decompress(self._data[o:o + n]) for o, n in zip(rows['offset'], rows['nbytes'])),
+            dtype=np.uint8,
+        )
+        # Sample s of chunk c is at position j = s - first[c] within the chunk, whose
+        # buffer starts at byte base[c] and holds the planes time (4n), value (2n), qc (n)
+        width = 7 if self.has_qc else 6
+        chunk_of = np.repeat(np.arange(len(rows)), counts)
+        first = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(rows) else counts
+        j = np.arange(counts.sum()) - first[chunk_of]
+        n = counts[chunk_of]
+        base = (np.concatenate(([0], np.cumsum(width * counts)[:-1])) if len(rows) else counts)[chunk_of] + j
+
+        def plane(offset, itemsize, dtype):
+            planes = np.empty((len(base), itemsize), dtype=np.uint8)
+            for k in range(itemsize):
+                planes[:, k] = buffer[base + (offset + k) * n]
+            return planes.view(dtype).ravel()
+
+        seconds = _integrate(plane(0, 4, '<i4'), counts)
+        values = _integrate(plane(4, 2, '<i2'), counts)
+        days = self.days[rows['day']].astype('datetime64[s]')
+        data = {
+            'time': np.repeat(days, counts) + seconds.astype('timedelta64[s]'),
+            'logger': np.repeat(self.loggers[rows['logger']], counts),
+            'temperature': (values * self.scale).astype(np.float32),
+        }
+        if self.has_qc:
+            data['qc'] = buffer[base + 6 * n]
+        return pd.DataFrame(data)
+
+    def read(self, loggers: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Readings of the given loggers in a time range.
+
+        Parameters:
+        loggers : list, optional
+            Logger IDs (default: all).
+        start, end : optional
+            Time range [start, end) (default: the whole campaign).
+
+        Returns:
+        pd.DataFrame
+            See decode; sorted by logger, then time.
+        """
+        data = self.decode(self.chunks(loggers, start, end))
+        keep = np.ones(len(data), dtype=bool)
+        if start is not None:
+            keep &= data['time'].to_numpy() >= np.datetime64(pd.Timestamp(start), 's')
+        if end is not None:
+            keep &= data['time'].to_numpy() < np.datetime64(pd.Timestamp(end), 's')
+        return data if keep.all() else data[keep].reset_index(drop=True)
+
+    def logger_series(self, logger, start=None, end=None) -> pd.DataFrame:
+        """
+        The readings of one logger (see read).
+        """
+        return self.read([logger], start, end)
+
+    def day(self, day, loggers: list = None) -> pd.DataFrame:
+        """
+        The readings of one day across all (or the given) loggers (see read).
+        """
+        day = np.datetime64(pd.Timestamp(day), 'D')
+        return self.read(loggers, day, day + 1)
+
+    def iter_days(self):
+        """
+        Yield the campaign day by day, e.g. as the chunks of qc.flag_chunks.
+
+        Yields:
+        pd.DataFrame
+            The readings of one day, sorted by logger, then time.
+        """
+        for day in self.days:
+            chunks = np.flatnonzero(self.index['day'] == (day - self.days[0]).astype(int))
+            if len(chunks):
+                yield self.decode(chunks)
+
+
+def write_store(raw: pd.DataFrame, store_dir: Path, level: int = LEVEL) -> RawStore:
+    """
+    Write raw logger readings as a store.
+
+    Parameters:
+    raw : pd.DataFrame
+        Readings with 'time', 'logger' and 'temperature' columns, optionally with the 'qc'
+        bitfield of modules.qc; any order. Readings without a temperature are dropped.
+    store_dir : Path
+        Output directory.
+    level : int
+        zlib compression level.
+
+    Returns:
+    RawStore
+        The written store.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    time = pd.to_datetime(raw['time']).to_numpy().astype('datetime64[s]')
+    temperature = raw['temperature'].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(temperature) & ~np.isnat(time)
+    logger_ids = raw['logger'].to_numpy()[valid]
+    time, temperature = time[valid], temperature[valid]
+    flags = raw['qc'].to_numpy(dtype=np.uint8)[valid] if 'qc' in raw else None
+
+    loggers, logger_pos = np.unique(logger_ids, return_inverse=True)
+    order = np.lexsort((time, logger_pos))
+    time, temperature, logger_pos = time[order], temperature[order], logger_pos[order]
+    if flags is not None:
+        flags = flags[order]
+    quantized = np.round(temperature / SCALE)
+    if len(quantized) and np.abs(quantized).max() > np.iinfo(np.int16).max // 2:
+        # Half the int16 range, so that the difference of two readings fits as well
+        raise ValueError(f"temperatures beyond ±{np.iinfo(np.int16).max // 2 * SCALE:g} °C cannot be stored")
+    day = time.astype('datetime64[D]')
+    first_day = day.min() if len(day) else np.datetime64('1970-01-01')
+    n_days = int((day.max() - first_day).astype(int)) + 1 if len(day) else 0
+    day_pos = (day - first_day).astype(np.int64)
+
+    chunk_key = logger_pos.astype(np.int64) * max(n_days, 1) + day_pos
+    starts = np.flatnonzero(np.diff(chunk_key, prepend=-1)) if len(chunk_key) else np.empty(0, dtype=np.int64)
+    counts = np.diff(np.append(starts, len(chunk_key)))
+    seconds = _deltas((time - day).astype(np.int64).astype('<i4'), starts)
+    values = _deltas(quantized.astype('<i2'), starts)
+
+    index = np.zeros(len(starts), dtype=INDEX_DTYPE)
+    index['logger'] = logger_pos[starts]
+    index['day'] = day_pos[starts]
+    index['samples'] = counts
+    offset = 0
+    with open(store_dir / f'{DATA_FILE}.tmp', 'wb') as f:
+        for i, (a, n) in enumerate(zip(starts, counts)):
+            planes = [_shuffle(seconds[a:a + n]), _shuffle(values[a:a + n])]
+            if flags is not None:
+                planes.append(flags[a:a + n].tobytes())
+            chunk = zlib.compress(b''.join(planes), level)
+            f.write(chunk)
+            index['offset'][i] = offset
+            index['nbytes'][i] = len(chunk)
+            offset += len(chunk)
+    os.replace(store_dir / f'{DATA_FILE}.tmp', store_dir / DATA_FILE)
+    np.save(store_dir / INDEX_FILE, index)
+
+    meta = {
+        'loggers': loggers.tolist(),
+        'first_day': str(first_day),
+        'n_days': n_days,
+        'scale': SCALE,
+        'qc': flags is not None,
+    }
+    with open(store_dir / META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return RawStore(store_dir)
+
+
+def open_store(store_dir: Path) -> RawStore:
+    """
+    Open a raw series store.
+
+    Parameters:
+    store_dir : Path
+        Directory written by write_store (see structure.get_raw_dir).
+
+    Returns:
+    RawStore or None
+        None if the store has not been written.
+    """
+    if not (Path(store_dir) / META_FILE).exists():
+        return None
+    return RawStore(store_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the raw logger series of a campaign into a store.')
+    parser.add_argument('--raw', required=True, help="CSV with 'time', 'logger', 'temperature' and optionally 'qc'")
+    parser.add_argument('--city', required=True, choices=sorted(CAMPAIGNS))
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.raw, usecols=lambda column: column in ('time', 'logger', 'temperature', 'qc'))
+    store = write_store(raw, get_raw_dir(args.city))
+    size = sum(path.stat().st_size for path in get_raw_dir(args.city).iterdir())
+    print(f"{store.samples} readings of {len(store.loggers)} loggers over {len(store.days)} days -> "
+          f"{get_raw_dir(args.city)} ({size / 2 ** 20:.1f} MB, CSV {Path(args.raw).stat().st_size / 2 ** 20:.1f} MB)")
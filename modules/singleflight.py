@@ -0,0 +1,172 @@
+"""
+Module: singleflight
+================
+
+Request coalescing ("single flight") for the computations all sessions share.
+
+When many visitors open the same view at the same moment (e.g. the default view at an
+outreach event), their sessions ask for the same data and figures before any of them is
+cached. A Group lets the first caller of a key run the computation; every caller of the
+same key arriving while it runs waits for it and receives its result (or its exception)
+instead of computing it again. Nothing is kept once the computation has finished: the
+caches in front of a group (api.memoize, Streamlit's caches) serve the later calls.
+
+Groups are used by the memoized functions of modules.api (one group per function, keyed
+by the arguments) and by the figure builds of modules.panels (keyed by the tab's
+selection). Every group counts its computations, the calls coalesced into another call's
+computation (the computations saved) and the compute time they saved; report() lists
+them for the startup profile.
+
+HBS_SINGLE_FLIGHT=0 disables the coalescing (every call computes), for comparisons.
+
+Classes:
+- Group
+
+Functions:
+- group
+- report
+"""
+
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('HBS_SINGLE_FLIGHT', '1') != '0'
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class _Call:
+    """A computation in flight and the number of callers waiting for it."""
+    __slots__ = ('done', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    """
+    Coalesces concurrent calls of the same key into one computation.
+
+    Parameters:
+    name : str
+        Name of the group in the report.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counts = {'computations': 0, 'coalesced': 0, 'saved_seconds': 0.0}
+
+    def do(self, key, func, *args, **kwargs) -> tuple:
+        """
+        Compute func(*args, **kwargs), or wait for the computation of the same key in flight.
+
+        Parameters:
+        key :
+            Hashable identity of the computation.
+        func : callable
+            Computation; it must not call the group with the same key.
+
+        Returns:
+        tuple
+            (value, shared): shared is True if the value was computed by another caller.
+        """
+        with self._lock:
+            call = self._calls.get(key) if ENABLED else None
+            leader = call is None
+            if leader:
+                call = _Call()
+                if ENABLED:
+                    self._calls[key] = call
+                self._counts['computations'] += 1
+            else:
+                call.waiters += 1
+                self._counts['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        start = time.perf_counter()
+        try:
+            call.value = func(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                self._counts['saved_seconds'] += call.waiters * (time.perf_counter() - start)
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> dict:
+        """
+        Counters of the group.
+
+        Returns:
+        dict
+            'group', 'computations', 'coalesced' (calls served by another call's
+            computation), 'saved_seconds' (compute time of the coalesced calls) and
+            'in_flight' (computations running now).
+        """
+        with self._lock:
+            return {
+                'group': self.name,
+                **self._counts,
+                'saved_seconds': round(self._counts['saved_seconds'], 4),
+                'in_flight': len(self._calls),
+            }
+
+    def reset(self) -> None:
+        """
+        Reset the counters (computations in flight are not affected).
+        """
+        with self._lock:
+            self._counts.update(computations=0, coalesced=0, saved_seconds=0.0)
+
+
+def group(name: str) -> Group:
+    """
+    The group of a name, created on first use.
+
+    Parameters:
+    name : str
+        Group name, e.g. the qualified name of a memoized function.
+
+    Returns:
+    Group
+        The process-wide group of that name.
+    """
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = Group(name)
+        return _groups[name]
+
+
+def report(coalesced_only: bool = False) -> list:
+    """
+    Counters of every group, the groups that saved most first.
+
+    Parameters:
+    coalesced_only : bool
+        Only list the groups that coalesced at least one call.
+
+    Returns:
+    list
+        Group.stats() of every group.
+    """
+    with _groups_lock:
+        groups = list(_groups.values())
+    rows = [g.stats() for g in groups]
+    if coalesced_only:
+        rows = [row for row in rows if row['coalesced']]
+    return sorted(rows, key=lambda row: (-row['coalesced'], -row['computations'], row['group']))
@@ -0,0 +1,330 @@
+"""
+Module: snapshot
+================
+
+Exports every map and chart combination of the app into a static bundle that can be
+served as a read-only mirror without Python (e.g. during traffic spikes).
+
+The parameter space is finite: city x period x hour x metric for the UHI tab, thresholds
+in 0.5 °C steps for the SD/TN tab, buffers x land-use classes, buffers x FITNAH types x
+aggregators, plus the three languages. Figures are written as Plotly JSON (optionally
+also as standalone HTML) under predictable paths; a small index.json describes the
+parameter axes and path templates, and index.html is a static viewer that loads the
+figures with plotly.js. Basemaps are not multiplied into the bundle: the viewer swaps the
+SwissTopo layer of a map client-side.
+
+Work is split into groups that share the same input files and rendered in parallel in a
+process pool. manifest.json stores a fingerprint of each group's input files and of the
+code (the whole modules package and the language dictionary, which the figure builders
+import from), so a re-export only renders the groups whose inputs changed. The figures
+bypass the app's artifact store (modules.artifacts), which would otherwise fill up with
+every figure of the bundle.
+
+Usage:
+    python -m modules.snapshot --out static_snapshot
+    python -m modules.snapshot --out static_snapshot --html --workers 8
+
+Functions:
+- snapshot_groups
+- render_group
+- export_snapshot
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from content.lang_dict import de_dict, eng_dict, fr_dict
+from .structure import BASEMAPS, PERIODS, get_files
+
+LANGUAGES = {'DE': de_dict, 'EN': eng_dict, 'FR': fr_dict}
+CITIES = ['biel', 'bern']
+HOURS = list(range(24))
+UHI_TYPES = ['city_index', 'uhi']
+SDTN_METRICS = {'summer_days': 'daily_max', 'tropical_nights': 'daily_min'}
+THRESHOLDS = [round(t, 1) for t in np.arange(0.0, 50.0 + 0.25, 0.5)]
+FITNAH_TYPES = ['fitnah_ss', 'fitnah_sv', 'fitnah_temp', 'dem']
+FITNAH_AGGREGATORS = ['min', 'max', 'mean', 'count']
+BUFFERS = [10, 50, 100, 500]
+DEFAULT_BASEMAP = BASEMAPS[0]
+
+# Code of the plotting pipeline (glob patterns); a change to any file invalidates every group
+CODE_FILES = ['modules/*.py', 'content/lang_dict.py']
+
+PATH_TEMPLATES = {
+    'uhi_map': 'uhi/{city}/{period}/map_{dtype}_{hour:02d}.json',
+    'uhi_hist': 'uhi/{city}/{period}/hist_{dtype}_{hour:02d}_{lang}.json',
+    'evolution': 'evolution/{city}/{period}/{dtype}_{lang}.json',
+    'sdtn_map': 'sdtn/{city}/{period}/map_{metric}_{threshold:.1f}.json',
+    'sdtn_hist': 'sdtn/{city}/{period}/hist_{metric}_{threshold:.1f}_{lang}.json',
+    'landuse_map': 'landuse/{city}/map_{buffer}_{landuse}_{lang}.json',
+    'landuse_hist': 'landuse/{city}/hist_{buffer}_{landuse}_{lang}.json',
+    'fitnah_map': 'fitnah/{city}/map_{buffer}_{dtype}_{aggregator}.json',
+    'fitnah_hist': 'fitnah/{city}/hist_{buffer}_{dtype}_{aggregator}_{lang}.json',
+}
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version(root: Path) -> str:
+    """
+    Hash of the plotting code, so that code changes trigger a full re-export.
+
+    Parameters:
+    root : Path
+        Repository root.
+
+    Returns:
+    str
+        Hex digest.
+    """
+    digest = hashlib.sha256()
+    for pattern in CODE_FILES:
+        for path in sorted(root.glob(pattern)):
+            digest.update(path.relative_to(root).as_posix().encode() + _file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def snapshot_groups() -> list:
+    """
+    List the export groups; each group shares its input files.
+
+    Returns:
+    list
+        List of dicts with 'id', 'tab', 'city', optional 'period' and 'inputs' (paths).
+    """
+    groups = []
+    for city in CITIES:
+        for period in PERIODS:
+            lu_path, f_path, u_path, tpath, spath = get_files(city, period)
+            year = '23' if city == 'biel' else '22'
+            sdtn_path = Path.cwd() / 'data' / city / f'summer{year}_sdtn.csv'
+            groups.append({'id': f'uhi/{city}/{period}', 'tab': 'uhi', 'city': city, 'period': period,
+                           'inputs': [str(u_path)]})
+            groups.append({'id': f'sdtn/{city}/{period}', 'tab': 'sdtn', 'city': city, 'period': period,
+                           'inputs': [str(tpath), str(sdtn_path)]})
+        lu_path, f_path, *_ = get_files(city, PERIODS[0])
+        groups.append({'id': f'landuse/{city}', 'tab': 'landuse', 'city': city, 'inputs': [str(lu_path)]})
+        if f_path.exists():
+            groups.append({'id': f'fitnah/{city}', 'tab': 'fitnah', 'city': city, 'inputs': [str(f_path)]})
+    return groups
+
+
+def _write(fig, out_dir: Path, relative: str, html: bool) -> str:
+    path = out_dir / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(fig.to_json(), encoding='utf-8')
+    os.replace(tmp, path)
+    if html:
+        fig.write_html(path.with_suffix('.html'), include_plotlyjs='cdn', full_html=True)
+    return relative
+
+
+def render_group(group: dict, out_dir: str, html: bool = False) -> tuple:
+    """
+    Render every figure of one export group (runs in a worker process).
+
+    Parameters:
+    group : dict
+        Export group from snapshot_groups().
+    out_dir : str
+        Output directory of the bundle.
+    html : bool
+        Also write a standalone HTML file next to each JSON figure.
+
+    Returns:
+    tuple
+        (group id, number of figures written).
+    """
+    import pandas as pd
+    from . import api, artifacts, maps, plots
+
+    # The figures go into the bundle, not into the app's artifact store
+    artifacts.ENABLED = False
+    out = Path(out_dir)
+    city = group['city']
+    written = 0
+
+    if group['tab'] == 'uhi':
+        data = pd.read_csv(group['inputs'][0])
+        for hour in HOURS:
+            hour_data = data[data['hour'] == hour]
+            for dtype in UHI_TYPES:
+                params = {'city': city, 'period': group['period'], 'dtype': dtype, 'hour': hour}
+                fig = maps.uhi_ci_map_figure(hour_data, dtype, DEFAULT_BASEMAP)
+                _write(fig, out, PATH_TEMPLATES['uhi_map'].format(**params), html)
+                written += 1
+                for lang, langdict in LANGUAGES.items():
+                    fig = plots.build_uhi_ci_histogram(hour_data, dtype, f'{hour:02d}', langdict)
+                    _write(fig, out, PATH_TEMPLATES['uhi_hist'].format(lang=lang, **params), html)
+                    written += 1
+        for dtype in UHI_TYPES:
+            subset = data[['hour', 'logger', dtype]]
+            for lang, langdict in LANGUAGES.items():
+                fig = plots.build_uhi_ci_evolution(subset, dtype, langdict)
+                relative = PATH_TEMPLATES['evolution'].format(city=city, period=group['period'], dtype=dtype, lang=lang)
+                _write(fig, out, relative, html)
+                written += 1
+
+    elif group['tab'] == 'sdtn':
+        daily = pd.read_csv(group['inputs'][0])
+        stations = pd.read_csv(group['inputs'][1])
+        sdtn_geo = daily.merge(stations[['Name', 'logger', 'x', 'y']], how='left', on='logger')
+        for metric, data_col in SDTN_METRICS.items():
+            for threshold in THRESHOLDS:
+                params = {'city': city, 'period': group['period'], 'metric': metric, 'threshold': threshold}
+                summary = api.sdtn_summary(sdtn_geo, data_col, metric, threshold)
+                _write(maps.sdtn_map_figure(summary, DEFAULT_BASEMAP), out,
+                       PATH_TEMPLATES['sdtn_map'].format(**params), html)
+                written += 1
+                for lang, langdict in LANGUAGES.items():
+                    fig = plots.build_tn_sd_histogram(summary, threshold, langdict)
+                    _write(fig, out, PATH_TEMPLATES['sdtn_hist'].format(lang=lang, **params), html)
+                    written += 1
+
+    elif group['tab'] == 'landuse':
+        landuse = pd.read_csv(group['inputs'][0])
+        for buffer in sorted(landuse['buffer'].unique()):
+            sel_data = landuse[landuse['buffer'] == buffer]
+            for code in eng_dict['description_dict']:
+                for lang, langdict in LANGUAGES.items():
+                    params = {'city': city, 'buffer': buffer, 'landuse': code, 'lang': lang}
+                    fig = maps.build_geodata_map(sel_data, code, DEFAULT_BASEMAP, langdict)
+                    _write(fig, out, PATH_TEMPLATES['landuse_map'].format(**params), html)
+                    fig = plots.build_geodata_histogram(sel_data, code, buffer, langdict)
+                    _write(fig, out, PATH_TEMPLATES['landuse_hist'].format(**params), html)
+                    written += 2
+
+    elif group['tab'] == 'fitnah':
+        fitnah = pd.read_csv(group['inputs'][0]).drop(columns=['geometry_coords'])
+        for buffer in BUFFERS:
+            for dtype in FITNAH_TYPES:
+                sel_data = fitnah[(fitnah['buffer'] == buffer) & (fitnah['dtype'] == dtype)]
+                for aggregator in FITNAH_AGGREGATORS:
+                    params = {'city': city, 'buffer': buffer, 'dtype': dtype, 'aggregator': aggregator}
+                    fig = maps.fitnah_map_figure(sel_data[maps.FITNAH_MAP_COLUMNS], aggregator, DEFAULT_BASEMAP)
+                    _write(fig, out, PATH_TEMPLATES['fitnah_map'].format(**params), html)
+                    written += 1
+                    for lang, langdict in LANGUAGES.items():
+                        fig = plots.build_fitnah_histogram(sel_data, aggregator, dtype, buffer, langdict)
+                        _write(fig, out, PATH_TEMPLATES['fitnah_hist'].format(lang=lang, **params), html)
+                        written += 1
+
+    return group['id'], written
+
+
+def build_index(groups: list) -> dict:
+    """
+    Build the small index describing the bundle's parameter axes and path templates.
+
+    Parameters:
+    groups : list
+        Export groups from snapshot_groups().
+
+    Returns:
+    dict
+        JSON-serializable index.
+    """
+    from .maps import BASEMAP_SOURCES
+    return {
+        'languages': {lang: {'period_choice': d['period_choice'], 'map_choice': d['map_choice'],
+                             'tabs': d['tabs'], 'description_dict': {str(k): v for k, v in d['description_dict'].items()}}
+                      for lang, d in LANGUAGES.items()},
+        'axes': {
+            'city': CITIES,
+            'period': PERIODS,
+            'hour': HOURS,
+            'dtype_uhi': UHI_TYPES,
+            'metric': list(SDTN_METRICS),
+            'threshold': THRESHOLDS,
+            'buffer': BUFFERS,
+            'landuse': [str(k) for k in eng_dict['description_dict']],
+            'dtype_fitnah': FITNAH_TYPES,
+            'aggregator': FITNAH_AGGREGATORS,
+            'basemap': BASEMAPS,
+        },
+        'basemaps': BASEMAP_SOURCES,
+        'default_basemap': DEFAULT_BASEMAP,
+        'paths': PATH_TEMPLATES,
+        'groups': [group['id'] for group in groups],
+    }
+
+
+def export_snapshot(
+    out_dir: Path,
+    workers: int = None,
+    html: bool = False,
+    force: bool = False,
+) -> dict:
+    """
+    Export (or incrementally update) the static snapshot bundle.
+
+    Parameters:
+    out_dir : Path
+        Output directory.
+    workers : int, optional
+        Size of the process pool (default: number of CPUs).
+    html : bool
+        Also write standalone HTML files.
+    force : bool
+        Re-render every group, ignoring the manifest.
+
+    Returns:
+    dict
+        Mapping of group id -> number of figures written (0 for skipped groups).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    root = Path(__file__).resolve().parent.parent
+    manifest_path = out_dir / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() and not force else {}
+
+    version = code_version(root)
+    groups = snapshot_groups()
+    fingerprints = {
+        group['id']: hashlib.sha256(
+            (version + ''.join(_file_digest(Path(p)) for p in group['inputs']) + str(html)).encode()
+        ).hexdigest()
+        for group in groups
+    }
+    todo = [group for group in groups if manifest.get(group['id']) != fingerprints[group['id']]]
+
+    results = {group['id']: 0 for group in groups}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_group, group, str(out_dir), html) for group in todo]
+        for future in as_completed(futures):
+            group_id, written = future.result()
+            results[group_id] = written
+            # Record each group as soon as it is complete, so an interrupted export resumes
+            manifest[group_id] = fingerprints[group_id]
+            manifest_path.write_text(json.dumps(manifest, indent=1), encoding='utf-8')
+
+    (out_dir / 'index.json').write_text(json.dumps(build_index(groups)), encoding='utf-8')
+    viewer = Path(__file__).resolve().parent / 'snapshot_viewer.html'
+    (out_dir / 'index.html').write_text(viewer.read_text(encoding='utf-8'), encoding='utf-8')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export every map and chart combination as a static bundle.')
+    parser.add_argument('--out', type=Path, default=Path('static_snapshot'))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--html', action='store_true', help='Also write standalone HTML per figure.')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and re-render everything.')
+    args = parser.parse_args()
+
+    results = export_snapshot(args.out, args.workers, args.html, args.force)
+    for group_id, written in sorted(results.items()):
+        print(f"{group_id:<24} {'unchanged' if written == 0 else f'{written} figures'}")
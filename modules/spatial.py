@@ -0,0 +1,313 @@
+"""
+Module: spatial
+================
+
+This module provides a per-city spatial index over the logger coordinates so that a map
+click or a typed coordinate can be resolved to the nearest loggers, together with the
+full history of those loggers, without scanning the hourly and daily files again.
+
+The index is a small k-d tree over locally projected (metric) coordinates. The hourly
+UHI profiles, daily statistics and FITNAH / land-use values are split per logger once,
+when the index is built, so a lookup is a tree query followed by dictionary accesses.
+
+Classes:
+- KDTree
+- LoggerIndex
+
+Functions:
+- to_local_metres
+- build_logger_index
+"""
+
+import heapq
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .api import memoize
+
+EARTH_RADIUS_M = 6_371_000.0
+LEAF_SIZE = 8
+
+_EMPTY = pd.DataFrame()
+
+
+def to_local_metres(
+    lon: np.ndarray,
+    lat: np.ndarray,
+    origin_lat: float,
+) -> np.ndarray:
+    """
+    Project WGS84 coordinates onto a local equirectangular plane in metres.
+
+    At city scale the distortion of this projection is far below the spacing of the
+    loggers, so euclidean distances on the plane are good nearest-neighbour distances.
+
+    Parameters:
+    lon : np.ndarray
+        Longitudes in degrees.
+    lat : np.ndarray
+        Latitudes in degrees.
+    origin_lat : float
+        Latitude (degrees) at which the longitudes are scaled.
+
+    Returns:
+    np.ndarray
+        Array of shape (n, 2) with easting and northing in metres.
+    """
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    scale = np.cos(np.radians(origin_lat))
+    return np.column_stack([EARTH_RADIUS_M * lon * scale, EARTH_RADIUS_M * lat])
+
+
+class KDTree:
+    """
+    Minimal k-d tree for k-nearest-neighbour queries on two-dimensional points.
+
+    Nodes are stored in flat lists; leaves hold up to LEAF_SIZE points which are
+    compared with a single vectorized distance computation.
+    """
+
+    def __init__(self, points: np.ndarray) -> None:
+        """
+        Build the tree.
+
+        Parameters:
+        points : np.ndarray
+            Array of shape (n, 2) with the point coordinates.
+        """
+        self.points = np.asarray(points, dtype=float)
+        self._order = np.arange(len(self.points))
+        # Per node: split axis (-1 for leaves), split value, left child, right child, start, stop
+        self._axis = []
+        self._split = []
+        self._left = []
+        self._right = []
+        self._bounds = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def _build(self, start: int, stop: int) -> int:
+        node = len(self._axis)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._bounds.append((start, stop))
+        if stop - start <= LEAF_SIZE:
+            return node
+
+        idx = self._order[start:stop]
+        pts = self.points[idx]
+        axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        mid = (stop - start) // 2
+        part = np.argpartition(pts[:, axis], mid)
+        self._order[start:stop] = idx[part]
+
+        self._axis[node] = axis
+        self._split[node] = float(self.points[self._order[start + mid], axis])
+        self._left[node] = self._build(start, start + mid)
+        self._right[node] = self._build(start + mid, stop)
+        return node
+
+    def query(self, point, k: int = 1) -> tuple:
+        """
+        Find the k nearest points to a query point.
+
+        Parameters:
+        point : array-like
+            Query coordinates (x, y).
+        k : int
+            Number of neighbours to return.
+
+        Returns:
+        tuple
+            (distances, indices), both sorted by increasing distance.
+        """
+        if not len(self.points):
+            return np.array([]), np.array([], dtype=int)
+        k = min(k, len(self.points))
+        q = np.asarray(point, dtype=float)
+        best = []  # max-heap of (-squared distance, index)
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            axis = self._axis[node]
+            if axis == -1:
+                start, stop = self._bounds[node]
+                idx = self._order[start:stop]
+                d2 = ((self.points[idx] - q) ** 2).sum(axis=1)
+                for dist, i in zip(d2, idx):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, i))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, i))
+                continue
+            diff = q[axis] - self._split[node]
+            near, far = (self._left[node], self._right[node]) if diff < 0 else (self._right[node], self._left[node])
+            # The far side is only visited if it can still contain a closer point
+            if len(best) < k or diff * diff < -best[0][0]:
+                stack.append(far)
+            stack.append(near)
+
+        best.sort(key=lambda item: -item[0])
+        distances = np.sqrt([-d for d, _ in best])
+        indices = np.array([i for _, i in best], dtype=int)
+        return distances, indices
+
+
+class LoggerIndex:
+    """
+    Spatial index over the loggers of one city and period, with per-logger data slices.
+    """
+
+    def __init__(
+        self,
+        stations: pd.DataFrame,
+        slices: dict,
+    ) -> None:
+        """
+        Parameters:
+        stations : pd.DataFrame
+            One row per logger with columns 'logger', 'Name', 'lon' and 'lat'.
+        slices : dict
+            Mapping of dataset name to a dict of logger -> DataFrame.
+        """
+        self.stations = stations.reset_index(drop=True)
+        self.slices = slices
+        self.origin_lat = float(self.stations['lat'].mean()) if len(self.stations) else 0.0
+        self.tree = KDTree(to_local_metres(self.stations['lon'], self.stations['lat'], self.origin_lat))
+        # Column arrays so that a query result is assembled without DataFrame indexing
+        self._columns = {col: self.stations[col].to_numpy() for col in ['logger', 'Name', 'lon', 'lat']}
+
+    def nearest(self, lon: float, lat: float, k: int = 3) -> pd.DataFrame:
+        """
+        Resolve a coordinate to the k nearest loggers.
+
+        Parameters:
+        lon : float
+            Longitude of the query location.
+        lat : float
+            Latitude of the query location.
+        k : int
+            Number of loggers to return.
+
+        Returns:
+        pd.DataFrame
+            Station rows of the nearest loggers with an added 'distance_m' column.
+        """
+        query = to_local_metres([lon], [lat], self.origin_lat)[0]
+        distances, indices = self.tree.query(query, k)
+        result = {col: values[indices] for col, values in self._columns.items()}
+        result['distance_m'] = np.round(distances, 1)
+        return pd.DataFrame(result)
+
+    def history(self, logger: int) -> dict:
+        """
+        Return all pre-indexed data slices of a logger.
+
+        Parameters:
+        logger : int
+            Logger ID.
+
+        Returns:
+        dict
+            Dataset name -> DataFrame (empty if the logger is missing from the dataset).
+        """
+        return {
+            name: per_logger[logger] if logger in per_logger else _EMPTY
+            for name, per_logger in self.slices.items()
+        }
+
+
+class _LoggerSlices:
+    """
+    Rows of a frame per logger, as a mapping logger -> DataFrame.
+
+    The frame is sorted by logger once (keeping the row order within a logger) and only
+    the row offsets are stored; a logger's rows are sliced on access. Materializing one
+    DataFrame per logger up front does not scale to networks of thousands of loggers.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            self._df, self._offsets = df, {}
+            return
+        self._df = df.sort_values('logger', kind='stable').reset_index(drop=True)
+        loggers, starts, counts = np.unique(self._df['logger'].to_numpy(), return_index=True, return_counts=True)
+        self._offsets = {logger: (start, start + count) for logger, start, count in zip(loggers.tolist(), starts, counts)}
+
+    def __contains__(self, logger) -> bool:
+        return logger in self._offsets
+
+    def __getitem__(self, logger) -> pd.DataFrame:
+        start, stop = self._offsets[logger]
+        return self._df.iloc[start:stop].reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+
+def _split_by_logger(df: pd.DataFrame) -> _LoggerSlices:
+    """Index a frame by logger (see _LoggerSlices)."""
+    return _LoggerSlices(df)
+
+
+@memoize(maxsize=16)
+def build_logger_index(
+    uhi_path: Path,
+    daily_stats_path: Path,
+    fitnah_path: Path,
+    landuse_path: Path,
+) -> LoggerIndex:
+    """
+    Build (once per set of input files and process) the spatial index of a city and period.
+
+    Station coordinates are taken from the 'x'/'y' columns of the hourly file and
+    completed with the 'lon'/'lat' columns of the land-use and FITNAH files. Missing
+    input files (e.g. FITNAH for Bern) simply yield empty slices.
+
+    Parameters:
+    uhi_path : Path
+        Path to the hourly UHI / City Index CSV.
+    daily_stats_path : Path
+        Path to the daily temperature statistics CSV.
+    fitnah_path : Path
+        Path to the FITNAH CSV.
+    landuse_path : Path
+        Path to the land-use CSV.
+
+    Returns:
+    LoggerIndex
+        The spatial index with per-logger slices.
+    """
+    def read(path: Path) -> pd.DataFrame:
+        if not path.exists():
+            return pd.DataFrame(columns=['logger'])
+        return pd.read_csv(path).drop(columns=['Unnamed: 0', 'geometry_coords'], errors='ignore')
+
+    hourly = read(uhi_path)
+    daily = read(daily_stats_path)
+    fitnah = read(fitnah_path)
+    landuse = read(landuse_path)
+
+    stations = (
+        hourly[['logger', 'Name', 'x', 'y']]
+        .drop_duplicates('logger')
+        .rename(columns={'x': 'lon', 'y': 'lat'})
+    )
+    for extra in (landuse, fitnah):
+        if {'lon', 'lat'}.issubset(extra.columns):
+            missing = extra.loc[~extra['logger'].isin(stations['logger']), ['logger', 'lon', 'lat']]
+            missing = missing.drop_duplicates('logger').assign(Name=lambda d: 'Logger ' + d['logger'].astype(str))
+            stations = pd.concat([stations, missing], ignore_index=True)
+
+    slices = {
+        'hourly': _split_by_logger(hourly.sort_values('hour')),
+        'daily': _split_by_logger(daily),
+        'fitnah': _split_by_logger(fitnah),
+        'landuse': _split_by_logger(landuse),
+    }
+    return LoggerIndex(stations, slices)
@@ -0,0 +1,210 @@
+"""
+Module: startup
+================
+
+This module keeps the cold start of the app cheap. Heavy libraries (pandas, Plotly) and
+the plotting modules are imported lazily by the tabs that need them; this module records
+how long those imports and the other startup steps take, and pre-warms the dataset and
+figure caches in a background thread so that the first session after a deploy does not
+pay for them on the script thread.
+
+Set the environment variable HBS_PROFILE_STARTUP=1 to show the startup breakdown in the
+app, or run ``python -m modules.startup`` to print it for a fresh interpreter. With it, the
+render time of every tab is recorded as well; only the latest RENDER_HISTORY reruns are
+kept, apart from the startup steps.
+
+Functions:
+- timed
+- timed_render
+- lazy_import
+- start_warm_up
+- warm_up
+- startup_report
+- render_report
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+STARTUP_T0 = time.perf_counter()
+PROFILE_STARTUP = os.environ.get("HBS_PROFILE_STARTUP", "0") == "1"
+
+# Ordered list of (step, seconds, thread name); appended to from the script and warm-up threads
+_timings = []
+_timings_lock = threading.Lock()
+# Latest render steps of the reruns of all sessions, same tuples (HBS_PROFILE_STARTUP=1 only)
+RENDER_HISTORY = 200
+_renders = deque(maxlen=RENDER_HISTORY)
+
+
+@contextmanager
+def timed(step: str):
+    """
+    Context manager recording the wall time of a startup step.
+
+    Parameters:
+    step : str
+        Name of the step shown in the startup report.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _timings_lock:
+            _timings.append((step, time.perf_counter() - start, threading.current_thread().name))
+
+
+@contextmanager
+def timed_render(step: str):
+    """
+    Context manager recording the wall time of a rendering step of a rerun.
+
+    Nothing is recorded unless HBS_PROFILE_STARTUP=1; then the latest RENDER_HISTORY steps
+    are kept.
+
+    Parameters:
+    step : str
+        Name of the step shown in the render report.
+    """
+    if not PROFILE_STARTUP:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _timings_lock:
+            _renders.append((step, time.perf_counter() - start, threading.current_thread().name))
+
+
+def lazy_import(name: str):
+    """
+    Import a module on first use and record the import time.
+
+    Parameters:
+    name : str
+        Dotted module name, e.g. 'modules.maps'.
+
+    Returns:
+    module
+        The imported module (from sys.modules on every call after the first).
+    """
+    module = sys.modules.get(name)
+    # A module still being executed by another thread (e.g. the warm-up) is only partially
+    # initialized; importlib.import_module waits for it on the module's import lock.
+    if module is not None and not getattr(module.__spec__, '_initializing', False):
+        return module
+    with timed(f"import {name}"):
+        return importlib.import_module(name)
+
+
+def warm_up(city_periods: list) -> None:
+    """
+    Load every dataset and warm the figure machinery for the given selections.
+
+    Runs in the background thread started by start_warm_up, but can also be called
+    directly (e.g. from a deploy hook) to prime the caches synchronously.
+
+    Parameters:
+    city_periods : list
+        List of (city, period) tuples as accepted by get_files.
+
+    Returns:
+    None
+    """
+    structure = lazy_import("modules.structure")
+    api = lazy_import("modules.api")
+    spatial = lazy_import("modules.spatial")
+    maps = lazy_import("modules.maps")
+    plots = lazy_import("modules.plots")
+
+    with timed("warm plotly figure machinery"):
+        # The first Plotly Express figure of a process loads the trace validators,
+        # which costs far more than any later figure.
+        px = lazy_import("plotly.express")
+        pd = lazy_import("pandas")
+        px.scatter_map(pd.DataFrame({"lat": [47.1], "lon": [7.2]}), lat="lat", lon="lon")
+        px.histogram(pd.DataFrame({"x": [0.0]}), x="x")
+
+    for city, period in city_periods:
+        lu_path, f_path, u_path, tpath, spath = structure.get_files(city, period)
+        with timed(f"load datasets {city} / {period}"):
+            for path in (u_path, tpath, spath, lu_path):
+                structure.load_csv(path)
+            if f_path.exists():
+                structure.load_csv(f_path)
+        with timed(f"build logger index {city} / {period}"):
+            spatial.build_logger_index(u_path, tpath, f_path, lu_path)
+        with timed(f"build default figures {city} / {period}"):
+            # Figures are language-independent, so one build serves every language
+            hour_data = api.uhi_by_hour(city, period, 0)
+            maps.uhi_ci_map_figure(hour_data, "city_index", structure.BASEMAPS[0])
+            plots.histogram_figure(hour_data[["city_index"]], "city_index", 20, 600, 500)
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up(city_periods: tuple) -> threading.Thread:
+    """
+    Start the background warm-up once per server process.
+
+    Parameters:
+    city_periods : tuple
+        Tuple of (city, period) tuples to warm.
+
+    Returns:
+    threading.Thread
+        The (daemon) warm-up thread.
+    """
+    def run():
+        with timed("background warm-up total"):
+            warm_up(list(city_periods))
+
+    thread = threading.Thread(target=run, name="hbs-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_report() -> list:
+    """
+    Return the recorded startup steps.
+
+    Returns:
+    list
+        List of dicts with 'step', 'seconds' and 'thread', followed by the time elapsed
+        since this module was first imported.
+    """
+    with _timings_lock:
+        timings = list(_timings)
+    return [
+        {"step": step, "seconds": round(seconds, 4), "thread": thread}
+        for step, seconds, thread in timings
+    ] + [{"step": "elapsed since startup", "seconds": round(time.perf_counter() - STARTUP_T0, 4), "thread": ""}]
+
+
+def render_report() -> list:
+    """
+    Return the latest recorded render steps (see timed_render), the most recent last.
+
+    Returns:
+    list
+        List of dicts with 'step', 'seconds' and 'thread'.
+    """
+    with _timings_lock:
+        renders = list(_renders)
+    return [{"step": step, "seconds": round(seconds, 4), "thread": thread} for step, seconds, thread in renders]
+
+
+if __name__ == "__main__":
+    # Profile a cold start of every dataset in a fresh interpreter
+    with timed("total"):
+        warm_up([("biel", "summer"), ("biel", "heatwave"), ("bern", "summer"), ("bern", "heatwave")])
+    width = max(len(row["step"]) for row in startup_report())
+    for row in startup_report():
+        print(f"{row['step']:<{width}}  {row['seconds']:8.3f} s")
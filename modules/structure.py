@@ -4,69 +4,31 @@ Module: structure
 
 This module provides utility functions for managing file paths, language dictionaries,
 and markdown loading. These utilities support the data processing and visualization
-in the application.
+in the application. The path helpers (get_files, get_cube_dir, get_raw_dir, get_meteo_path,
+get_raster_path) and the option keys are defined in modules.paths and re-exported here.
 
 Functions:
-- get_files
 - get_lang_dict
 - load_markdown
+- load_csv
+- load_geodata
+- relabel_figure
+
+The loaders share the process-wide caches of modules.api, which is imported inside them
+so that importing this module stays cheap on a cold start (see modules.startup).
 """
 
 
 import streamlit as st
 from pathlib import Path
 from content.lang_dict import eng_dict, de_dict, fr_dict
+from .paths import (  # noqa: F401  (re-exported)
+    BASEMAPS, CAMPAIGNS, PERIODS, REFERENCE_LOGGERS, episode_days, episode_period, get_cube_dir, get_files,
+    get_meteo_path, get_raster_path, get_raw_dir,
+)
 
 CONTENT_DIR = Path.cwd() / "content"
 
-def get_files(city: str, period: str) -> tuple:
-    """
-    Retrieve file paths for data files based on the selected city and period.
-
-    Parameters:
-    city : str
-        Name of the city ('bern' or 'biel').
-    period : str
-        Time period ('Main Heatwave' or other periods).
-
-    Returns:
-    tuple
-        Paths for land use, Fitnah, UHI, temperature stats, and SD/TN files.
-    """
-
-    fitnah_path = Path.cwd() / 'data' / city / 'data_viz_fitnah.csv'
-    landuse_path = Path.cwd() / 'data' / city / 'data_viz_land_use.csv'
-
-    if (period == 'Main Heatwave') | (period == 'Principale vague de chaleur') | (period == 'Haupt-Hitzewelle'):
-        hw = True
-    else:
-        hw = False
-
-    if city == 'bern':
-        if hw:
-            uhi_path = Path.cwd() / 'data' / city / 'heatwave_22_hourly_uhi_ci.csv'
-            tempstats = Path.cwd() / 'data' / city / 'heatwave_22_temp_stats.csv'
-            sdtn = Path.cwd() / 'data' / city / 'heatwave_22_sdtn.csv'
-        else:
-            uhi_path = Path.cwd() / 'data' / city / 'summer22_hourly_uhi_cis.csv'
-            tempstats = Path.cwd() / 'data' / city / 'summer22_temp_stats.csv'
-            sdtn = Path.cwd() / 'data' / city / 'summer22_sdtn.csv'
-
-    if city == 'biel':
-        if hw:
-            uhi_path = Path.cwd() / 'data' / city / 'heatwave_23_hourly_uhi_ci.csv'
-            tempstats = Path.cwd() / 'data' / city / 'heatwave_23_temp_stats.csv'
-            sdtn = Path.cwd() / 'data' / city / 'heatwave_23_sdtn.csv'
-
-        else:
-            uhi_path = Path.cwd() / 'data' / city / 'summer23_hourly_uhi_ci.csv'
-            tempstats = Path.cwd() / 'data' / city / 'summer23_temp_stats.csv'
-            sdtn = Path.cwd() / 'data' / city / 'summer23_sdtn.csv'
-
-
-
-    return landuse_path, fitnah_path, uhi_path, tempstats, sdtn
-
 
 def get_lang_dict() -> dict:
     """
@@ -77,7 +39,7 @@ def get_lang_dict() -> dict:
         Language dictionary for the selected language (EN, DE, or FR).
     """
 
-    lang = st.selectbox('Choose Language / choisir langue / Sprache wählen', ['DE', 'EN', 'FR'])
+    lang = st.selectbox('Choose Language / choisir langue / Sprache wählen', ['DE', 'EN', 'FR'], key='language_selector')
     if lang == 'DE':
         return de_dict
     if lang == 'EN':
@@ -105,6 +67,94 @@ def load_markdown(file_path: Path) -> str:
     except FileNotFoundError:
         return f"Error: {file_path.name} not found."
 
+
+def load_csv(file_path: Path) -> "pd.DataFrame":
+    """
+    Load a CSV data file once per process (see modules.api.read_table).
+
+    Parameters:
+    file_path : Path
+        Path to the CSV file.
+
+    Returns:
+    pd.DataFrame
+        The parsed file (each caller receives its own copy).
+    """
+
+    from . import api
+    return api.read_table(file_path)
+
+
+def load_geodata(file_path: Path) -> "pd.DataFrame":
+    """
+    Load a FITNAH / land-use CSV and parse its 'geometry_coords' column once per process
+    (see modules.api.read_geodata).
+
+    Parameters:
+    file_path : Path
+        Path to the CSV file.
+
+    Returns:
+    pd.DataFrame
+        The parsed file with 'geometry_coords' converted from strings to lists of tuples.
+    """
+
+    from . import api
+    return api.read_geodata(file_path)
+
+
+def relabel_figure(
+    fig,
+    labels: dict,
+    title: str = None,
+    xaxis_title: str = None,
+    yaxis_title: str = None,
+):
+    """
+    Localize a figure built with language-independent column keys.
+
+    Only labels are touched: hover entries and color bar / axis titles whose text is a
+    key of `labels` are replaced, and the optional titles are set. This is cheap
+    compared to rebuilding the figure, so figures are cached once for all languages.
+
+    Parameters:
+    fig : plotly.graph_objects.Figure
+        Figure to relabel (modified in place).
+    labels : dict
+        Mapping of column key -> localized label.
+    title : str, optional
+        Figure title.
+    xaxis_title : str, optional
+        X axis title.
+    yaxis_title : str, optional
+        Y axis title.
+
+    Returns:
+    plotly.graph_objects.Figure
+        The relabeled figure.
+    """
+
+    for trace in fig.data:
+        template = getattr(trace, 'hovertemplate', None)
+        if template:
+            parts = template.split('<br>')
+            for i, part in enumerate(parts):
+                key, sep, rest = part.partition('=')
+                if sep and key in labels:
+                    parts[i] = labels[key] + sep + rest
+            trace.hovertemplate = '<br>'.join(parts)
+
+    layout = fig.layout
+    if 'coloraxis' in layout and layout.coloraxis.colorbar.title.text in labels:
+        layout.coloraxis.colorbar.title.text = labels[layout.coloraxis.colorbar.title.text]
+    for axis in ('xaxis', 'yaxis'):
+        if axis in layout and layout[axis].title.text in labels:
+            layout[axis].title.text = labels[layout[axis].title.text]
+
+    updates = {'title': title, 'xaxis_title': xaxis_title, 'yaxis_title': yaxis_title}
+    fig.update_layout({k: v for k, v in updates.items() if v is not None})
+    return fig
+
 sensor_labels = {
     206: 'rural reference',
     228: 'Südstrasse',
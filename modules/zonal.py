@@ -0,0 +1,380 @@
+"""
+Module: zonal
+================
+
+This module computes zonal statistics of a local raster (DEM, FITNAH layers, land use)
+within circular buffers of any radius around each logger, so the FITNAH and land-use
+tabs are not limited to the buffers precomputed offline (10, 50, 100 and 500 m).
+
+A raster is stored as a 2-D .npy array, opened with mmap_mode='r', next to a JSON file
+with its georeference:
+
+    {"crs": "EPSG:2056", "origin": [x_min, y_max], "cell_size": 2.0, "nodata": -9999}
+
+where origin is the upper-left corner of the raster in Swiss coordinates (LV95
+EPSG:2056 or LV03 EPSG:21781). Logger coordinates (WGS84) are projected with the
+swisstopo approximation formulas, which are accurate to about a metre.
+
+All (logger, radius) pairs are computed in one pass: for each chunk of loggers, one
+window of the largest radius is read per logger from the memory-mapped raster, and the
+circular mask of every radius (precomputed once per radius and cell size) selects the
+cells of that buffer from the stacked windows. A cell belongs to a buffer if its centre
+lies within the radius of the centre of the logger's cell.
+
+Rasters exported by GIS tools as ESRI ASCII grids can be converted with:
+
+    python -m modules.zonal --asc dem_biel.asc --city biel --name dem
+
+Classes:
+- Raster
+
+Functions:
+- wgs84_to_swiss
+- circular_mask
+- zonal_stats
+- zonal_class_counts
+- write_raster
+- read_ascii_grid
+"""
+
+import argparse
+import functools
+import json
+import os
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .paths import get_raster_path
+
+SWISS_CRS = {'EPSG:2056': (2_000_000.0, 1_000_000.0), 'EPSG:21781': (0.0, 0.0)}
+STATS = ['mean', 'max', 'min', 'median', 'count']
+# Cells of the stacked windows of one chunk of loggers (64 MB as float32)
+MAX_CHUNK_CELLS = 2 ** 24
+
+
+def wgs84_to_swiss(lon: np.ndarray, lat: np.ndarray, crs: str = 'EPSG:2056') -> tuple:
+    """
+    Project WGS84 coordinates to Swiss LV95 or LV03 (swisstopo approximation, ~1 m).
+
+    Parameters:
+    lon : np.ndarray
+        Longitudes in degrees.
+    lat : np.ndarray
+        Latitudes in degrees.
+    crs : str
+        'EPSG:2056' (LV95) or 'EPSG:21781' (LV03).
+
+    Returns:
+    tuple
+        (east, north) in metres.
+    """
+    if crs not in SWISS_CRS:
+        raise ValueError(f"Unsupported raster CRS {crs!r}; expected one of {sorted(SWISS_CRS)}.")
+    phi = (np.asarray(lat, dtype=float) * 3600 - 169028.66) / 10000
+    lam = (np.asarray(lon, dtype=float) * 3600 - 26782.5) / 10000
+    east = 600072.37 + 211455.93 * lam - 10938.51 * lam * phi - 0.36 * lam * phi ** 2 - 44.54 * lam ** 3
+    north = (200147.07 + 308807.95 * phi + 3745.25 * lam ** 2 + 76.63 * phi ** 2
+             - 194.56 * lam ** 2 * phi + 119.79 * phi ** 3)
+    false_east, false_north = SWISS_CRS[crs]
+    return east + false_east, north + false_north
+
+
+class Raster:
+    """
+    Read-only, memory-mapped raster with its georeference.
+
+    Parameters:
+    path : Path
+        Path of the .npy array (the georeference is read from the .json next to it).
+    """
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        with open(path.with_suffix('.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['crs'] not in SWISS_CRS:
+            raise ValueError(f"Unsupported raster CRS {meta['crs']!r}; expected one of {sorted(SWISS_CRS)}.")
+        self.values = np.load(path, mmap_mode='r')
+        self.crs = meta['crs']
+        self.x_min, self.y_max = meta['origin']
+        self.cell_size = float(meta['cell_size'])
+        self.nodata = meta.get('nodata')
+
+    def cell_of(self, lon: np.ndarray, lat: np.ndarray) -> tuple:
+        """
+        Row and column of the cells containing the given WGS84 points (may lie outside).
+        """
+        east, north = wgs84_to_swiss(lon, lat, self.crs)
+        rows = np.floor((self.y_max - north) / self.cell_size).astype(np.int64)
+        cols = np.floor((east - self.x_min) / self.cell_size).astype(np.int64)
+        return rows, cols
+
+    def windows(self, rows: np.ndarray, cols: np.ndarray, half: int) -> np.ndarray:
+        """
+        Square windows of 2 * half + 1 cells centred on the given cells.
+
+        Parameters:
+        rows, cols : np.ndarray
+            Centre cells.
+        half : int
+            Half width of the windows in cells.
+
+        Returns:
+        np.ndarray
+            float32 array (n, 2 * half + 1, 2 * half + 1); cells outside the raster and
+            nodata cells are NaN.
+        """
+        size = 2 * half + 1
+        n_rows, n_cols = self.values.shape
+        out = np.full((len(rows), size, size), np.nan, dtype=np.float32)
+        for i, (row, col) in enumerate(zip(rows, cols)):
+            r0, c0 = row - half, col - half
+            r_start, r_stop = max(r0, 0), min(r0 + size, n_rows)
+            c_start, c_stop = max(c0, 0), min(c0 + size, n_cols)
+            if r_start < r_stop and c_start < c_stop:
+                # Only this block of the memory map is read from disk
+                out[i, r_start - r0:r_stop - r0, c_start - c0:c_stop - c0] = self.values[r_start:r_stop, c_start:c_stop]
+        if self.nodata is not None:
+            out[out == self.nodata] = np.nan
+        return out
+
+
+@functools.lru_cache(maxsize=256)
+def circular_mask(radius: float, cell_size: float) -> np.ndarray:
+    """
+    Cells whose centre lies within a radius of the centre cell.
+
+    Parameters:
+    radius : float
+        Buffer radius in metres.
+    cell_size : float
+        Raster cell size in metres.
+
+    Returns:
+    np.ndarray
+        Square boolean mask of 2 * floor(radius / cell_size) + 1 cells (read-only; shared
+        by every caller).
+    """
+    half = int(np.floor(radius / cell_size))
+    offsets = np.arange(-half, half + 1) * cell_size
+    mask = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius ** 2
+    mask.setflags(write=False)
+    return mask
+
+
+def _zonal_pass(raster: Raster, lon: np.ndarray, lat: np.ndarray, radii: list, reducer) -> dict:
+    """Apply reducer to the buffer cells of every (logger, radius) pair; radius -> dict of arrays."""
+    masks = {radius: circular_mask(radius, raster.cell_size) for radius in radii}
+    half = max(mask.shape[0] // 2 for mask in masks.values())
+    rows, cols = raster.cell_of(lon, lat)
+    chunk = max(1, MAX_CHUNK_CELLS // (2 * half + 1) ** 2)
+
+    parts = {radius: [] for radius in radii}
+    for start in range(0, len(rows), chunk):
+        windows = raster.windows(rows[start:start + chunk], cols[start:start + chunk], half)
+        for radius, mask in masks.items():
+            h = mask.shape[0] // 2
+            # (loggers, cells in the buffer)
+            values = windows[:, half - h:half + h + 1, half - h:half + h + 1][:, mask]
+            parts[radius].append(reducer(values))
+    return {
+        radius: {key: np.concatenate([part[key] for part in chunks]) for key in chunks[0]}
+        for radius, chunks in parts.items()
+    }
+
+
+def _summary(values: np.ndarray) -> dict:
+    valid = np.isfinite(values)
+    count = valid.sum(axis=1)
+    with warnings.catch_warnings():
+        # Buffers without valid cells yield NaN statistics
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        stats = {
+            'mean': np.nanmean(values, axis=1, dtype=np.float64),
+            'max': np.nanmax(values, axis=1),
+            'min': np.nanmin(values, axis=1),
+        }
+    # Exact median by partitioning instead of np.nanmedian's sort: with NaN moved to the
+    # end (as +inf), the median positions only depend on the number of valid cells, so
+    # rows are partitioned in groups of equal count.
+    filled = np.where(valid, values, np.inf)
+    median = np.full(len(values), np.nan)
+    for n in np.unique(count[count > 0]):
+        rows = np.flatnonzero(count == n)
+        lower, upper = (n - 1) // 2, n // 2
+        part = np.partition(filled[rows], [lower, upper], axis=1)
+        median[rows] = (part[:, lower].astype(np.float64) + part[:, upper]) / 2
+    stats['median'] = median
+    stats['count'] = count
+    return stats
+
+
+def _frame(results: dict, loggers: np.ndarray, lon: np.ndarray, lat: np.ndarray, columns: list) -> pd.DataFrame:
+    frames = []
+    for radius, values in results.items():
+        frame = pd.DataFrame({column: values[column] for column in columns})
+        frame['buffer'] = int(radius) if float(radius).is_integer() else radius
+        frame['logger'] = loggers
+        frame['lon'] = lon
+        frame['lat'] = lat
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def zonal_stats(
+    raster: Raster,
+    loggers: np.ndarray,
+    lon: np.ndarray,
+    lat: np.ndarray,
+    radii: list,
+) -> pd.DataFrame:
+    """
+    Mean, max, min, median and count of the raster cells in circular buffers around points.
+
+    Parameters:
+    raster : Raster
+        Continuous raster (e.g. DEM or a FITNAH layer).
+    loggers : np.ndarray
+        Logger IDs.
+    lon, lat : np.ndarray
+        WGS84 coordinates of the loggers.
+    radii : list
+        Buffer radii in metres; all of them are computed in one pass.
+
+    Returns:
+    pd.DataFrame
+        One row per (radius, logger) with 'mean', 'max', 'min', 'median', 'count',
+        'buffer', 'logger', 'lon' and 'lat', as in data_viz_fitnah.csv.
+    """
+    radii = sorted({float(r) for r in radii})
+    results = _zonal_pass(raster, lon, lat, radii, _summary)
+    return _frame(results, np.asarray(loggers), lon, lat, STATS)
+
+
+def zonal_class_counts(
+    raster: Raster,
+    loggers: np.ndarray,
+    lon: np.ndarray,
+    lat: np.ndarray,
+    radii: list,
+    classes: list,
+) -> pd.DataFrame:
+    """
+    Number of cells of every class of a categorical raster in circular buffers around points.
+
+    Parameters:
+    raster : Raster
+        Categorical raster (e.g. land use).
+    loggers : np.ndarray
+        Logger IDs.
+    lon, lat : np.ndarray
+        WGS84 coordinates of the loggers.
+    radii : list
+        Buffer radii in metres; all of them are computed in one pass.
+    classes : list
+        Class codes to count.
+
+    Returns:
+    pd.DataFrame
+        One row per (radius, logger) with one column per class code (as string), 'buffer',
+        'logger', 'lon' and 'lat', as in data_viz_land_use.csv.
+    """
+    radii = sorted({float(r) for r in radii})
+    columns = [str(code) for code in classes]
+
+    def counts(values):
+        return {str(code): (values == code).sum(axis=1) for code in classes}
+
+    results = _zonal_pass(raster, lon, lat, radii, counts)
+    return _frame(results, np.asarray(loggers), lon, lat, columns)
+
+
+def write_raster(
+    values: np.ndarray,
+    path: Path,
+    origin: tuple,
+    cell_size: float,
+    crs: str = 'EPSG:2056',
+    nodata: float = None,
+) -> Raster:
+    """
+    Write a raster and its georeference in the format read by Raster.
+
+    Parameters:
+    values : np.ndarray
+        2-D array (row 0 is the northern edge).
+    path : Path
+        Output .npy path (e.g. structure.get_raster_path(city, name)).
+    origin : tuple
+        (x_min, y_max) of the upper-left corner in the CRS.
+    cell_size : float
+        Cell size in metres.
+    crs : str
+        'EPSG:2056' or 'EPSG:21781'.
+    nodata : float, optional
+        Value of missing cells.
+
+    Returns:
+    Raster
+        The written raster.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp.npy')
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=values.dtype, shape=values.shape)
+    out[:] = values
+    out.flush()
+    del out
+    os.replace(tmp, path)
+    meta = {
+        'crs': crs,
+        'origin': [float(origin[0]), float(origin[1])],
+        'cell_size': float(cell_size),
+        'nodata': None if nodata is None else float(nodata),
+    }
+    with open(path.with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return Raster(path)
+
+
+def read_ascii_grid(path: Path) -> tuple:
+    """
+    Read an ESRI ASCII grid (e.g. exported with gdal_translate -of AAIGrid).
+
+    Parameters:
+    path : Path
+        Path of the .asc file.
+
+    Returns:
+    tuple
+        (values, (x_min, y_max), cell_size, nodata).
+    """
+    header = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            key, _, value = line.strip().partition(' ')
+            if not key or key[0].isdigit() or key[0] in '-.':
+                break
+            header[key.lower()] = float(value)
+    n_header = len(header)
+    n_rows, cell_size = int(header['nrows']), header['cellsize']
+    x_min = header['xllcorner'] if 'xllcorner' in header else header['xllcenter'] - cell_size / 2
+    y_min = header['yllcorner'] if 'yllcorner' in header else header['yllcenter'] - cell_size / 2
+    values = pd.read_csv(path, sep=r'\s+', header=None, skiprows=n_header, dtype=np.float32).to_numpy()
+    return values, (x_min, y_min + n_rows * cell_size), cell_size, header.get('nodata_value')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert an ESRI ASCII grid into a memory-mapped raster.')
+    parser.add_argument('--asc', required=True, type=Path, help='ESRI ASCII grid in Swiss coordinates')
+    parser.add_argument('--city', required=True, choices=['biel', 'bern'])
+    parser.add_argument('--name', required=True, help="raster name, e.g. 'dem', 'fitnah_temp' or 'land_use'")
+    parser.add_argument('--crs', default='EPSG:2056', choices=sorted(SWISS_CRS))
+    args = parser.parse_args()
+
+    values, origin, cell_size, nodata = read_ascii_grid(args.asc)
+    raster = write_raster(values, get_raster_path(args.city, args.name), origin, cell_size, args.crs, nodata)
+    print(f"{raster.values.shape[0]} x {raster.values.shape[1]} cells of {cell_size} m -> {get_raster_path(args.city, args.name)}")